@@ -0,0 +1,792 @@
+"""Benchmarks for the SOC Vector Store search path.
+
+This script measures the performance of the search path offline, against a
+fixture index written as a snapshot and a deterministic stub encoder, or the
+local embedding model when `--encoder model` is given. It measures:
+
+- startup: the time to import the API and to load the fixture snapshot.
+- search: `VectorStoreManager.search` and `search_batch` throughput.
+- api: end-to-end `/search-index` latency and throughput at several
+  concurrency levels, through an in-process ASGI client.
+- recall: the recall@k of each compact storage mode, with and without
+  re-ranking, against float32 exact search, and the size of its matrix.
+- query_mode: the mean latency of a search in each query mode, and its
+  recall@k of the codes found by the `multi` mode.
+- query_encoder: with `--encoder model`, the time to encode a search term
+  with each query encoder, and the mean cosine similarity of the int8
+  encoder's embeddings to those of the default encoder.
+- memory: the peak resident set size of the benchmark process.
+
+The results are written to a JSON file and compared with a baseline, and the
+script exits with a non-zero status if any result regressed by more than the
+tolerance. It also exits with a non-zero status, without running, if there is
+no baseline and `--update-baseline` was not given. For example:
+
+    poetry run python benchmarks/run_benchmarks.py --concurrency 1 8 32
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+from soc_classification_vector_store.api.main import app
+from soc_classification_vector_store.utils.batching import multi_query_terms
+from soc_classification_vector_store.utils.quantisation import STORAGE_DTYPES
+from soc_classification_vector_store.utils.query_encoder import (
+    QUERY_ENCODER_CPU_INT8,
+    QUERY_ENCODER_DEFAULT,
+    create_query_encoder,
+)
+from soc_classification_vector_store.utils.search_backend import ExactSearchBackend
+from soc_classification_vector_store.utils.search_options import (
+    QUERY_MODE_MULTI,
+    QUERY_MODES,
+    SearchOptions,
+)
+from soc_classification_vector_store.utils.snapshot import (
+    load_snapshot,
+    write_snapshot,
+)
+from soc_classification_vector_store.utils.vector_store import (
+    SEARCH_BATCH_ENABLED,
+    SEARCH_CACHE_ENABLED,
+    SEARCH_EXECUTOR_QUEUE_SIZE,
+    SEARCH_EXECUTOR_WORKERS,
+    vector_store_manager,
+)
+
+BENCHMARK_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline.json"
+FIXTURE_CHECKSUMS = {"fixture": "benchmark"}
+
+# Vocabulary the fixture index texts and queries are drawn from
+INDUSTRIES = [
+    "school",
+    "hospital",
+    "retail",
+    "construction",
+    "farming",
+    "banking",
+    "software",
+    "restaurant",
+    "transport",
+    "manufacturing",
+    "care home",
+    "local government",
+]
+OCCUPATIONS = [
+    "teacher",
+    "nurse",
+    "sales assistant",
+    "bricklayer",
+    "farm worker",
+    "cashier",
+    "developer",
+    "chef",
+    "bus driver",
+    "machine operator",
+    "care worker",
+    "administrator",
+    "manager",
+    "cleaner",
+    "electrician",
+]
+DUTIES = [
+    "looking after people",
+    "teaching children",
+    "serving customers",
+    "building walls",
+    "driving vehicles",
+    "writing code",
+    "cooking meals",
+    "operating machinery",
+    "managing staff",
+    "keeping records",
+]
+
+
+class StubEncoder:
+    """Deterministic encoder standing in for the sentence transformer.
+
+    Each text is mapped to a pseudo-random unit vector seeded by its hash, so
+    results are reproducible without downloading a model.
+
+    Attributes:
+        dimensions (int): The number of dimensions of each embedding.
+        latency_ms (float): Simulated model latency for each call.
+    """
+
+    def __init__(self, dimensions: int, latency_ms: float = 0.0):
+        """Initialise the stub encoder.
+
+        Args:
+            dimensions: The number of dimensions of each embedding.
+            latency_ms: Simulated model latency for each call.
+        """
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Encode a batch of texts.
+
+        Args:
+            texts: The texts to encode.
+
+        Returns:
+            list[list[float]]: The embedding of each text.
+        """
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        """Encode a single text.
+
+        Args:
+            text: The text to encode.
+
+        Returns:
+            list[float]: The embedding of the text.
+        """
+        return self.embed_documents([text])[0]
+
+    def _embed(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest())
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+class StubEmbeddingHandler:  # pylint: disable=too-few-public-methods
+    """Minimal stand-in for `EmbeddingHandler` used by the search backends.
+
+    Attributes:
+        embeddings: The encoder used for queries.
+        k_matches (int): The number of nearest matches for each search term.
+    """
+
+    def __init__(self, embeddings, k_matches: int, model_name: str):
+        """Initialise the stub embedding handler.
+
+        Args:
+            embeddings: The encoder used for queries.
+            k_matches: The number of nearest matches for each search term.
+            model_name: The embedding model name reported in the config.
+        """
+        self.embeddings = embeddings
+        self.k_matches = k_matches
+        self.model_name = model_name
+
+    def get_embed_config(self) -> dict:
+        """Return the embedding configuration.
+
+        Returns:
+            dict: The embedding configuration of the fixture index.
+        """
+        return {
+            "embedding_model_name": self.model_name,
+            "llm_model_name": "none",
+            "db_dir": "benchmark",
+            "soc_index": "fixture",
+            "soc_structure": "fixture",
+            "matches": self.k_matches,
+        }
+
+
+def fixture_texts(rows: int, seed: int) -> list[str]:
+    """Generate the texts of the fixture index.
+
+    Args:
+        rows: The number of texts.
+        seed: The random seed.
+
+    Returns:
+        list[str]: The index texts.
+    """
+    rng = np.random.default_rng(seed)
+    return [
+        f"{OCCUPATIONS[rng.integers(len(OCCUPATIONS))]} "
+        f"{INDUSTRIES[rng.integers(len(INDUSTRIES))]} {i}"
+        for i in range(rows)
+    ]
+
+
+def fixture_code(text: str, row: int) -> str:
+    """Return the SOC-like code of a fixture index text.
+
+    The occupation in the text gives the minor group, the first three digits,
+    so that a hierarchical search has groups of related entries.
+
+    Args:
+        text: The index text.
+        row: The row of the text in the index.
+
+    Returns:
+        str: The four digit code.
+    """
+    occupation = next(
+        i for i, name in enumerate(OCCUPATIONS) if text.startswith(f"{name} ")
+    )
+    return f"{occupation % 9 + 1}{occupation:02d}{row % 10}"
+
+
+def fixture_queries(count: int, seed: int) -> list[list[str]]:
+    """Generate survey-like queries from the fixture vocabulary.
+
+    Args:
+        count: The number of queries.
+        seed: The random seed.
+
+    Returns:
+        list[list[str]]: The industry description, job title and job
+        description of each query.
+    """
+    rng = np.random.default_rng(seed + 1)
+    return [
+        [
+            str(rng.choice(INDUSTRIES)),
+            str(rng.choice(OCCUPATIONS)),
+            str(rng.choice(DUTIES)) if rng.random() < 0.5 else "",  # noqa: PLR2004
+        ]
+        for _ in range(count)
+    ]
+
+
+def write_fixture_snapshot(directory: str, embed, rows: int, seed: int) -> float:
+    """Encode the fixture index and write it as a snapshot.
+
+    Args:
+        directory: The directory to write the snapshot to.
+        embed: The embedding handler whose encoder embeds the index.
+        rows: The number of rows in the index.
+        seed: The random seed.
+
+    Returns:
+        float: The time taken to encode the index, in seconds.
+    """
+    texts = fixture_texts(rows, seed)
+    start = time.perf_counter()
+    embeddings = np.concatenate(
+        [
+            np.asarray(embed.embeddings.embed_documents(texts[i : i + 1024]))
+            for i in range(0, rows, 1024)
+        ]
+    )
+    encode_seconds = time.perf_counter() - start
+    write_snapshot(
+        directory,
+        embeddings=embeddings,
+        metadata=[
+            {"code": fixture_code(text, i), "title": text}
+            for i, text in enumerate(texts)
+        ],
+        embedding_model_name=embed.get_embed_config()["embedding_model_name"],
+        checksums=FIXTURE_CHECKSUMS,
+    )
+    return encode_seconds
+
+
+def measure_import_seconds() -> float:
+    """Measure the time to import the API in a fresh interpreter.
+
+    Returns:
+        float: The import time in seconds.
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        "import soc_classification_vector_store.api.main; "
+        "print(time.perf_counter() - start)"
+    )
+    output = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=os.environ,
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def measure_search(queries: list[list[str]], batch_size: int) -> dict[str, float]:
+    """Measure the throughput of the vector store manager.
+
+    Args:
+        queries: The queries to search.
+        batch_size: The number of queries in each `search_batch` call.
+
+    Returns:
+        dict[str, float]: Queries per second of `search` and `search_batch`.
+    """
+    start = time.perf_counter()
+    for query in queries:
+        vector_store_manager.search(*query)
+    search_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        vector_store_manager.search_batch(queries[i : i + batch_size])
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "search_qps": len(queries) / search_seconds,
+        "search_batch_qps": len(queries) / batch_seconds,
+    }
+
+
+def measure_query_modes(
+    queries: list[list[str]], k: int
+) -> dict[str, dict[str, float]]:
+    """Measure the latency and recall@k of each query mode.
+
+    Args:
+        queries: The queries to search.
+        k: The number of results for each query.
+
+    Returns:
+        dict[str, dict[str, float]]: The mean latency in milliseconds and the
+        recall@k of the codes found by the `multi` mode, keyed by mode.
+    """
+    found = {}
+    results = {}
+    for mode in QUERY_MODES:
+        options = SearchOptions.create(k=k, query_mode=mode)
+        start = time.perf_counter()
+        found[mode] = [
+            {match["code"] for match in vector_store_manager.search(*query, options)}
+            for query in queries
+        ]
+        results[mode] = {
+            "latency_ms": (time.perf_counter() - start) * 1000 / len(queries),
+            "recall": float(
+                np.mean(
+                    [
+                        len(codes & expected) / len(expected)
+                        for codes, expected in zip(
+                            found[mode], found[QUERY_MODE_MULTI], strict=True
+                        )
+                        if expected
+                    ]
+                )
+            ),
+        }
+    return results
+
+
+def measure_recall(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+    snapshot,
+    embed,
+    queries: list[list[str]],
+    k: int,
+    *,
+    rerank_candidates: int,
+    hierarchy_branches: int,
+) -> dict[str, dict[str, float]]:
+    """Measure the recall@k and matrix size of each storage and search mode.
+
+    Args:
+        snapshot: The fixture snapshot.
+        embed: The embedding handler whose encoder embeds the query terms.
+        queries: The queries whose search terms are searched.
+        k: The number of matches for each search term.
+        rerank_candidates: The number of candidates re-ranked at full precision.
+        hierarchy_branches: The number of minor groups searched by the
+            hierarchical search.
+
+    Returns:
+        dict[str, dict[str, float]]: The recall@k and matrix size in MiB of
+        each mode, keyed by mode.
+    """
+    terms = list(
+        dict.fromkeys(term for query in queries for term in multi_query_terms(query))
+    )
+    vectors = np.asarray(embed.embeddings.embed_documents(terms), dtype=np.float32)
+    exact, _distances = ExactSearchBackend.from_snapshot(snapshot, embed).search(
+        vectors, k
+    )
+
+    backends = {
+        f"{dtype}_rerank" if candidates else dtype: ExactSearchBackend.from_snapshot(
+            snapshot, embed, dtype=dtype, rerank_candidates=candidates
+        )
+        for dtype in ("float16", "int8")
+        for candidates in (0, rerank_candidates)
+    }
+    backends["hierarchy"] = ExactSearchBackend.from_snapshot(
+        snapshot, embed, hierarchy_branches=hierarchy_branches
+    )
+
+    results = {}
+    for mode, backend in backends.items():
+        found, _distances = backend.search(vectors, k)
+        results[mode] = {
+            "recall": float(
+                np.mean(
+                    [
+                        len(set(row) & set(expected)) / len(expected)
+                        for row, expected in zip(found, exact, strict=True)
+                    ]
+                )
+            ),
+            "matrix_mb": backend.memory_footprint()["matrix_bytes"] / 2**20,
+        }
+    return results
+
+
+async def measure_api(queries: list[list[str]], concurrency: int) -> dict[str, float]:
+    """Measure end-to-end `/search-index` latency at a concurrency level.
+
+    Args:
+        queries: The queries to send.
+        concurrency: The number of requests in flight at once.
+
+    Returns:
+        dict[str, float]: Latency percentiles in milliseconds and throughput.
+    """
+    latencies: list[float] = []
+    pending = list(reversed(queries))
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+    ) as client:
+
+        async def worker():
+            while pending:
+                industry_descr, job_title, job_description = pending.pop()
+                start = time.perf_counter()
+                response = await client.post(
+                    "/v1/soc-vector-store/search-index",
+                    json={
+                        "industry_descr": industry_descr,
+                        "job_title": job_title,
+                        "job_description": job_description,
+                    },
+                )
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "rps": len(latencies) / elapsed,
+    }
+
+
+def measure_query_encoders(
+    embed, queries: list[list[str]]
+) -> dict[str, dict[str, float]]:
+    """Measure the encoding time and agreement of each query encoder.
+
+    Args:
+        embed: The embedding handler whose model each encoder uses.
+        queries: The queries whose search terms are encoded.
+
+    Returns:
+        dict[str, dict[str, float]]: The milliseconds taken to encode a search
+        term and the mean cosine similarity to the default encoder, keyed by
+        encoder.
+    """
+    terms = list(
+        dict.fromkeys(term for query in queries for term in multi_query_terms(query))
+    )
+    encoders = {
+        QUERY_ENCODER_DEFAULT: embed.embeddings,
+        QUERY_ENCODER_CPU_INT8: create_query_encoder(QUERY_ENCODER_CPU_INT8, embed),
+    }
+    results, reference = {}, None
+    for name, encoder in encoders.items():
+        start = time.perf_counter()
+        vectors = np.asarray(encoder.embed_documents(terms), dtype=np.float32)
+        seconds = time.perf_counter() - start
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        reference = unit if reference is None else reference
+        results[name] = {
+            "latency_ms": seconds * 1000 / max(1, len(terms)),
+            "cosine": float(np.mean(np.einsum("ij,ij->i", unit, reference))),
+        }
+    return results
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process.
+
+    Returns:
+        float: The peak RSS in MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def create_embedding_handler(args: argparse.Namespace, directory: str):
+    """Create the embedding handler used to encode the index and queries.
+
+    Args:
+        args: The command line arguments.
+        directory: A scratch directory for the embedding handler.
+
+    Returns:
+        The stub embedding handler, or an `EmbeddingHandler` with the local model.
+    """
+    if args.encoder == "model":
+        # Only imported when the local model is benchmarked
+        from occupational_classification_utils.embed.embedding import (  # pylint: disable=import-outside-toplevel
+            EmbeddingHandler,
+        )
+
+        return EmbeddingHandler(db_dir=directory)
+
+    return StubEmbeddingHandler(
+        StubEncoder(args.dimensions, latency_ms=args.stub_latency_ms),
+        k_matches=args.k,
+        model_name="stub",
+    )
+
+
+def run(args: argparse.Namespace) -> dict:
+    """Run every benchmark.
+
+    Args:
+        args: The command line arguments.
+
+    Returns:
+        dict: The benchmark configuration, environment and results.
+    """
+    results: dict[str, dict] = {}
+
+    def record(name: str, value: float, unit: str, better: str):
+        results[name] = {"value": round(value, 4), "unit": unit, "better": better}
+        print(f"{name:<32} {value:>12.3f} {unit}")
+
+    record("startup.import_seconds", measure_import_seconds(), "s", "lower")
+
+    with tempfile.TemporaryDirectory() as directory:
+        embed = create_embedding_handler(args, directory)
+        snapshot_dir = os.path.join(directory, "snapshot")
+        record(
+            "startup.index_encode_seconds",
+            write_fixture_snapshot(snapshot_dir, embed, args.rows, args.seed),
+            "s",
+            "lower",
+        )
+
+        start = time.perf_counter()
+        snapshot = load_snapshot(snapshot_dir, checksums=FIXTURE_CHECKSUMS)
+        backend = ExactSearchBackend.from_snapshot(
+            snapshot,
+            embed,
+            dtype=args.dtype,
+            rerank_candidates=args.rerank_candidates,
+        )
+        record("startup.index_load_seconds", time.perf_counter() - start, "s", "lower")
+
+        vector_store_manager.embed = backend
+        vector_store_manager.status = backend.get_embed_config()
+        if vector_store_manager.cache is not None:
+            vector_store_manager.cache.set_index_version(backend.index_version)
+        vector_store_manager.ready_event.set()
+
+        queries = fixture_queries(args.queries, args.seed)
+        recall = measure_recall(
+            snapshot,
+            embed,
+            queries,
+            args.k,
+            rerank_candidates=args.rerank_candidates or 4 * args.k,
+            hierarchy_branches=args.hierarchy_branches,
+        )
+        for mode, mode_results in recall.items():
+            record(f"recall.{mode}.at_k", mode_results["recall"], "", "higher")
+            record(
+                f"memory.{mode}.matrix_mb", mode_results["matrix_mb"], "MiB", "lower"
+            )
+
+        for name, value in measure_search(queries, args.batch_size).items():
+            record(f"search.{name}", value, "queries/s", "higher")
+
+        for mode, mode_results in measure_query_modes(queries, args.k).items():
+            record(
+                f"query_mode.{mode}.latency_ms",
+                mode_results["latency_ms"],
+                "ms",
+                "lower",
+            )
+            record(
+                f"query_mode.{mode}.recall_at_k", mode_results["recall"], "", "higher"
+            )
+
+        if args.encoder == "model":
+            for mode, mode_results in measure_query_encoders(embed, queries).items():
+                record(
+                    f"query_encoder.{mode}.latency_ms",
+                    mode_results["latency_ms"],
+                    "ms",
+                    "lower",
+                )
+                record(
+                    f"query_encoder.{mode}.cosine", mode_results["cosine"], "", "higher"
+                )
+
+        for concurrency in args.concurrency:
+            api_results = asyncio.run(measure_api(queries, concurrency))
+            for name, value in api_results.items():
+                record(
+                    f"api.c{concurrency}.{name}",
+                    value,
+                    "requests/s" if name == "rps" else "ms",
+                    "higher" if name == "rps" else "lower",
+                )
+
+    record("memory.peak_rss_mb", peak_rss_mb(), "MiB", "lower")
+
+    return {
+        "config": {
+            "encoder": args.encoder,
+            "rows": args.rows,
+            "dimensions": args.dimensions,
+            "dtype": args.dtype,
+            "rerank_candidates": args.rerank_candidates,
+            "hierarchy_branches": args.hierarchy_branches,
+            "k": args.k,
+            "queries": args.queries,
+            "seed": args.seed,
+            "search_executor_workers": SEARCH_EXECUTOR_WORKERS,
+            "search_executor_queue_size": SEARCH_EXECUTOR_QUEUE_SIZE,
+            "search_batch_enabled": SEARCH_BATCH_ENABLED,
+            "search_cache_enabled": SEARCH_CACHE_ENABLED,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Compare benchmark results with a baseline.
+
+    Args:
+        results: The benchmark results.
+        baseline: The baseline results.
+        tolerance: The fraction a result may be worse than its baseline.
+
+    Returns:
+        list[str]: A description of each regression.
+    """
+    regressions = []
+    for name, expected in baseline["results"].items():
+        actual = results["results"].get(name)
+        if actual is None:
+            continue
+        if expected["better"] == "higher":
+            regressed = actual["value"] < expected["value"] * (1 - tolerance)
+        else:
+            regressed = actual["value"] > expected["value"] * (1 + tolerance)
+        if regressed:
+            regressions.append(
+                f"{name}: {actual['value']} {actual['unit']} "
+                f"(baseline {expected['value']} {expected['unit']})"
+            )
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse the command line arguments.
+
+    Args:
+        argv: The arguments, defaults to `sys.argv`.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--encoder", choices=("stub", "model"), default="stub")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0)
+    parser.add_argument("--rows", type=int, default=32000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--dtype", choices=STORAGE_DTYPES, default="float32")
+    parser.add_argument(
+        "--rerank-candidates",
+        type=int,
+        default=0,
+        help="Candidates re-ranked at full precision, 4 * k in the recall benchmark "
+        "when 0",
+    )
+    parser.add_argument(
+        "--hierarchy-branches",
+        type=int,
+        default=8,
+        help="Minor groups searched by the hierarchical recall benchmark.",
+    )
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, default=BENCHMARK_DIR / "results.json")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the results to the baseline file instead of comparing",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmarks and compare them with the baseline.
+
+    Args:
+        argv: The arguments, defaults to `sys.argv`.
+
+    Returns:
+        int: 0 if there were no regressions, 1 if any result regressed or
+            there is no baseline to compare with.
+    """
+    args = parse_args(argv)
+    if not args.update_baseline and not args.baseline.exists():
+        print(
+            f"No baseline at {args.baseline}, record one with "
+            "`make benchmark-baseline` or pass --update-baseline"
+        )
+        return 1
+
+    results = run(args)
+    args.output.write_text(json.dumps(results, indent=2) + "\n")
+    print(f"Results written to {args.output}")
+
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["config"] != results["config"]:
+        print("Benchmark configuration differs from the baseline")
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
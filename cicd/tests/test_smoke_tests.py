@@ -38,7 +38,8 @@ class TestSocVectorStoreApi:
         retry_strategy = Retry(
             total=5,  # maximum number of retries
             backoff_factor=7,
-            status_forcelist=[503],  # the HTTP status codes to retry on
+            status_forcelist=[429, 503],  # the HTTP status codes to retry on
+            respect_retry_after_header=True,  # wait as long as the service asks
         )
 
         # create an HTTP adapter with the retry strategy and mount it to the session
@@ -5,17 +5,25 @@ It defines the FastAPI application and the API endpoints.
 """
 
 from contextlib import asynccontextmanager
-from threading import Thread
+from threading import Event, Thread
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from survey_assist_utils.logging import get_logger
 
+from soc_classification_vector_store.api.routes.v1.admin import router as admin_router
+from soc_classification_vector_store.api.routes.v1.health import router as health_router
+from soc_classification_vector_store.api.routes.v1.metrics import (
+    router as metrics_router,
+)
 from soc_classification_vector_store.api.routes.v1.search_index import (
     router as search_index_router,
 )
 from soc_classification_vector_store.api.routes.v1.status import router as status_router
-from soc_classification_vector_store.utils.vector_store import vector_store_manager
+from soc_classification_vector_store.utils.vector_store import (
+    INDEX_WATCH_ENABLED,
+    vector_store_manager,
+)
 
 logger = get_logger(__name__)
 
@@ -33,16 +41,22 @@ async def lifespan(_app: FastAPI):
             if vector_store_manager.status["matches"] == 0:
                 vector_store_manager.status["matches"] = 1
             logger.info("Vector store is ready")
+            if INDEX_WATCH_ENABLED:
+                logger.info("Watching for new vector store snapshots")
+                vector_store_manager.watch_snapshot(stop=stop_watching)
         except Exception as e:  # pylint: disable=broad-exception-caught
             logger.error(f"Error loading vector store: {e}", exc_info=True)
             vector_store_manager.ready_event.set()  # Set event even on error to prevent hanging
 
+    stop_watching = Event()
+
     # Start loading in a separate thread
     Thread(target=background_load, daemon=True).start()
 
     yield  # Let the app run
 
     logger.info("Shutting down...")
+    stop_watching.set()
 
 
 app: FastAPI = FastAPI(
@@ -66,6 +80,9 @@ async def generic_error_handler(_request: Request, exc: Exception) -> JSONRespon
 # Include versioned routes
 app.include_router(status_router, prefix="/v1/soc-vector-store")
 app.include_router(search_index_router, prefix="/v1/soc-vector-store")
+app.include_router(metrics_router, prefix="/v1/soc-vector-store")
+app.include_router(admin_router, prefix="/v1/soc-vector-store")
+app.include_router(health_router, prefix="/v1/soc-vector-store")
 
 
 @app.get("/")
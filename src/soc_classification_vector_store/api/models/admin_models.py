@@ -0,0 +1,20 @@
+"""This module contains the models for the admin responses.
+
+The models in this module are used to represent the responses
+returned by the admin endpoints of the API.
+"""
+
+from pydantic import BaseModel
+
+
+class ReloadResponse(BaseModel):
+    """Model representing the response to a vector store reload request.
+
+    Attributes:
+        status (str): "reloading" once the reload has started.
+        index_version (str): The version of the index serving searches until
+            the reload completes.
+    """
+
+    status: str
+    index_version: str
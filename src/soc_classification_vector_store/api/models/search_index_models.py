@@ -4,15 +4,57 @@ The models in this module are used to represent the response
 returned by the API.
 """
 
-from pydantic import BaseModel
+from typing import Annotated, Literal
+
+from pydantic import BaseModel, Field
+
+# The largest number of queries accepted in a single batch request
+MAX_BATCH_QUERIES = 5000
+# The largest number of results that can be requested for a query
+MAX_RESULTS = 200
 
 
 class SearchIndexRequest(BaseModel):
-    """Model representing a request to the vector store search index."""
+    """Model representing a request to the vector store search index.
+
+    Attributes:
+        industry_descr (str): The industry description to search for.
+        job_title (str): The job title to search for.
+        job_description (str): The job description to search for.
+        major_groups (list[str] | None): The SOC 2020 major groups, 1 to 9,
+            that results are restricted to, or None for every group.
+        k (int | None): The number of results to return, or None for the
+            number of matches the index was loaded with.
+        max_distance (float | None): The largest distance of a result, or None
+            for no limit.
+        unique_codes (bool | None): Whether to return only the nearest result
+            for each SOC code, or None for the service default.
+        fields (list[str] | None): The fields of each result to return, or
+            None for every field.
+        query_mode (str | None): How the fields are searched: "multi" searches
+            each field and prefix of the fields, "skip_empty" leaves out empty
+            fields and "fused" searches one weighted combination of the fields.
+            None uses the service default.
+        exact_match (str | None): How exact job title matches in the coding
+            index are used when the lexical index is enabled: "direct" returns
+            them instead of searching, "merge" puts them ahead of the search
+            results and "off" ignores them. None uses the service default.
+    """
 
     industry_descr: str
     job_title: str
     job_description: str
+    major_groups: list[Annotated[str, Field(pattern=r"^[1-9]$")]] | None = Field(
+        default=None, min_length=1
+    )
+    k: int | None = Field(default=None, ge=1, le=MAX_RESULTS)
+    max_distance: float | None = Field(default=None, ge=0)
+    unique_codes: bool | None = None
+    fields: list[Literal["distance", "title", "code"]] | None = Field(
+        default=None, min_length=1
+    )
+    query_mode: Literal["multi", "skip_empty", "fused"] | None = None
+    exact_match: Literal["off", "direct", "merge"] | None = None
 
 
 class SearchIndexItem(BaseModel):
@@ -20,12 +62,12 @@ class SearchIndexItem(BaseModel):
 
     Attributes:
         distance (float): vector search distance.
-        title (str): soc title description.
+        title (str): soc title description, empty if not requested.
         code (str): soc code.
     """
 
     distance: float
-    title: str
+    title: str = ""
     code: str
 
 
@@ -33,3 +75,49 @@ class SearchIndexResponse(BaseModel):
     """Model representing the vector store search index multi response."""
 
     results: list[SearchIndexItem]
+
+
+class SearchIndexProjectedItem(BaseModel):
+    """Model representing an item of the results of a request with `fields`.
+
+    Only the fields requested are returned, so every field is optional.
+
+    Attributes:
+        distance (float | None): vector search distance, if requested.
+        title (str | None): soc title description, if requested.
+        code (str | None): soc code, if requested.
+    """
+
+    distance: float | None = None
+    title: str | None = None
+    code: str | None = None
+
+
+class SearchIndexProjectedResponse(BaseModel):
+    """Model representing the search index response of a request with `fields`."""
+
+    results: list[SearchIndexProjectedItem]
+
+
+class SearchIndexBatchRequest(BaseModel):
+    """Model representing a batch of requests to the vector store search index.
+
+    Attributes:
+        queries (list[SearchIndexRequest]): The queries to search, in order.
+    """
+
+    queries: list[SearchIndexRequest] = Field(
+        min_length=1, max_length=MAX_BATCH_QUERIES
+    )
+
+
+class SearchIndexBatchResponse(BaseModel):
+    """Model representing the vector store search index batch response.
+
+    Attributes:
+        results (list[SearchIndexResponse | SearchIndexProjectedResponse]): The
+            results for each query, in order, projected for queries with
+            `fields`.
+    """
+
+    results: list[SearchIndexResponse | SearchIndexProjectedResponse]
@@ -4,9 +4,125 @@ The models in this module are used to represent the response
 returned by the API.
 """
 
+from datetime import datetime
+
 from pydantic import BaseModel
 
 
+class BatchingStatus(BaseModel):
+    """Model representing the search request batching counters.
+
+    Attributes:
+        max_batch_size (int): The maximum number of queries in a batch.
+        max_wait_ms (float): The longest time a query waits for a batch to fill.
+        batches (int): The number of batches searched.
+        queries (int): The number of queries searched in batches.
+        full_batches (int): The number of batches that reached the maximum size.
+        mean_batch_size (float): The mean number of queries per batch.
+        mean_fill_rate (float): The mean batch size as a fraction of the maximum.
+    """
+
+    max_batch_size: int
+    max_wait_ms: float
+    batches: int
+    queries: int
+    full_batches: int
+    mean_batch_size: float
+    mean_fill_rate: float
+
+
+class CacheLevelStatus(BaseModel):
+    """Model representing the counters of one level of the search cache.
+
+    Attributes:
+        entries (int): The number of cached entries.
+        max_entries (int): The maximum number of cached entries.
+        hits (int): The number of lookups that found a live entry.
+        misses (int): The number of lookups that did not.
+        hit_rate (float): The fraction of lookups that were hits.
+    """
+
+    entries: int
+    max_entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+
+
+class CacheStatus(BaseModel):
+    """Model representing the search cache counters.
+
+    Attributes:
+        index_version (str): The index version the cached entries belong to.
+        embeddings (CacheLevelStatus): The query term embedding cache counters.
+        results (CacheLevelStatus): The search result cache counters.
+    """
+
+    index_version: str
+    embeddings: CacheLevelStatus
+    results: CacheLevelStatus
+
+
+class IndexBuildStatus(BaseModel):
+    """Model representing the progress of the parallel index build.
+
+    Attributes:
+        state (str): "building" while the build runs, "complete" once it is done.
+        rows_embedded (int): The number of index rows embedded, including rows
+            resumed from checkpoints.
+        total_rows (int): The number of rows in the index.
+        chunks_completed (int): The number of chunks embedded.
+        total_chunks (int): The number of chunks the rows are split into.
+        elapsed_seconds (float): The time since the build started.
+        eta_seconds (float | None): The estimated time remaining, if known.
+    """
+
+    state: str
+    rows_embedded: int
+    total_rows: int
+    chunks_completed: int
+    total_chunks: int
+    elapsed_seconds: float
+    eta_seconds: float | None = None
+
+
+class IndexMemoryStatus(BaseModel):
+    """Model representing the memory footprint of the loaded index.
+
+    Attributes:
+        storage_dtype (str): The dtype the embedding matrix is searched in.
+        matrix_bytes (int): The size of the embedding matrix with its scales
+            and norms.
+        float32_matrix_bytes (int): The size the matrix would have as float32.
+        metadata_bytes (int): The size of the document metadata.
+        memory_mapped (bool): Whether the matrix is memory-mapped from the
+            snapshot, and so shared between worker processes.
+        rerank_candidates (int): The number of candidates re-ranked at full
+            precision for each search term, 0 if re-ranking is disabled.
+    """
+
+    storage_dtype: str
+    matrix_bytes: int
+    float32_matrix_bytes: int
+    metadata_bytes: int
+    memory_mapped: bool
+    rerank_candidates: int
+
+
+class AdmissionStatus(BaseModel):
+    """Model representing the search admission control counters.
+
+    Attributes:
+        max_in_flight (int): The number of search requests admitted at once.
+        in_flight (int): The number of search requests being served.
+        rejected (int): The number of search requests rejected with a 429.
+    """
+
+    max_in_flight: int
+    in_flight: int
+    rejected: int
+
+
 class StatusResponse(BaseModel):
     """Model representing the vector store status response.
 
@@ -14,6 +130,21 @@ class StatusResponse(BaseModel):
         embedding_model_name (str): The name of the embeddings model.
         matches (int): The number of nearest matches initialised in the vector store.
         status (str): The status of the vector store.
+        batching (BatchingStatus | None): Request batching counters, if enabled.
+        cache (CacheStatus | None): Search cache counters, if enabled.
+        index_build (IndexBuildStatus | None): Progress of the parallel index
+            build, if one has started.
+        index_version (str): The version of the index serving searches.
+        query_encoder (str): The encoder of the queries and of the index.
+        index_loaded_at (datetime | None): When the index was loaded.
+        reloading (bool): Whether a new index is being loaded to swap in.
+        reload_error (str | None): The error of the last reload, if it failed.
+        index_memory (IndexMemoryStatus | None): The memory footprint of the
+            index, if it is held by the exact search backend.
+        admission (AdmissionStatus | None): Search admission control counters,
+            if a limit is set.
+        startup_phases (dict[str, float] | None): The time in seconds spent in
+            each phase of the last index load, if one has started.
     """
 
     status: str
@@ -25,3 +156,25 @@ class StatusResponse(BaseModel):
     # soc_condensed_file: str
     matches: int
     index_size: int
+    batching: BatchingStatus | None = None
+    cache: CacheStatus | None = None
+    index_build: IndexBuildStatus | None = None
+    index_version: str = ""
+    query_encoder: str = ""
+    index_loaded_at: datetime | None = None
+    reloading: bool = False
+    reload_error: str | None = None
+    index_memory: IndexMemoryStatus | None = None
+    admission: AdmissionStatus | None = None
+    startup_phases: dict[str, float] | None = None
+
+
+class HealthResponse(BaseModel):
+    """Model representing the response of the health endpoints.
+
+    Attributes:
+        status (str): "alive" from the liveness probe, "ready" or "loading"
+            from the readiness probe.
+    """
+
+    status: str
@@ -0,0 +1,63 @@
+"""Module that provides the admin endpoints for the SOC Vector Store API.
+
+This module contains the admin endpoints for the SOC Vector Store API.
+It defines the endpoint that reloads the vector store without downtime.
+"""
+
+import os
+import secrets
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from survey_assist_utils.logging import get_logger
+
+from soc_classification_vector_store.api.models.admin_models import ReloadResponse
+from soc_classification_vector_store.utils.vector_store import vector_store_manager
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+# Define the dependency at module level
+vector_store_dependency = Depends(lambda: vector_store_manager)
+
+# Admin requests must send this token in the X-Admin-Token header, and the
+# admin endpoints are disabled when it is not set
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+
+@router.post("/reload", response_model=ReloadResponse, status_code=202)
+async def post_reload(
+    vector_store=vector_store_dependency,
+    x_admin_token: str = Header(default=""),
+) -> ReloadResponse:
+    """Reload the vector store in the background and swap it in when loaded.
+
+    The current index keeps serving searches while the new one is loaded,
+    and searches already running when it is swapped in finish on the old one.
+
+    Args:
+        vector_store: Vector store manager instance
+        x_admin_token: The admin token, which must be `ADMIN_API_TOKEN`
+
+    Returns:
+        ReloadResponse: The reload status and the version of the current index.
+
+    Raises:
+        HTTPException: If `ADMIN_API_TOKEN` is not set, the admin token is
+            wrong, or the vector store is still loading or already reloading
+    """
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(
+            status_code=403, detail="Admin endpoints are disabled, set ADMIN_API_TOKEN"
+        )
+    if not secrets.compare_digest(x_admin_token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+    if not vector_store.ready_event.is_set():
+        raise HTTPException(status_code=409, detail="Vector store is still loading")
+
+    if not vector_store.start_reload():
+        raise HTTPException(status_code=409, detail="Vector store is already reloading")
+
+    logger.info("Vector store reload requested")
+    return ReloadResponse(status="reloading", index_version=vector_store.index_version)
@@ -0,0 +1,57 @@
+"""Module that provides the health endpoints for the SOC Vector Store API.
+
+This module contains the liveness and readiness probes of the SOC Vector Store
+API. The API serves requests while the index loads in the background, so the
+liveness probe passes as soon as it starts, and the readiness probe once an
+index is loaded and searches can be answered.
+"""
+
+from fastapi import APIRouter, Depends, Response
+
+from soc_classification_vector_store.api.models.status_models import HealthResponse
+from soc_classification_vector_store.utils.vector_store import (
+    INDEX_LOADING_RETRY_AFTER_SECONDS,
+    vector_store_manager,
+)
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+# Define the dependency at module level
+vector_store_dependency = Depends(lambda: vector_store_manager)
+
+
+@router.get("/live", response_model=HealthResponse)
+async def get_live() -> HealthResponse:
+    """Report that the API is up, whether or not the index is loaded.
+
+    Returns:
+        HealthResponse: The "alive" status.
+    """
+    return HealthResponse(status="alive")
+
+
+@router.get(
+    "/ready",
+    response_model=HealthResponse,
+    responses={503: {"model": HealthResponse}},
+)
+async def get_ready(
+    response: Response, vector_store=vector_store_dependency
+) -> HealthResponse:
+    """Report whether an index is loaded and searches can be answered.
+
+    While the index loads, or if it failed to load, the response is a 503 with
+    a `Retry-After` header.
+
+    Args:
+        response: The response, whose status is set while loading.
+        vector_store: Vector store manager instance
+
+    Returns:
+        HealthResponse: The "ready" or "loading" status.
+    """
+    if vector_store.ready:
+        return HealthResponse(status="ready")
+    response.status_code = 503
+    response.headers["Retry-After"] = str(INDEX_LOADING_RETRY_AFTER_SECONDS)
+    return HealthResponse(status="loading")
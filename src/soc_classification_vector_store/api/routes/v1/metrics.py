@@ -0,0 +1,68 @@
+"""Module that provides the metrics endpoint for the SOC Vector Store API.
+
+This module contains the metrics endpoint for the SOC Vector Store API.
+It returns the service metrics in the Prometheus text exposition format.
+"""
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from soc_classification_vector_store.utils.metrics import REGISTRY, render_samples
+from soc_classification_vector_store.utils.vector_store import vector_store_manager
+
+router = APIRouter(tags=["Metrics"])
+
+# Define the dependency at module level
+vector_store_dependency = Depends(lambda: vector_store_manager)
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(vector_store=vector_store_dependency) -> PlainTextResponse:
+    """Get the service metrics.
+
+    Args:
+        vector_store: Vector store manager instance
+
+    Returns:
+        PlainTextResponse: The metrics in the Prometheus text exposition format.
+    """
+    lines = REGISTRY.render()
+    lines.extend(
+        render_samples(
+            "vector_store_ready",
+            "gauge",
+            "Whether the vector store is loaded and ready to search.",
+            [({}, int(vector_store.ready))],
+        )
+    )
+
+    batching = vector_store.batching_status()
+    if batching is not None:
+        for name in ("batches", "queries", "full_batches"):
+            lines.extend(
+                render_samples(
+                    f"vector_store_batch_{name}_total",
+                    "counter",
+                    f"Search batching {name.replace('_', ' ')} so far.",
+                    [({}, batching[name])],
+                )
+            )
+
+    cache = vector_store.cache_status()
+    if cache is not None:
+        for name in ("hits", "misses"):
+            lines.extend(
+                render_samples(
+                    f"vector_store_cache_{name}_total",
+                    "counter",
+                    f"Search cache {name} by cache level.",
+                    [
+                        ({"level": level}, cache[level][name])
+                        for level in ("embeddings", "results")
+                    ],
+                )
+            )
+
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=PROMETHEUS_MEDIA_TYPE)
@@ -4,53 +4,399 @@ This module contains the search endpoint for the SOC Vector Store API.
 It defines the search endpoint and returns search results from the vector store.
 """
 
-from fastapi import APIRouter, HTTPException, Request
+import asyncio
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from typing import Annotated, TypeVar
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from survey_assist_utils.logging import get_logger
 
 from soc_classification_vector_store.api.models.search_index_models import (
+    SearchIndexBatchRequest,
+    SearchIndexBatchResponse,
+    SearchIndexProjectedResponse,
     SearchIndexRequest,
     SearchIndexResponse,
 )
-from soc_classification_vector_store.utils.vector_store import vector_store_manager
+from soc_classification_vector_store.utils.executor import (
+    SearchDeadlineExceededError,
+    SearchQueueFullError,
+    SearchRejectedError,
+)
+from soc_classification_vector_store.utils.metrics import (
+    UNAVAILABLE_RESPONSES,
+    server_timing,
+    stage_timings,
+    start_request,
+    timed_stage,
+    track_request,
+)
+from soc_classification_vector_store.utils.search_options import SearchOptions
+from soc_classification_vector_store.utils.serialisation import (
+    MSGPACK_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    batch_document,
+    encode,
+    negotiate_media_type,
+    search_document,
+)
+from soc_classification_vector_store.utils.vector_store import (
+    INDEX_LOADING_RETRY_AFTER_SECONDS,
+    SEARCH_REQUEST_TIMEOUT_MS,
+    SEARCH_RETRY_AFTER_SECONDS,
+    vector_store_manager,
+)
 
 logger = get_logger(__name__)
 
 router: APIRouter = APIRouter()
 
+# Status returned when the client disconnects before the search completes,
+# which it never reads
+CLIENT_CLOSED_REQUEST = 499
+
+# The time in milliseconds the client will wait for the search
+RequestTimeout = Annotated[float | None, Header(gt=0)]
 
-@router.post("/search-index", response_model=SearchIndexResponse)
+T = TypeVar("T")
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the client disconnects before its search completes."""
+
+
+@router.post(
+    "/search-index",
+    response_model=SearchIndexResponse | SearchIndexProjectedResponse,
+    responses={200: {"content": {MSGPACK_MEDIA_TYPE: {}}}},
+)
 async def post_search_index(
-    _request: Request, payload: SearchIndexRequest
-) -> SearchIndexResponse:
+    request: Request,
+    payload: SearchIndexRequest,
+    x_request_timeout_ms: RequestTimeout = None,
+) -> Response:
     """Get the indexes from the vector store.
 
+    The results are encoded as JSON, or as MessagePack if the request accepts
+    `application/msgpack`. The time spent in each stage of the search is
+    returned in the `Server-Timing` header. The search is given up if it does
+    not complete within `X-Request-Timeout-Ms` or the client disconnects.
+
     Args:
-        _request: FastAPI request object (unused)
+        request: FastAPI request object, used to negotiate the response format
+            and detect the client disconnecting
         payload: Search request payload
+        x_request_timeout_ms: The time the client will wait for the search
+
+    Returns:
+        Response: The `SearchIndexResponse` search results from the vector
+        store, or the `SearchIndexProjectedResponse` if `fields` is given
+
+    Raises:
+        HTTPException: If the vector store is not ready or overloaded, the
+            deadline passes or there is an error searching
+    """
+    with track_request("search_index") as timings:
+        try:
+            search_results = await _cancel_on_disconnect(
+                request,
+                vector_store_manager.asearch(
+                    industry_descr=payload.industry_descr,
+                    job_title=payload.job_title,
+                    job_description=payload.job_description,
+                    options=_search_options(payload),
+                    deadline=_deadline(x_request_timeout_ms),
+                ),
+            )
+            media_type = negotiate_media_type(request.headers.get("accept", ""))
+            with timed_stage("serialise"):
+                content = encode(
+                    search_document(search_results, payload.fields), media_type
+                )
+            logger.info("Search completed successfully")
+            return Response(
+                content=content,
+                media_type=media_type,
+                headers={"Server-Timing": server_timing(timings), "Vary": "Accept"},
+            )
+        except ClientDisconnectedError:
+            logger.info("Client disconnected, search cancelled")
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+        except RuntimeError as e:
+            raise _search_error(e) from e
+        except Exception as e:
+            logger.error(f"Error searching vector store: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error searching vector store: {e!s}",
+            ) from e
+
+
+@router.post(
+    "/search-index/batch",
+    response_model=SearchIndexBatchResponse,
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}, MSGPACK_MEDIA_TYPE: {}}}},
+)
+async def post_search_index_batch(
+    request: Request,
+    payload: SearchIndexBatchRequest,
+    x_request_timeout_ms: RequestTimeout = None,
+) -> Response:
+    """Get the indexes from the vector store for a batch of queries.
+
+    The results are returned in the same order as the queries. If the request
+    prefers `application/x-ndjson` the results are streamed back as one JSON
+    line per query as each chunk of the batch completes, otherwise they are
+    encoded as JSON, or as MessagePack if the request prefers
+    `application/msgpack`, by the quality of each in `Accept`. The time spent
+    in each stage of the search, up to the first chunk when streaming, is
+    returned in the `Server-Timing` header.
+    The search is given up if it does not complete within
+    `X-Request-Timeout-Ms` or the client disconnects. A streamed request is
+    tracked as in flight, and holds its admission slot, until the stream ends.
+
+    Args:
+        request: FastAPI request object, used to negotiate the response format
+            and detect the client disconnecting
+        payload: Batch search request payload
+        x_request_timeout_ms: The time the client will wait for every query
+
+    Returns:
+        Response: The `SearchIndexBatchResponse` search results for each query,
+        or a stream of one `SearchIndexResponse` per line
+
+    Raises:
+        HTTPException: If the vector store is not ready or overloaded, the
+            deadline passes or there is an error searching
+    """
+    queries = [
+        [query.industry_descr, query.job_title, query.job_description]
+        for query in payload.queries
+    ]
+    options = [_search_options(query) for query in payload.queries]
+    fields = [query.fields for query in payload.queries]
+    media_type = negotiate_media_type(request.headers.get("accept", ""), stream=True)
+    chunks = vector_store_manager.asearch_batch(
+        queries, options=options, deadline=_deadline(x_request_timeout_ms)
+    )
+    # A streamed request is finished by the stream once it ends
+    finish_request = start_request("search_index_batch")
+    streaming = False
+    with stage_timings() as timings:
+        try:
+            # The first chunk is searched before responding so that errors
+            # such as the vector store not being ready get a status
+            results = await _cancel_on_disconnect(request, chunks.__anext__())
+            if media_type == NDJSON_MEDIA_TYPE:
+                logger.info(f"Streaming batch search of {len(queries)} queries")
+                streaming = True
+                return StreamingResponse(
+                    _stream_ndjson(results, chunks, fields, finish_request),
+                    media_type=NDJSON_MEDIA_TYPE,
+                    headers={"Server-Timing": server_timing(timings), "Vary": "Accept"},
+                )
+            results += await _cancel_on_disconnect(request, _gather(chunks))
+
+            with timed_stage("serialise"):
+                content = encode(batch_document(results, fields), media_type)
+            logger.info(
+                f"Batch search of {len(queries)} queries completed successfully"
+            )
+            return Response(
+                content=content,
+                media_type=media_type,
+                headers={"Server-Timing": server_timing(timings), "Vary": "Accept"},
+            )
+        except ClientDisconnectedError:
+            logger.info("Client disconnected, search cancelled")
+            return Response(status_code=CLIENT_CLOSED_REQUEST)
+        except RuntimeError as e:
+            raise _search_error(e) from e
+        except Exception as e:
+            logger.error(f"Error searching vector store: {e}", exc_info=True)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error searching vector store: {e!s}",
+            ) from e
+        finally:
+            if not streaming:
+                # Release the admission slot of a batch given up part way
+                await _close(chunks)
+                finish_request()
+
+
+def _search_options(query: SearchIndexRequest) -> SearchOptions | None:
+    """Build the search options of a query.
+
+    Args:
+        query: The search request.
+
+    Returns:
+        SearchOptions | None: The search options, or None for a default search.
+    """
+    return SearchOptions.create(
+        major_groups=query.major_groups,
+        k=query.k,
+        max_distance=query.max_distance,
+        unique_codes=query.unique_codes,
+        fields=query.fields,
+        query_mode=query.query_mode,
+        exact_match=query.exact_match,
+    )
+
+
+def _deadline(timeout_ms: float | None) -> float | None:
+    """Return the deadline of a search request.
+
+    Args:
+        timeout_ms: The time the client will wait, if it set one.
+
+    Returns:
+        float | None: The `time.monotonic` time by which the search must
+        complete, or None if neither the client nor the service sets a timeout.
+    """
+    timeout_ms = timeout_ms or SEARCH_REQUEST_TIMEOUT_MS
+    return time.monotonic() + timeout_ms / 1000 if timeout_ms > 0 else None
+
+
+def _search_error(error: RuntimeError) -> HTTPException:
+    """Build the response to a search that could not be served.
+
+    Requests rejected by admission control get a 429 and those that find the
+    search queue full or the vector store loading a 503, each with a
+    `Retry-After` header. Requests whose deadline passed get a 504.
+
+    Args:
+        error: The error raised by the vector store manager.
+
+    Returns:
+        HTTPException: The error response.
+    """
+    if isinstance(error, SearchDeadlineExceededError):
+        logger.warning(f"Search deadline exceeded: {error}")
+        return HTTPException(status_code=504, detail=str(error))
+    if isinstance(error, SearchRejectedError):
+        logger.warning(f"Search request rejected: {error}")
+        return HTTPException(
+            status_code=429,
+            detail=str(error),
+            headers={"Retry-After": str(SEARCH_RETRY_AFTER_SECONDS)},
+        )
+
+    if isinstance(error, SearchQueueFullError):
+        logger.warning(f"Search request shed: {error}")
+        UNAVAILABLE_RESPONSES.inc(reason="overloaded")
+        retry_after = SEARCH_RETRY_AFTER_SECONDS
+    else:
+        logger.error(f"Vector store error: {error}", exc_info=True)
+        UNAVAILABLE_RESPONSES.inc(reason="loading")
+        retry_after = INDEX_LOADING_RETRY_AFTER_SECONDS
+    return HTTPException(
+        status_code=503, detail=str(error), headers={"Retry-After": str(retry_after)}
+    )
+
+
+async def _cancel_on_disconnect(request: Request, search: Awaitable[T]) -> T:
+    """Wait for a search, cancelling it if the client disconnects first.
+
+    Args:
+        request: The request the search serves.
+        search: The search to wait for.
 
     Returns:
-        SearchIndexResponse: Search results from the vector store
+        The result of the search.
 
     Raises:
-        HTTPException: If the vector store is not ready or there is an error searching
+        ClientDisconnectedError: If the client disconnects first.
     """
+    search_task = asyncio.ensure_future(search)
+    disconnect_task = asyncio.ensure_future(_wait_for_disconnect(request))
     try:
-        search_results = vector_store_manager.search(
-            industry_descr=payload.industry_descr,
-            job_title=payload.job_title,
-            job_description=payload.job_description,
+        done, _pending = await asyncio.wait(
+            {search_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED
         )
-        logger.info("Search completed successfully")
-        return SearchIndexResponse(results=search_results)
-    except RuntimeError as e:
-        logger.error(f"Vector store error: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=503,
-            detail=str(e),
-        ) from e
-    except Exception as e:
-        logger.error(f"Error searching vector store: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error searching vector store: {e!s}",
-        ) from e
+    except asyncio.CancelledError:
+        search_task.cancel()
+        raise
+    finally:
+        disconnect_task.cancel()
+
+    if search_task in done:
+        return search_task.result()
+    search_task.cancel()
+    raise ClientDisconnectedError("Client disconnected")
+
+
+async def _wait_for_disconnect(request: Request):
+    """Wait until the client of a request, whose body has been read, disconnects.
+
+    Args:
+        request: The request to watch.
+    """
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _gather(chunks: AsyncIterator[list[list[dict]]]) -> list[list[dict]]:
+    """Collect the results of the remaining chunks of a batch search.
+
+    Args:
+        chunks: The results of the remaining chunks.
+
+    Returns:
+        list[list[dict]]: The results of each query, in order.
+    """
+    return [result async for chunk in chunks for result in chunk]
+
+
+async def _close(chunks: AsyncGenerator[list[list[dict]]]):
+    """Close a batch search, releasing its admission slot.
+
+    Args:
+        chunks: The results of the remaining chunks. If a cancelled task is
+            still searching the next chunk, the cancellation closes it instead.
+    """
+    if not chunks.ag_running:
+        await chunks.aclose()
+
+
+async def _stream_ndjson(
+    first_chunk: list[list[dict]],
+    chunks: AsyncGenerator[list[list[dict]]],
+    fields: list[list[str] | None],
+    finish_request: Callable[[], None],
+) -> AsyncIterator[bytes]:
+    """Encode batch search results as newline delimited JSON.
+
+    However the stream ends, including the client disconnecting, the search of
+    the remaining chunks is closed, releasing its admission slot, and the
+    request is finished.
+
+    Args:
+        first_chunk: The results of the first chunk, already searched.
+        chunks: The results of the remaining chunks.
+        fields: The result fields requested by each query.
+        finish_request: Records that the request has finished.
+
+    Yields:
+        bytes: One `SearchIndexResponse` JSON document per query.
+    """
+    queries = iter(fields)
+
+    def encode_chunk(chunk: list[list[dict]]) -> bytes:
+        return b"".join(
+            encode(search_document(result, next(queries))) + b"\n" for result in chunk
+        )
+
+    try:
+        yield encode_chunk(first_chunk)
+        async for chunk in chunks:
+            yield encode_chunk(chunk)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # The status code has already been sent, so the stream is cut short
+        logger.error(f"Error streaming batch search: {e}", exc_info=True)
+    finally:
+        await _close(chunks)
+        finish_request()
@@ -6,8 +6,16 @@ It defines the configuration endpoint and returns the current configuration sett
 
 from fastapi import APIRouter, Depends
 
-from soc_classification_vector_store.api.models.status_models import StatusResponse
+from soc_classification_vector_store.api.models.status_models import (
+    AdmissionStatus,
+    BatchingStatus,
+    CacheStatus,
+    IndexBuildStatus,
+    IndexMemoryStatus,
+    StatusResponse,
+)
 from soc_classification_vector_store.utils.common import safe_int
+from soc_classification_vector_store.utils.metrics import startup_phases
 from soc_classification_vector_store.utils.vector_store import vector_store_manager
 
 router = APIRouter(tags=["Status"])
@@ -26,6 +34,12 @@ async def get_status(vector_store=vector_store_dependency) -> StatusResponse:
     Returns:
         StatusResponse: A dictionary containing the current status.
     """
+    batching = vector_store.batching_status()
+    cache = vector_store.cache_status()
+    index_build = vector_store.build_status()
+    index_memory = vector_store.memory_status()
+    admission = vector_store.admission_status()
+    phases = startup_phases()
     status_resp = StatusResponse(
         status="ready" if vector_store.ready_event.is_set() else "loading",
         embedding_model_name=str(vector_store.status.get("embedding_model_name", "")),
@@ -36,5 +50,20 @@ async def get_status(vector_store=vector_store_dependency) -> StatusResponse:
         # soc_condensed_file=str(vector_store.status.get("soc_condensed", "")),
         matches=safe_int(vector_store.status.get("matches", 0)),
         index_size=safe_int(vector_store.status.get("index_size", 0)),
+        batching=BatchingStatus(**batching) if batching is not None else None,
+        cache=CacheStatus(**cache) if cache is not None else None,
+        index_build=(
+            IndexBuildStatus(**index_build) if index_build is not None else None
+        ),
+        index_version=vector_store.index_version,
+        query_encoder=str(vector_store.status.get("query_encoder", "")),
+        index_loaded_at=vector_store.loaded_at,
+        reloading=vector_store.reloading,
+        reload_error=vector_store.reload_error or None,
+        index_memory=(
+            IndexMemoryStatus(**index_memory) if index_memory is not None else None
+        ),
+        admission=AdmissionStatus(**admission) if admission is not None else None,
+        startup_phases=phases or None,
     )
     return status_resp
@@ -0,0 +1,557 @@
+"""Provides sync and asyncio clients for the SOC Vector Store API.
+
+This module contains the clients other services use to classify survey
+responses with the API, instead of calling it with a new connection each
+time. Both clients:
+
+- keep a pool of keep-alive HTTP connections for the life of the client.
+- send many queries as batch requests of up to `batch_size` queries.
+- retry requests answered with a 429 or 503, or that fail to connect, after
+  a jittered exponential backoff that waits at least as long as the
+  `Retry-After` header asks.
+- can wait for the index to load, polling `/status` until it is "ready".
+
+`AsyncVectorStoreClient.search` also coalesces concurrent searches into batch
+requests automatically. Requests and responses are the pydantic models of
+`search_index_models`, shared with the API. The results of a query with
+`fields` are a `SearchIndexProjectedResponse`, in which only the requested
+fields are set. The clients need httpx, installed with the `client` extra:
+
+    with VectorStoreClient("http://localhost:8088/v1/soc-vector-store") as client:
+        client.wait_until_ready()
+        response = client.search(
+            {"industry_descr": "school", "job_title": "teacher", "job_description": ""}
+        )
+"""
+
+import asyncio
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+try:
+    # The clients are optional, needing httpx
+    import httpx
+except ImportError as error:  # pragma: no cover - depends on the environment
+    raise ImportError(
+        "The SOC Vector Store clients need httpx, install it with "
+        "`pip install 'soc-classification-vector-store[client]'` "
+        "or `pip install httpx`"
+    ) from error
+
+from soc_classification_vector_store.api.models.search_index_models import (
+    MAX_BATCH_QUERIES,
+    SearchIndexBatchRequest,
+    SearchIndexBatchResponse,
+    SearchIndexProjectedResponse,
+    SearchIndexRequest,
+    SearchIndexResponse,
+)
+
+SEARCH_PATH = "/search-index"
+BATCH_PATH = "/search-index/batch"
+STATUS_PATH = "/status"
+
+# Statuses of requests that may succeed if sent again later
+RETRY_STATUSES = frozenset({429, 503})
+
+DEFAULT_TIMEOUT_SECONDS = 30.0
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_MAX_WAIT_MS = 5.0
+
+Query = SearchIndexRequest | dict
+# The results of a query, projected if the query has `fields`
+SearchResult = SearchIndexResponse | SearchIndexProjectedResponse
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How requests that could not be served are retried.
+
+    Attributes:
+        attempts (int): The number of times a request is sent, at least 1.
+        backoff_seconds (float): The base of the exponential backoff.
+        max_backoff_seconds (float): The longest backoff between attempts.
+    """
+
+    attempts: int = 5
+    backoff_seconds: float = 0.5
+    max_backoff_seconds: float = 30.0
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Return the time to wait before sending a request again.
+
+        The backoff is drawn uniformly up to its exponential bound, so clients
+        retrying at the same time spread out. When the service asks for a
+        `Retry-After`, the wait is that long plus up to one base backoff.
+
+        Args:
+            attempt: The number of attempts made so far, from 1.
+            retry_after: The seconds the service asked to wait, if any.
+
+        Returns:
+            float: The seconds to wait.
+        """
+        jitter = random.random()  # noqa: S311
+        if retry_after is not None:
+            return retry_after + jitter * self.backoff_seconds
+        bound = self.backoff_seconds * 2 ** (attempt - 1)
+        return jitter * min(self.max_backoff_seconds, bound)
+
+
+def retry_after_seconds(response: httpx.Response) -> float | None:
+    """Parse the `Retry-After` header of a response.
+
+    Args:
+        response: The response.
+
+    Returns:
+        float | None: The seconds to wait, or None if the header is missing
+        or invalid.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.now(UTC)).total_seconds())
+
+
+class _ClientBase:  # pylint: disable=too-few-public-methods
+    """Request building and retry decisions shared by both clients.
+
+    Attributes:
+        retry (RetryPolicy): How failed requests are retried.
+        batch_size (int): The largest number of queries in a batch request.
+    """
+
+    def __init__(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+        self,
+        base_url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        timeout: float | None = DEFAULT_TIMEOUT_SECONDS,
+        retry: RetryPolicy | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        transport=None,
+    ):
+        """Initialise the client.
+
+        Args:
+            base_url: The URL the API routes are under, for example
+                "https://host/v1/soc-vector-store".
+            headers: Headers sent with every request, such as `Authorization`.
+            timeout: The seconds to wait for each request, or None to wait
+                indefinitely. The API gives up searches it cannot complete in
+                time, as it is sent in the `X-Request-Timeout-Ms` header.
+            retry: How failed requests are retried.
+            batch_size: The largest number of queries in a batch request.
+            max_connections: The largest number of pooled connections.
+            transport: The httpx transport, for example to call an app in
+                process or in tests.
+        """
+        self.retry = retry or RetryPolicy()
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_QUERIES))
+        headers = dict(headers or {})
+        if timeout:
+            headers.setdefault("X-Request-Timeout-Ms", str(int(timeout * 1000)))
+        self._client_options = {
+            "base_url": base_url.rstrip("/"),
+            "headers": headers,
+            "timeout": timeout,
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            "transport": transport,
+        }
+
+    def _retry_delay(
+        self, attempt: int, response: httpx.Response | None
+    ) -> float | None:
+        """Decide whether to send a request again.
+
+        Args:
+            attempt: The number of attempts made so far, from 1.
+            response: The response, or None if the request failed to send.
+
+        Returns:
+            float | None: The seconds to wait before the next attempt, or None
+            if the request is not retried.
+        """
+        if attempt >= self.retry.attempts:
+            return None
+        if response is None:
+            return self.retry.delay(attempt)
+        if response.status_code not in RETRY_STATUSES:
+            return None
+        return self.retry.delay(attempt, retry_after_seconds(response))
+
+    def _poll_delay(self, attempt: int, response: httpx.Response | None) -> float:
+        """Return the time to wait before polling `/status` again.
+
+        Args:
+            attempt: The number of polls made so far, from 1.
+            response: The `/status` response, or None if it failed to send.
+
+        Returns:
+            float: The seconds to wait.
+        """
+        retry_after = None if response is None else retry_after_seconds(response)
+        return self.retry.delay(min(attempt, self.retry.attempts), retry_after)
+
+    def _batches(self, queries: list[Query]) -> list[str]:
+        """Encode queries as the bodies of batch requests.
+
+        Args:
+            queries: The queries, in order.
+
+        Returns:
+            list[str]: The JSON body of each batch request.
+        """
+        requests = [_as_request(query) for query in queries]
+        return [
+            SearchIndexBatchRequest(
+                queries=requests[start : start + self.batch_size]
+            ).model_dump_json(exclude_none=True)
+            for start in range(0, len(requests), self.batch_size)
+        ]
+
+    @staticmethod
+    def _ready(response: httpx.Response) -> bool:
+        """Check whether a `/status` response reports the index loaded.
+
+        Args:
+            response: The `/status` response.
+
+        Returns:
+            bool: True if the index is ready to search.
+        """
+        return response.is_success and response.json().get("status") == "ready"
+
+
+class VectorStoreClient(_ClientBase):
+    """Synchronous client of the SOC Vector Store API."""
+
+    def __init__(self, base_url: str, **options):
+        """Initialise the client and its connection pool.
+
+        Args:
+            base_url: The URL the API routes are under.
+            **options: The options of `_ClientBase`.
+        """
+        super().__init__(base_url, **options)
+        self._client = httpx.Client(**self._client_options)
+
+    def __enter__(self) -> "VectorStoreClient":
+        """Return the client, closed on leaving the block."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the client."""
+        self.close()
+
+    def close(self):
+        """Close the pooled connections."""
+        self._client.close()
+
+    def search(self, query: Query) -> SearchResult:
+        """Search for the nearest SOC index entries to a query.
+
+        Args:
+            query: The query, as a `SearchIndexRequest` or its fields.
+
+        Returns:
+            SearchResult: The results of the query, a
+            `SearchIndexProjectedResponse` if the query has `fields`.
+
+        Raises:
+            httpx.HTTPStatusError: If the request fails after its retries.
+        """
+        request = _as_request(query)
+        response = self._send(
+            "POST", SEARCH_PATH, content=request.model_dump_json(exclude_none=True)
+        )
+        response_model = (
+            SearchIndexProjectedResponse if request.fields else SearchIndexResponse
+        )
+        return response_model.model_validate_json(response.content)
+
+    def search_many(self, queries: list[Query]) -> list[SearchResult]:
+        """Search for many queries in batch requests of up to `batch_size`.
+
+        Args:
+            queries: The queries, in order.
+
+        Returns:
+            list[SearchResult]: The results of each query, in order.
+
+        Raises:
+            httpx.HTTPStatusError: If a request fails after its retries.
+        """
+        return [
+            result
+            for body in self._batches(queries)
+            for result in SearchIndexBatchResponse.model_validate_json(
+                self._send("POST", BATCH_PATH, content=body).content
+            ).results
+        ]
+
+    def wait_until_ready(self, timeout: float | None = None) -> dict:
+        """Wait for the index to load, polling `/status`.
+
+        Args:
+            timeout: The longest time to wait in seconds, or None for no limit.
+
+        Returns:
+            dict: The status of the vector store once it is ready.
+
+        Raises:
+            TimeoutError: If the index is not loaded within the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for attempt in itertools.count(1):
+            try:
+                response = self._client.get(STATUS_PATH)
+            except httpx.TransportError:
+                response = None
+            if response is not None and self._ready(response):
+                return response.json()
+            delay = self._poll_delay(attempt, response)
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise TimeoutError("The vector store is not ready")
+            time.sleep(delay)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def _send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying it while the service cannot serve it.
+
+        Args:
+            method: The HTTP method.
+            path: The path of the route.
+            **kwargs: The arguments of `httpx.Client.request`.
+
+        Returns:
+            httpx.Response: The successful response.
+
+        Raises:
+            httpx.HTTPStatusError: If the request fails after its retries.
+        """
+        kwargs.setdefault("headers", {"Content-Type": "application/json"})
+        for attempt in itertools.count(1):
+            try:
+                response = self._client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                delay = self._retry_delay(attempt, None)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(attempt, response)
+                if delay is None:
+                    return response.raise_for_status()
+            time.sleep(delay)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+class AsyncVectorStoreClient(_ClientBase):
+    """Asyncio client of the SOC Vector Store API.
+
+    Searches made at the same time are coalesced into batch requests: a batch
+    is sent once it has `batch_size` queries or its first query has waited
+    `max_wait_ms`.
+    """
+
+    def __init__(
+        self, base_url: str, *, max_wait_ms: float = DEFAULT_MAX_WAIT_MS, **options
+    ):
+        """Initialise the client and its connection pool.
+
+        Args:
+            base_url: The URL the API routes are under.
+            max_wait_ms: The longest time a search waits for its batch to fill.
+            **options: The options of `_ClientBase`.
+        """
+        super().__init__(base_url, **options)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self._client = httpx.AsyncClient(**self._client_options)
+        self._pending: list[tuple[SearchIndexRequest, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._batches_sent: set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> "AsyncVectorStoreClient":
+        """Return the client, closed on leaving the block."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close the client."""
+        await self.aclose()
+
+    async def aclose(self):
+        """Send the searches waiting for a batch, then close the connections."""
+        self._flush()
+        if self._batches_sent:
+            await asyncio.gather(*self._batches_sent, return_exceptions=True)
+        await self._client.aclose()
+
+    async def search(self, query: Query) -> SearchResult:
+        """Search for the nearest SOC index entries to a query.
+
+        The query is sent in a batch with the other searches made meanwhile.
+
+        Args:
+            query: The query, as a `SearchIndexRequest` or its fields.
+
+        Returns:
+            SearchResult: The results of the query, a
+            `SearchIndexProjectedResponse` if the query has `fields`.
+
+        Raises:
+            httpx.HTTPStatusError: If the request fails after its retries.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((_as_request(query), future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    async def search_many(self, queries: list[Query]) -> list[SearchResult]:
+        """Search for many queries in concurrent batch requests.
+
+        Args:
+            queries: The queries, in order.
+
+        Returns:
+            list[SearchResult]: The results of each query, in order.
+
+        Raises:
+            httpx.HTTPStatusError: If a request fails after its retries.
+        """
+        batches = await asyncio.gather(
+            *(self._post_batch(body) for body in self._batches(queries))
+        )
+        return [result for batch in batches for result in batch]
+
+    async def wait_until_ready(self, timeout: float | None = None) -> dict:
+        """Wait for the index to load, polling `/status`.
+
+        Args:
+            timeout: The longest time to wait in seconds, or None for no limit.
+
+        Returns:
+            dict: The status of the vector store once it is ready.
+
+        Raises:
+            TimeoutError: If the index is not loaded within the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for attempt in itertools.count(1):
+            try:
+                response = await self._client.get(STATUS_PATH)
+            except httpx.TransportError:
+                response = None
+            if response is not None and self._ready(response):
+                return response.json()
+            delay = self._poll_delay(attempt, response)
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise TimeoutError("The vector store is not ready")
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def _flush(self):
+        """Send the searches waiting for a batch as one batch request."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._resolve(batch))
+            # Hold a reference until the batch is answered
+            self._batches_sent.add(task)
+            task.add_done_callback(self._batches_sent.discard)
+
+    async def _resolve(self, batch: list[tuple[SearchIndexRequest, asyncio.Future]]):
+        """Send a batch of searches and resolve the future of each.
+
+        Args:
+            batch: Each query and the future its caller awaits.
+        """
+        try:
+            (body,) = self._batches([query for query, _future in batch])
+            results = await self._post_batch(body)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            for _query, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_query, future), result in zip(batch, results, strict=True):
+            if not future.done():
+                future.set_result(result)
+
+    async def _post_batch(self, body: str) -> list[SearchResult]:
+        """Send a batch request.
+
+        Args:
+            body: The JSON body of the batch request.
+
+        Returns:
+            list[SearchResult]: The results of each query, in order.
+        """
+        response = await self._send("POST", BATCH_PATH, content=body)
+        return SearchIndexBatchResponse.model_validate_json(response.content).results
+
+    async def _send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request, retrying it while the service cannot serve it.
+
+        Args:
+            method: The HTTP method.
+            path: The path of the route.
+            **kwargs: The arguments of `httpx.AsyncClient.request`.
+
+        Returns:
+            httpx.Response: The successful response.
+
+        Raises:
+            httpx.HTTPStatusError: If the request fails after its retries.
+        """
+        kwargs.setdefault("headers", {"Content-Type": "application/json"})
+        for attempt in itertools.count(1):
+            try:
+                response = await self._client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                delay = self._retry_delay(attempt, None)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(attempt, response)
+                if delay is None:
+                    return response.raise_for_status()
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")  # pragma: no cover
+
+
+def _as_request(query: Query) -> SearchIndexRequest:
+    """Validate a query as a search request.
+
+    Args:
+        query: The query, as a `SearchIndexRequest` or its fields.
+
+    Returns:
+        SearchIndexRequest: The search request.
+    """
+    if isinstance(query, SearchIndexRequest):
+        return query
+    return SearchIndexRequest.model_validate(query)
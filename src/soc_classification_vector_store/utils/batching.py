@@ -0,0 +1,424 @@
+"""Provides micro-batching of concurrent vector store searches.
+
+This module contains a batched equivalent of `EmbeddingHandler.search_index_multi`
+and a coalescer that gathers concurrent search requests for a short window so
+that their texts can be encoded in a single forward pass of the embedding model.
+
+Queries are searched in one of the `QUERY_MODES`:
+
+- `multi`: each field and each prefix of the fields is searched, exactly as
+  `EmbeddingHandler.search_index_multi` does, and the results are merged.
+- `skip_empty`: as `multi`, leaving out empty fields.
+- `fused`: the non-empty fields are encoded and combined into a single
+  weighted query vector, so each query is one nearest-neighbour lookup.
+"""
+
+import heapq
+import time
+from concurrent.futures import Future
+from operator import itemgetter
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+
+import numpy as np
+from survey_assist_utils.logging import get_logger
+
+from soc_classification_vector_store.utils.executor import SearchQueueFullError
+from soc_classification_vector_store.utils.metrics import (
+    current_stage_timings,
+    record_stage,
+    stage_timings,
+    timed_stage,
+)
+from soc_classification_vector_store.utils.search_options import (
+    QUERY_MODE_FUSED,
+    QUERY_MODE_MULTI,
+    QUERY_MODE_SKIP_EMPTY,
+    QUERY_MODES,
+    SearchOptions,
+)
+
+logger = get_logger(__name__)
+
+
+def multi_query_terms(query: list[str]) -> list[str]:
+    """Expand a list of query fields into the search terms used by a multi search.
+
+    This mirrors `EmbeddingHandler.search_index_multi`, which searches each field
+    on its own and each prefix of the fields joined with a space.
+
+    Args:
+        query: The query fields in priority order.
+
+    Returns:
+        list[str]: The unique search terms for the query.
+    """
+    fields = [field for field in query if field is not None]
+    terms: dict[str, None] = {}
+    for i, field in enumerate(fields):
+        terms[" ".join(fields[: i + 1])] = None
+        terms[field] = None
+    return list(terms)
+
+
+def query_search_keys(query: list[str], query_mode: str) -> list:
+    """Return what is searched for a query in a query mode.
+
+    Args:
+        query: The query fields in priority order.
+        query_mode: One of `QUERY_MODES`.
+
+    Returns:
+        list: The search terms of the query, or for a fused query a single
+        tuple of the position and text of each non-empty field.
+
+    Raises:
+        ValueError: If the query mode is not one of `QUERY_MODES`.
+    """
+    if query_mode == QUERY_MODE_MULTI:
+        return multi_query_terms(query)
+    fields = [(i, field) for i, field in enumerate(query) if field and field.strip()]
+    if query_mode == QUERY_MODE_SKIP_EMPTY:
+        return multi_query_terms([field for _i, field in fields])
+    if query_mode != QUERY_MODE_FUSED:
+        raise ValueError(
+            f"Unknown query mode {query_mode!r}, expected one of {QUERY_MODES}"
+        )
+    return [tuple(fields)] if fields else []
+
+
+def fuse_vectors(vectors: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Combine the embeddings of the fields of a query into one query vector.
+
+    Each embedding is scaled to unit length and weighted, and the sum is scaled
+    to the weighted mean length of the embeddings, so that the fused vector
+    lies on the same scale as the index.
+
+    Args:
+        vectors: The embedding of each field, one per row.
+        weights: The weight of each field.
+
+    Returns:
+        np.ndarray: The fused query vector.
+    """
+    norms = np.linalg.norm(vectors, axis=1)
+    units = vectors / np.where(norms > 0, norms, 1.0)[:, None]
+    fused = (units * weights[:, None]).sum(axis=0)
+    length = np.linalg.norm(fused)
+    if length == 0 or weights.sum() == 0:
+        return fused
+    return fused * (float(norms @ weights) / float(weights.sum()) / length)
+
+
+def collapse_codes(matches, k: int | None = None) -> list[dict]:
+    """Keep the nearest match for each SOC code.
+
+    Args:
+        matches: The matches, nearest first.
+        k: The maximum number of matches to keep, or None to keep them all.
+
+    Returns:
+        list[dict]: The first match with each code, nearest first.
+    """
+    codes: set = set()
+    collapsed = []
+    for match in matches:
+        if match.get("code") in codes:
+            continue
+        codes.add(match.get("code"))
+        collapsed.append(match)
+        if len(collapsed) == k:
+            break
+    return collapsed
+
+
+def search_index_multi_batch(  # noqa: PLR0913 # pylint: disable=too-many-arguments,too-many-locals
+    backend,
+    queries: list[list[str]],
+    encode=None,
+    unique_codes: bool = False,
+    options: list[SearchOptions | None] | None = None,
+    *,
+    query_mode: str = QUERY_MODE_MULTI,
+    field_weights=None,
+) -> list[list[dict]]:
+    """Search the vector store for several multi-field queries at once.
+
+    All the unique texts across the queries are encoded in one call to the
+    embedding model and looked up in one batch for each distinct set of
+    search options. In the `multi` query mode each query gets the same results
+    as a call to `EmbeddingHandler.search_index_multi` would return.
+
+    Args:
+        backend: The `SearchBackend` to search.
+        queries: The query fields for each request, in priority order.
+        encode: Callable encoding a list of texts, defaults to `backend.encode`.
+        unique_codes: Whether to return only the nearest match for each SOC
+            code, searching until each term has `k_matches` distinct codes.
+            Queries can override this in their options.
+        options: The search options of each query, None for the defaults.
+        query_mode: The query mode of queries whose options do not set one.
+        field_weights: The weight of each query field in a fused query,
+            defaults to equal weights.
+
+    Returns:
+        list[list[dict]]: The sorted search results for each query, in order.
+    """
+    query_options = options or [None] * len(queries)
+    query_keys = [
+        query_search_keys(
+            query,
+            (option.query_mode or query_mode) if option is not None else query_mode,
+        )
+        for query, option in zip(queries, query_options, strict=True)
+    ]
+    texts = list(
+        dict.fromkeys(
+            text
+            for keys in query_keys
+            for key in keys
+            for text in ([key] if isinstance(key, str) else [f for _i, f in key])
+        )
+    )
+    if not texts:
+        return [[] for _ in queries]
+
+    with timed_stage("encode"):
+        vectors = np.asarray((encode or backend.encode)(texts))
+    positions = {text: i for i, text in enumerate(texts)}
+    weights = np.asarray(
+        field_weights if field_weights is not None else [1.0] * max(map(len, queries)),
+        dtype=np.float32,
+    )
+
+    def key_vector(key) -> np.ndarray:
+        if isinstance(key, str):
+            return vectors[positions[key]]
+        return fuse_vectors(
+            vectors[[positions[field] for _i, field in key]],
+            weights[[i for i, _field in key]],
+        )
+
+    matches: dict[tuple, list[dict]] = {}
+    with timed_stage("search"):
+        for option in dict.fromkeys(query_options):
+            keys = list(
+                dict.fromkeys(
+                    key
+                    for keys, query_option in zip(
+                        query_keys, query_options, strict=True
+                    )
+                    if query_option == option
+                    for key in keys
+                )
+            )
+            if not keys:
+                continue
+            found = backend.search_by_vectors(
+                np.stack([key_vector(key) for key in keys]),
+                unique_codes=_unique_codes(option, unique_codes),
+                **(option.backend_kwargs() if option is not None else {}),
+            )
+            matches.update(
+                ((key, option), result) for key, result in zip(keys, found, strict=True)
+            )
+
+    with timed_stage("postprocess"):
+        return [
+            _merge_matches(
+                [matches[key, option] for key in keys],
+                k=option.k if option is not None else None,
+                unique_codes=_unique_codes(option, unique_codes),
+            )
+            for keys, option in zip(query_keys, query_options, strict=True)
+        ]
+
+
+def _unique_codes(option: SearchOptions | None, default: bool) -> bool:
+    """Return whether the results of a query are collapsed by SOC code.
+
+    Args:
+        option: The search options of the query.
+        default: The value used when the query does not set it.
+
+    Returns:
+        bool: Whether to return only the nearest match for each code.
+    """
+    return option.resolve_unique_codes(default) if option is not None else default
+
+
+def _merge_matches(
+    term_matches: list[list[dict]], k: int | None, unique_codes: bool
+) -> list[dict]:
+    """Merge the matches of each search term of a query.
+
+    Args:
+        term_matches: The matches of each search term, nearest first.
+        k: The number of matches to keep, or None to keep them all.
+        unique_codes: Whether to keep only the nearest match for each code.
+
+    Returns:
+        list[dict]: The nearest matches of the query, nearest first.
+    """
+    candidates = (match for matches in term_matches for match in matches)
+    if k is not None and not unique_codes:
+        # Only the k nearest are selected rather than sorting every match
+        return heapq.nsmallest(k, candidates, key=itemgetter("distance"))
+    merged = sorted(candidates, key=itemgetter("distance"))
+    return collapse_codes(merged, k) if unique_codes else merged
+
+
+class SearchBatcher:  # pylint: disable=too-many-instance-attributes
+    """Coalesces concurrent search requests into batches.
+
+    Requests are collected until the batch is full or the oldest request has
+    waited for `max_wait_ms`, then the whole batch is handed to `search_batch_fn`
+    on the search executor and each caller receives its own results.
+
+    Attributes:
+        max_batch_size (int): The maximum number of queries in a batch.
+        max_wait_ms (float): The longest time a query waits for a batch to fill.
+    """
+
+    def __init__(
+        self, search_batch_fn, executor, max_batch_size: int, max_wait_ms: float
+    ):
+        """Initialise the search batcher.
+
+        Args:
+            search_batch_fn: Callable taking a list of queries and their search
+                options and returning a list of results in the same order.
+            executor: The `BoundedSearchExecutor` that runs each batch.
+            max_batch_size: The maximum number of queries in a batch.
+            max_wait_ms: The longest time a query waits for a batch to fill.
+        """
+        self.search_batch_fn = search_batch_fn
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        # Never hold more queries than the executor could accept as full batches
+        self._pending: Queue = Queue(
+            maxsize=self.max_batch_size * (executor.max_workers + executor.queue_size)
+        )
+        self._lock = Lock()
+        self._thread: Thread | None = None
+        self._batches = 0
+        self._queries = 0
+        self._full_batches = 0
+
+    def submit(self, query: list[str], options: SearchOptions | None = None) -> Future:
+        """Submit a query to be searched in the next batch.
+
+        Args:
+            query: The query fields in priority order.
+            options: The search options of the query, None for the defaults.
+
+        Returns:
+            Future: A future holding the search results for the query.
+
+        Raises:
+            SearchQueueFullError: If too many queries are already waiting.
+        """
+        self._ensure_started()
+        future: Future = Future()
+        try:
+            self._pending.put_nowait(
+                (query, options, future, current_stage_timings(), time.perf_counter())
+            )
+        except Full as e:
+            raise SearchQueueFullError("Search queue is full") from e
+        return future
+
+    def stats(self) -> dict[str, float]:
+        """Return the batching counters.
+
+        Returns:
+            dict: Batch and query counts, the mean batch size and the mean fill
+            rate, which is the mean batch size as a fraction of the maximum.
+        """
+        with self._lock:
+            batches, queries, full = self._batches, self._queries, self._full_batches
+        mean_size = queries / batches if batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": batches,
+            "queries": queries,
+            "full_batches": full,
+            "mean_batch_size": mean_size,
+            "mean_fill_rate": mean_size / self.max_batch_size,
+        }
+
+    def _ensure_started(self):
+        """Start the collector thread on first use."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._collect, name="vector-store-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self):
+        """Gather pending queries into batches and dispatch them."""
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except Empty:
+                    break
+
+            with self._lock:
+                self._batches += 1
+                self._queries += len(batch)
+                self._full_batches += len(batch) == self.max_batch_size
+
+            try:
+                self.executor.submit(self._run_batch, batch)
+            except SearchQueueFullError as e:
+                for _query, _options, future, *_item in batch:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+
+    def _run_batch(self, batch: list[tuple]):  # pylint: disable=too-many-locals
+        """Search a batch of queries and resolve each caller's future.
+
+        The time each query waited for its batch to start is recorded against
+        its own request, and the stages of the batch search against them all.
+        Queries whose callers have already given up are left out.
+
+        Args:
+            batch: The queries, their search options and futures, the stage
+                timings of their requests and the `perf_counter` times they
+                were submitted.
+        """
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        for *_item, timings, submitted in batch:
+            record_stage("queue", started - submitted, timings)
+
+        try:
+            with stage_timings() as batch_timings:
+                results = self.search_batch_fn(
+                    [query for query, *_item in batch],
+                    options=[options for _query, options, *_item in batch],
+                )
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error(f"Error searching batch: {e}", exc_info=True)
+            for _query, _options, future, *_item in batch:
+                future.set_exception(e)
+            return
+
+        for (_query, _options, future, timings, _submitted), result in zip(
+            batch, results, strict=True
+        ):
+            if timings is not None:
+                for stage, seconds in batch_timings.items():
+                    timings[stage] = timings.get(stage, 0.0) + seconds
+            future.set_result(result)
@@ -0,0 +1,475 @@
+"""Provides offline bulk classification of survey responses from a file.
+
+This module contains a command line entry point for back-coding historical
+surveys without going through the API. The index is loaded once, the input
+file is read in chunks of rows, each chunk is searched as one batch on a pool
+of threads, and the results are written as each chunk completes, so memory
+use does not grow with the size of the input. A progress file records the
+chunks written, so an interrupted run resumes after the last one.
+
+Input rows have `industry_descr`, `job_title` and `job_description` columns,
+as in a search request, and can be read from CSV, Parquet or NDJSON. Results
+are written to CSV or a directory of Parquet files with one row per result,
+or to NDJSON with one line per input row:
+
+    python -m soc_classification_vector_store.utils.bulk_search responses.csv results.csv
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from survey_assist_utils.logging import get_logger
+
+from soc_classification_vector_store.utils.search_options import (
+    EXACT_MATCH_MODES,
+    QUERY_MODES,
+    SearchOptions,
+)
+
+logger = get_logger(__name__)
+
+FILE_FORMATS = ("csv", "parquet", "ndjson")
+QUERY_COLUMNS = ("industry_descr", "job_title", "job_description")
+RESULT_COLUMNS = ("row", "rank", "distance", "title", "code")
+PROGRESS_SUFFIX = ".progress.json"
+PART_FILE = "part-{index:06d}.parquet"
+
+_SUFFIX_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+
+def file_format(path: str, file_format_name: str | None = None) -> str:
+    """Return the format of a file, from its suffix unless given.
+
+    Args:
+        path: The path of the file.
+        file_format_name: The format, if set explicitly.
+
+    Returns:
+        str: One of `FILE_FORMATS`.
+
+    Raises:
+        ValueError: If the format is not given and the suffix is not known.
+    """
+    if file_format_name:
+        return file_format_name
+    suffix = os.path.splitext(path.rstrip(os.sep))[1].lower()
+    if suffix not in _SUFFIX_FORMATS:
+        raise ValueError(
+            f"Cannot tell the format of {path!r}, expected one of {FILE_FORMATS}"
+        )
+    return _SUFFIX_FORMATS[suffix]
+
+
+def require_parquet_support(*formats: str):
+    """Check that pyarrow is installed if Parquet is read or written.
+
+    Args:
+        formats: The input and output formats.
+
+    Raises:
+        SystemExit: If a format is Parquet and pyarrow is not installed.
+    """
+    if "parquet" in formats and importlib.util.find_spec("pyarrow") is None:
+        raise SystemExit(
+            "Reading and writing Parquet needs pyarrow, install it with "
+            "`pip install 'soc-classification-vector-store[parquet]'` "
+            "or `pip install pyarrow`"
+        )
+
+
+def read_chunks(
+    path: str, input_format: str, chunk_size: int
+) -> Iterator[pd.DataFrame]:
+    """Read an input file in chunks of rows.
+
+    Args:
+        path: The path of the input file.
+        input_format: The format of the file, one of `FILE_FORMATS`.
+        chunk_size: The number of rows in each chunk.
+
+    Yields:
+        pd.DataFrame: The next chunk of rows.
+    """
+    if input_format == "csv":
+        yield from pd.read_csv(
+            path, chunksize=chunk_size, dtype=str, keep_default_na=False
+        )
+    elif input_format == "ndjson":
+        with pd.read_json(
+            path, lines=True, chunksize=chunk_size, dtype=False
+        ) as reader:
+            yield from reader
+    else:
+        # Parquet support is optional, needing pyarrow, see `require_parquet_support`
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+def chunk_queries(frame: pd.DataFrame) -> list[list[str]]:
+    """Build the search query of each row of a chunk.
+
+    Args:
+        frame: The chunk of input rows. Missing columns are searched as empty.
+
+    Returns:
+        list[list[str]]: The industry description, job title and job
+        description of each row.
+    """
+    columns = [
+        (
+            frame[column].fillna("").astype(str)
+            if column in frame
+            else pd.Series("", index=frame.index)
+        )
+        for column in QUERY_COLUMNS
+    ]
+    return [list(fields) for fields in zip(*columns, strict=True)]
+
+
+def result_frame(row_ids: list, results: list[list[dict]]) -> pd.DataFrame:
+    """Flatten the results of a chunk into one row per result.
+
+    Args:
+        row_ids: The identifier of each input row.
+        results: The search results of each input row, nearest first.
+
+    Returns:
+        pd.DataFrame: The results, with the columns `RESULT_COLUMNS`.
+    """
+    return pd.DataFrame(
+        [
+            (
+                row_id,
+                rank,
+                result.get("distance"),
+                result.get("title"),
+                result.get("code"),
+            )
+            for row_id, row_results in zip(row_ids, results, strict=True)
+            for rank, result in enumerate(row_results, start=1)
+        ],
+        columns=list(RESULT_COLUMNS),
+    )
+
+
+class ResultWriter:
+    """Writes the results of each chunk to the output as it completes.
+
+    CSV and NDJSON results are appended to a single file, and the size of the
+    file after each chunk is its resume point. Parquet results are written to
+    a directory with one file per chunk.
+
+    Attributes:
+        path (str): The output file, or directory for Parquet.
+        output_format (str): The output format, one of `FILE_FORMATS`.
+        offset (int): The size of the output written so far, for CSV and NDJSON.
+    """
+
+    def __init__(self, path: str, output_format: str, offset: int = 0):
+        """Open the output, discarding anything written after the resume point.
+
+        Args:
+            path: The output file, or directory for Parquet.
+            output_format: The output format, one of `FILE_FORMATS`.
+            offset: The size of the output when the last chunk was recorded,
+                0 to start a new output.
+        """
+        self.path = path
+        self.output_format = output_format
+        self.offset = offset
+        if output_format == "parquet":
+            os.makedirs(path, exist_ok=True)
+            if not offset:
+                for name in os.listdir(path):
+                    if name.startswith("part-"):
+                        os.remove(os.path.join(path, name))
+            self._file = None
+        else:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            # Binary mode, so the offset is a byte position
+            self._file = open(  # noqa: SIM115 # pylint: disable=consider-using-with
+                path, "r+b" if offset else "wb"
+            )
+            self._file.truncate(offset)
+            self._file.seek(offset)
+
+    def write(self, index: int, row_ids: list, results: list[list[dict]]):
+        """Write the results of a chunk and flush them to disk.
+
+        Args:
+            index: The position of the chunk in the input.
+            row_ids: The identifier of each input row of the chunk.
+            results: The search results of each input row.
+        """
+        if self.output_format == "ndjson":
+            content = "".join(
+                json.dumps({"row": row_id, "results": row_results}, default=str) + "\n"
+                for row_id, row_results in zip(row_ids, results, strict=True)
+            )
+        else:
+            frame = result_frame(row_ids, results)
+            if self.output_format == "parquet":
+                path = os.path.join(self.path, PART_FILE.format(index=index))
+                frame.to_parquet(f"{path}.tmp", index=False)
+                os.replace(f"{path}.tmp", path)
+                self.offset += 1
+                return
+            content = frame.to_csv(index=False, header=self.offset == 0)
+
+        self._file.write(content.encode("utf-8"))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.offset = self._file.tell()
+
+    def close(self):
+        """Close the output file."""
+        if self._file is not None:
+            self._file.close()
+
+
+def read_progress(path: str, run_key: dict) -> dict | None:
+    """Read the progress of an earlier run with the same input and settings.
+
+    Args:
+        path: The progress file.
+        run_key: Identifies the input, output and search settings of the run.
+
+    Returns:
+        dict | None: The chunks and rows written and the output offset, or
+        None if there is no progress for this run.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            progress = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return progress if progress.get("run") == run_key else None
+
+
+def write_progress(path: str, progress: dict):
+    """Atomically write the progress of a run.
+
+    Args:
+        path: The progress file.
+        progress: The run key, chunks and rows written and the output offset.
+    """
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(progress, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def bulk_search(  # noqa: PLR0913 # pylint: disable=too-many-arguments,too-many-locals
+    search_batch: Callable[[list[list[str]]], list[list[dict]]],
+    input_path: str,
+    output_path: str,
+    *,
+    chunk_size: int = 1000,
+    workers: int = 1,
+    input_format: str | None = None,
+    output_format: str | None = None,
+    id_column: str | None = None,
+    settings: dict | None = None,
+    restart: bool = False,
+) -> dict:
+    """Search every row of an input file and write the results.
+
+    At most `workers` chunks are searched at once, and their results are
+    written in input order as they complete, after which the progress file
+    records the chunk. A run with the same input, output and settings as an
+    interrupted run resumes after its last recorded chunk.
+
+    Args:
+        search_batch: Callable searching the queries of a chunk.
+        input_path: The input file.
+        output_path: The output file, or directory for Parquet.
+        chunk_size: The number of rows read and searched at a time.
+        workers: The number of chunks searched concurrently.
+        input_format: The input format, from the suffix if None.
+        output_format: The output format, from the suffix if None.
+        id_column: The input column identifying each row, or None to identify
+            rows by their position in the input.
+        settings: The search settings, recorded so a resumed run uses the same.
+        restart: Whether to discard the progress of an earlier run.
+
+    Returns:
+        dict: The chunks and rows written, including those resumed, and the
+        chunks resumed.
+    """
+    input_format = file_format(input_path, input_format)
+    output_format = file_format(output_path, output_format)
+    chunk_size = max(1, chunk_size)
+    progress_path = output_path.rstrip(os.sep) + PROGRESS_SUFFIX
+    run_key = {
+        "input": os.path.abspath(input_path),
+        "input_size": os.path.getsize(input_path),
+        "input_mtime": os.path.getmtime(input_path),
+        "output_format": output_format,
+        "chunk_size": chunk_size,
+        "id_column": id_column,
+        "settings": settings or {},
+    }
+    progress = None if restart else read_progress(progress_path, run_key)
+    if progress is None or not os.path.exists(output_path):
+        progress = {"run": run_key, "chunks": 0, "rows": 0, "offset": 0}
+    resumed = progress["chunks"]
+    if resumed:
+        logger.info(f"Resuming bulk search after {resumed} chunks")
+
+    writer = ResultWriter(output_path, output_format, progress["offset"])
+    start = time.perf_counter()
+    pending: deque = deque()
+
+    def write_next():
+        index, row_ids, future = pending.popleft()
+        writer.write(index, row_ids, future.result())
+        progress.update(
+            chunks=index + 1, rows=progress["rows"] + len(row_ids), offset=writer.offset
+        )
+        write_progress(progress_path, progress)
+        logger.info(
+            f"Bulk search chunk {index + 1} written - rows: {progress['rows']}, "
+            f"{progress['rows'] / (time.perf_counter() - start):.0f} rows/s"
+        )
+
+    try:
+        with ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="bulk-search"
+        ) as executor:
+            row = 0
+            for index, frame in enumerate(
+                read_chunks(input_path, input_format, chunk_size)
+            ):
+                rows = len(frame)
+                if index >= resumed:
+                    row_ids = (
+                        frame[id_column].tolist()
+                        if id_column
+                        else list(range(row, row + rows))
+                    )
+                    future = executor.submit(search_batch, chunk_queries(frame))
+                    pending.append((index, row_ids, future))
+                    # Bound the chunks held in memory to those being searched
+                    if len(pending) >= max(1, workers):
+                        write_next()
+                row += rows
+            while pending:
+                write_next()
+    finally:
+        for _index, _row_ids, future in pending:
+            future.cancel()
+        writer.close()
+
+    return {
+        "chunks": progress["chunks"],
+        "rows": progress["rows"],
+        "resumed_chunks": resumed,
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse the command line arguments.
+
+    Args:
+        argv: The arguments, defaults to `sys.argv`.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV, Parquet or NDJSON file of queries")
+    parser.add_argument("output", help="CSV or NDJSON file, or Parquet directory")
+    parser.add_argument("--input-format", choices=FILE_FORMATS)
+    parser.add_argument("--output-format", choices=FILE_FORMATS)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Chunks searched concurrently",
+    )
+    parser.add_argument(
+        "--id-column", help="Input column identifying each row, instead of its position"
+    )
+    parser.add_argument("--k", type=int)
+    parser.add_argument("--max-distance", type=float)
+    parser.add_argument("--major-groups", nargs="+")
+    parser.add_argument(
+        "--unique-codes", action=argparse.BooleanOptionalAction, default=None
+    )
+    parser.add_argument("--query-mode", choices=QUERY_MODES)
+    parser.add_argument("--exact-match", choices=EXACT_MATCH_MODES)
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Start again instead of resuming an interrupted run",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Load the index and search every row of the input file.
+
+    Args:
+        argv: The arguments, defaults to `sys.argv`.
+
+    Returns:
+        int: The exit status.
+    """
+    args = parse_args(argv)
+    input_format = file_format(args.input, args.input_format)
+    output_format = file_format(args.output, args.output_format)
+    require_parquet_support(input_format, output_format)
+    settings = {
+        "k": args.k,
+        "max_distance": args.max_distance,
+        "major_groups": sorted(args.major_groups) if args.major_groups else None,
+        "unique_codes": args.unique_codes,
+        "query_mode": args.query_mode,
+        "exact_match": args.exact_match,
+    }
+    options = SearchOptions.create(**settings)
+
+    # Imported here so the arguments are checked before loading the model
+    from soc_classification_vector_store.utils.vector_store import (  # pylint: disable=import-outside-toplevel
+        VectorStoreManager,
+    )
+
+    manager = VectorStoreManager()
+    manager.load()
+    manager.ready_event.set()
+
+    summary = bulk_search(
+        lambda queries: manager.search_batch(queries, [options] * len(queries)),
+        args.input,
+        args.output,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        input_format=input_format,
+        output_format=output_format,
+        id_column=args.id_column,
+        settings=settings,
+        restart=args.restart,
+    )
+    logger.info(f"Bulk search complete - {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
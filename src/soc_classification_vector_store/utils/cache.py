@@ -0,0 +1,239 @@
+"""Provides caching of query embeddings and search results.
+
+Survey traffic is very repetitive, so this module contains a bounded LRU cache
+with TTL expiry, and a two-level search cache built from it:
+
+- per search term text embeddings, keyed by the normalised text, so a
+  repeated job title is encoded once.
+- full multi-field search results, keyed by the normalised query fields and
+  the search options.
+
+Both levels are cleared whenever the loaded index version changes, or an
+index without a version is loaded.
+"""
+
+import re
+import string
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from threading import Lock
+
+import numpy as np
+
+from soc_classification_vector_store.utils.search_options import SearchOptions
+
+_PUNCTUATION = re.compile(f"[{re.escape(string.punctuation)}]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalise_text(text: str | None) -> str:
+    """Normalise a query field so equivalent texts share cache entries.
+
+    Args:
+        text: The text to normalise.
+
+    Returns:
+        str: The lower case text with punctuation replaced by spaces and
+        runs of whitespace collapsed to a single space.
+    """
+    text = _PUNCTUATION.sub(" ", (text or "").lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class LRUCache:
+    """Thread-safe, size bounded LRU cache with time-to-live expiry.
+
+    Attributes:
+        max_entries (int): The maximum number of entries held.
+        ttl_seconds (float): How long an entry lives, or 0 for no expiry.
+        hits (int): The number of lookups that found a live entry.
+        misses (int): The number of lookups that did not.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float = 0):
+        """Initialise the cache.
+
+        Args:
+            max_entries: The maximum number of entries held.
+            ttl_seconds: How long an entry lives, or 0 for no expiry.
+        """
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable):
+        """Look up a key, refreshing its position in the LRU order.
+
+        Args:
+            key: The key to look up.
+
+        Returns:
+            The cached value, or None if the key is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and self.ttl_seconds
+                and (time.monotonic() - entry[1] > self.ttl_seconds)
+            ):
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value):
+        """Store a value, evicting the least recently used entries if full.
+
+        Args:
+            key: The key to store the value under.
+            value: The value to store.
+        """
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove every entry, keeping the hit and miss counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, float]:
+        """Return the cache counters.
+
+        Returns:
+            dict: The number of entries, the maximum, hits, misses and hit rate.
+        """
+        with self._lock:
+            entries, hits, misses = len(self._entries), self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+class SearchCache:
+    """Two-level cache of query term embeddings and search results.
+
+    Attributes:
+        embeddings (LRUCache): Embeddings of search terms, keyed by their
+            normalised text.
+        results (LRUCache): Search results keyed by the normalised query fields.
+        index_version (str): The index version the cached entries belong to.
+        generation (int): The number of times the cache has been cleared for
+            a newly loaded index, so a search can tell whether the index it
+            searched is still the one cached.
+    """
+
+    def __init__(self, embedding_entries: int, result_entries: int, ttl_seconds: float):
+        """Initialise the search cache.
+
+        Args:
+            embedding_entries: The maximum number of cached embeddings.
+            result_entries: The maximum number of cached search results.
+            ttl_seconds: How long an entry lives, or 0 for no expiry.
+        """
+        self.embeddings = LRUCache(embedding_entries, ttl_seconds)
+        self.results = LRUCache(result_entries, ttl_seconds)
+        self.index_version = ""
+        self.generation = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def result_key(
+        query: list[str], options: SearchOptions | None = None
+    ) -> tuple[tuple[str, ...], SearchOptions | None]:
+        """Build the result cache key of a query.
+
+        Args:
+            query: The query fields in priority order.
+            options: The search options of the query, None for the defaults.
+
+        Returns:
+            tuple: The normalised query fields and the search options.
+        """
+        return tuple(normalise_text(field) for field in query), options
+
+    def set_index_version(self, index_version: str):
+        """Record the loaded index version, clearing the cache if it changed.
+
+        An index without a version, such as one searched through the
+        embedding handler, cannot be told apart from the last one, so the
+        cache is always cleared for it.
+
+        Args:
+            index_version: The version of the loaded index, or "" if unknown.
+        """
+        with self._lock:
+            if not index_version or index_version != self.index_version:
+                self.embeddings.clear()
+                self.results.clear()
+                self.index_version = index_version
+                self.generation += 1
+
+    def cached_encoder(
+        self, encode: Callable[[list[str]], np.ndarray]
+    ) -> Callable[[list[str]], np.ndarray]:
+        """Wrap an encoder so that only texts missing from the cache are encoded.
+
+        Embeddings are cached under the normalised text, and a miss encodes
+        the text as given.
+
+        Args:
+            encode: Callable encoding a list of texts in one batch.
+
+        Returns:
+            Callable: An encoder with the same signature backed by the cache.
+        """
+
+        def cached_encode(texts: list[str]) -> np.ndarray:
+            keys = [normalise_text(text) for text in texts]
+            vectors = [self.embeddings.get(key) for key in keys]
+            # The first text given for each key is encoded on a miss
+            missing: dict[str, str] = {}
+            for key, text, vector in zip(keys, texts, vectors, strict=True):
+                if vector is None:
+                    missing.setdefault(key, text)
+            if missing:
+                encoded = dict(
+                    zip(missing, encode(list(missing.values())), strict=True)
+                )
+                for key, vector in encoded.items():
+                    self.embeddings.put(key, vector)
+                vectors = [
+                    encoded[key] if vector is None else vector
+                    for key, vector in zip(keys, vectors, strict=True)
+                ]
+            return np.asarray(vectors, dtype=np.float32)
+
+        return cached_encode
+
+    def stats(self) -> dict:
+        """Return the counters of both cache levels.
+
+        Returns:
+            dict: The index version and the embedding and result cache counters.
+        """
+        return {
+            "index_version": self.index_version,
+            "embeddings": self.embeddings.stats(),
+            "results": self.results.stats(),
+        }
@@ -20,3 +20,42 @@ def safe_int(value, default=0):
         return int(value)
     except (ValueError, TypeError):
         return default
+
+
+def safe_float(value, default=0.0):
+    """Safely convert a value to a float, or return a default value.
+
+    Args:
+        value: The value to be converted to a float. Can be of any type.
+        default: The default value to return if conversion fails. Defaults to 0.0.
+
+    Returns:
+        float: The converted float value, or the default value if conversion fails.
+    """
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def safe_bool(value, default=False):
+    """Safely convert a value such as an environment variable to a boolean.
+
+    Args:
+        value: The value to be converted to a boolean. Strings such as "true",
+            "1", "yes" and "on" are treated as True, and "false", "0", "no"
+            and "off" as False.
+        default: The default value to return if conversion fails. Defaults to False.
+
+    Returns:
+        bool: The converted boolean value, or the default value if conversion fails.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in ("1", "true", "yes", "on"):
+            return True
+        if lowered in ("0", "false", "no", "off"):
+            return False
+    return default
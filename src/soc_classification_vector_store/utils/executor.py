@@ -0,0 +1,201 @@
+"""Provides a bounded executor for running vector store searches.
+
+This module contains a thin wrapper around a thread pool that limits the
+number of searches that can be running or waiting at any one time, so that
+the API can run blocking searches off the event loop without queueing
+unbounded amounts of work, and the admission control that limits the number
+of search requests being served.
+"""
+
+import asyncio
+import time
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import copy_context
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+
+from soc_classification_vector_store.utils.metrics import SHED_REQUESTS, record_stage
+
+
+class SearchQueueFullError(RuntimeError):
+    """Raised when the search executor cannot accept any more work."""
+
+
+class SearchRejectedError(RuntimeError):
+    """Raised when a search request is not admitted because too many are in flight."""
+
+
+class SearchDeadlineExceededError(RuntimeError):
+    """Raised when a search does not complete before the deadline of its request."""
+
+
+class AdmissionController:
+    """Limits the number of search requests being served at once.
+
+    Requests beyond the limit are rejected immediately rather than waiting, so
+    clients are told to back off before the search queue grows.
+
+    Attributes:
+        max_in_flight (int): The number of requests admitted at once, or 0 for
+            no limit.
+    """
+
+    def __init__(self, max_in_flight: int):
+        """Initialise the admission controller.
+
+        Args:
+            max_in_flight: The number of requests admitted at once, or 0 for
+                no limit.
+        """
+        self.max_in_flight = max(0, max_in_flight)
+        self._lock = Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """Admit a search request for the duration of the context.
+
+        Raises:
+            SearchRejectedError: If the limit of requests in flight is reached.
+        """
+        with self._lock:
+            if self.max_in_flight and self._in_flight >= self.max_in_flight:
+                self._rejected += 1
+                SHED_REQUESTS.inc(reason="rejected")
+                raise SearchRejectedError("Too many search requests in flight")
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self) -> dict[str, int]:
+        """Return the admission counters.
+
+        Returns:
+            dict: The limit, the requests in flight and the requests rejected.
+        """
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "rejected": self._rejected,
+            }
+
+
+async def await_search(future: Future, deadline: float | None = None):
+    """Wait for a submitted search without blocking the event loop.
+
+    If the caller is cancelled or the deadline passes first, the search is
+    cancelled, so a search still waiting for a worker or a batch never runs.
+
+    Args:
+        future: The future of the submitted search.
+        deadline: The `time.monotonic` time by which the search must
+            complete, or None for no deadline.
+
+    Returns:
+        The result of the search.
+
+    Raises:
+        SearchDeadlineExceededError: If the deadline passes first.
+    """
+    timeout = None if deadline is None else deadline - time.monotonic()
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except TimeoutError as e:
+        SHED_REQUESTS.inc(reason="deadline")
+        raise SearchDeadlineExceededError("Search deadline exceeded") from e
+    except asyncio.CancelledError:
+        SHED_REQUESTS.inc(reason="cancelled")
+        raise
+
+
+class BoundedSearchExecutor:
+    """Thread pool with a bounded number of running and queued searches.
+
+    The sentence transformer and the vector lookup release the GIL for the
+    bulk of their work, so a thread pool lets concurrent searches overlap
+    while the event loop stays free to serve other requests.
+
+    Attributes:
+        max_workers (int): The number of worker threads running searches.
+        queue_size (int): The number of searches allowed to wait for a worker.
+    """
+
+    def __init__(self, max_workers: int, queue_size: int):
+        """Initialise the bounded search executor.
+
+        Args:
+            max_workers: The number of worker threads running searches.
+            queue_size: The number of searches allowed to wait for a worker.
+        """
+        self.max_workers = max(1, max_workers)
+        self.queue_size = max(0, queue_size)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="vector-store-search"
+        )
+        self._slots = BoundedSemaphore(self.max_workers + self.queue_size)
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        """Submit a callable to the executor.
+
+        The callable runs in a copy of the caller's context, so stage timings
+        are recorded against the request that submitted it, starting with the
+        time it spent waiting for a worker.
+
+        Args:
+            fn: The callable to run on a worker thread.
+            *args: Positional arguments passed to the callable.
+            **kwargs: Keyword arguments passed to the callable.
+
+        Returns:
+            Future: A future holding the result of the callable.
+
+        Raises:
+            SearchQueueFullError: If all workers are busy and the queue is full.
+        """
+        # The slot is released when the future completes, not in this scope
+        if not self._slots.acquire(  # pylint: disable=consider-using-with
+            blocking=False
+        ):
+            raise SearchQueueFullError("Search queue is full")
+
+        try:
+            future = self._executor.submit(
+                copy_context().run, self._run, perf_counter(), fn, args, kwargs
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _future: self._slots.release())
+        return future
+
+    @staticmethod
+    def _run(submitted: float, fn, args: tuple, kwargs: dict):
+        """Run a submitted callable, recording how long it waited for a worker.
+
+        Args:
+            submitted: The `perf_counter` time the callable was submitted.
+            fn: The callable to run.
+            args: Positional arguments passed to the callable.
+            kwargs: Keyword arguments passed to the callable.
+
+        Returns:
+            The result of the callable.
+        """
+        record_stage("queue", perf_counter() - submitted)
+        return fn(*args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        """Shut down the executor, cancelling any queued searches.
+
+        Args:
+            wait: Whether to wait for running searches to finish.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,390 @@
+"""Provides a parallel, chunked and resumable build of the index embeddings.
+
+This module contains the build used to embed the SOC coding index when there
+is no usable snapshot. The index texts are split into chunks that are encoded
+in parallel by a pool of worker processes, each with its own copy of the
+embedding model. Every completed chunk is checkpointed to disk, so a build
+that is interrupted, for example by a container restart, resumes from the
+chunks already encoded instead of starting again.
+
+When the spreadsheets are updated, rows whose content hash is unchanged reuse
+their embeddings from the previous snapshot, so only added or edited rows are
+encoded.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from threading import Lock
+
+import numpy as np
+from survey_assist_utils.logging import get_logger
+
+from soc_classification_vector_store.utils.snapshot import Snapshot
+
+logger = get_logger(__name__)
+
+BUILD_MANIFEST_FILE = "build.json"
+CHUNK_FILE = "chunk_{index:05d}.npy"
+
+# The encoder of a build worker process, created once by `_init_worker`, and
+# the scratch directory of its embedding handler
+_worker_state: dict = {}
+
+
+class IndexBuildProgress:  # pylint: disable=too-many-instance-attributes
+    """Thread-safe progress of an index build, reported on the status endpoint.
+
+    Attributes:
+        state (str): "building" while a build runs, "complete" once it is done,
+            or an empty string if no build has started.
+    """
+
+    def __init__(self):
+        """Initialise the progress of a build that has not started."""
+        self._lock = Lock()
+        self.state = ""
+        self._total_rows = 0
+        self._total_chunks = 0
+        self._rows_embedded = 0
+        self._resumed_rows = 0
+        self._chunks_completed = 0
+        self._started = 0.0
+        self._finished = 0.0
+
+    def start(self, total_rows: int, total_chunks: int):
+        """Record the start of a build.
+
+        Args:
+            total_rows: The number of rows in the index.
+            total_chunks: The number of chunks the rows are split into.
+        """
+        with self._lock:
+            self.state = "building"
+            self._total_rows = total_rows
+            self._total_chunks = total_chunks
+            self._rows_embedded = 0
+            self._resumed_rows = 0
+            self._chunks_completed = 0
+            self._started = time.monotonic()
+            self._finished = 0.0
+
+    def add_chunk(self, rows: int, resumed: bool = False):
+        """Record a completed chunk.
+
+        Args:
+            rows: The number of rows in the chunk.
+            resumed: Whether the chunk was loaded from a checkpoint rather than
+                encoded by this build.
+        """
+        with self._lock:
+            self._rows_embedded += rows
+            self._resumed_rows += rows if resumed else 0
+            self._chunks_completed += 1
+
+    def finish(self):
+        """Record the end of a build."""
+        with self._lock:
+            self.state = "complete"
+            self._finished = time.monotonic()
+
+    def stats(self) -> dict | None:
+        """Return the build progress.
+
+        Returns:
+            dict | None: The rows embedded, total rows, chunks completed, total
+            chunks, elapsed seconds and estimated seconds remaining, or None if
+            no build has started.
+        """
+        with self._lock:
+            if not self.state:
+                return None
+            elapsed = (self._finished or time.monotonic()) - self._started
+            encoded = self._rows_embedded - self._resumed_rows
+            remaining = self._total_rows - self._rows_embedded
+            if self.state == "complete":
+                eta = 0.0
+            elif encoded and elapsed > 0:
+                eta = remaining / (encoded / elapsed)
+            else:
+                eta = None
+            return {
+                "state": self.state,
+                "rows_embedded": self._rows_embedded,
+                "total_rows": self._total_rows,
+                "chunks_completed": self._chunks_completed,
+                "total_chunks": self._total_chunks,
+                "elapsed_seconds": elapsed,
+                "eta_seconds": eta,
+            }
+
+
+def embedding_model_encoder():
+    """Create the embedding model used by `EmbeddingHandler`.
+
+    Returns:
+        The embedding model, with an `embed_documents` method.
+    """
+    # Imported here so that the model libraries are only loaded in worker
+    # processes, after `_init_worker` has set their thread count
+    from occupational_classification_utils.embed.embedding import (  # pylint: disable=import-outside-toplevel
+        EmbeddingHandler,
+    )
+
+    # The directory lives as long as the worker process
+    directory = tempfile.TemporaryDirectory(  # pylint: disable=consider-using-with
+        prefix="index-build-"
+    )
+    _worker_state["directory"] = directory
+    return EmbeddingHandler(db_dir=directory.name).embeddings
+
+
+def build_index_embeddings(  # noqa: PLR0913 # pylint: disable=too-many-arguments,too-many-locals
+    texts: list[str],
+    checkpoint_dir: str,
+    *,
+    build_key: dict,
+    encoder_factory: Callable = embedding_model_encoder,
+    workers: int = 1,
+    chunk_size: int = 1024,
+    progress: IndexBuildProgress | None = None,
+) -> np.ndarray:
+    """Embed the index texts in parallel chunks, resuming from checkpoints.
+
+    Args:
+        texts: The text of each row of the index.
+        checkpoint_dir: The directory completed chunks are checkpointed to.
+        build_key: Identifies the sources and model of the build, such as the
+            spreadsheet checksums and embedding model name. Checkpoints from a
+            build with a different key are discarded.
+        encoder_factory: A picklable callable creating an encoder with an
+            `embed_documents` method, called once in each worker process.
+        workers: The number of worker processes, or 1 to encode in this process.
+        chunk_size: The number of rows in each chunk.
+        progress: The progress to update as chunks complete.
+
+    Returns:
+        np.ndarray: The float32 embedding of each row, in row order.
+    """
+    progress = progress or IndexBuildProgress()
+    chunk_size = max(1, chunk_size)
+    starts = range(0, len(texts), chunk_size)
+    _prepare_checkpoints(
+        checkpoint_dir, build_key | {"rows": len(texts), "chunk_size": chunk_size}
+    )
+
+    progress.start(total_rows=len(texts), total_chunks=len(starts))
+    pending = []
+    for index, start in enumerate(starts):
+        rows = len(texts[start : start + chunk_size])
+        if _checkpoint_rows(checkpoint_dir, index) == rows:
+            progress.add_chunk(rows, resumed=True)
+        else:
+            pending.append((index, start))
+    if len(pending) < len(starts):
+        logger.info(
+            f"Resuming index build with {len(starts) - len(pending)} of "
+            f"{len(starts)} chunks already embedded"
+        )
+
+    workers = max(1, min(workers, len(pending)))
+    logger.info(f"Embedding {len(pending)} index chunks with {workers} workers")
+    if workers == 1:
+        encoder = encoder_factory() if pending else None
+        for index, start in pending:
+            chunk = texts[start : start + chunk_size]
+            _write_checkpoint(checkpoint_dir, index, encoder.embed_documents(chunk))
+            progress.add_chunk(len(chunk))
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            # Spawn rather than fork, as the service process runs threads
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(encoder_factory, threads),
+        ) as pool:
+            futures = {
+                pool.submit(_encode_chunk, texts[start : start + chunk_size]): index
+                for index, start in pending
+            }
+            for future in as_completed(futures):
+                embeddings = future.result()
+                _write_checkpoint(checkpoint_dir, futures[future], embeddings)
+                progress.add_chunk(len(embeddings))
+
+    embeddings = np.concatenate(
+        [
+            np.load(os.path.join(checkpoint_dir, CHUNK_FILE.format(index=index)))
+            for index in range(len(starts))
+        ]
+        or [np.empty((0, 0), dtype=np.float32)]
+    )
+    progress.finish()
+    return embeddings
+
+
+def update_index_embeddings(
+    texts: list[str],
+    row_hashes: list[str],
+    previous: Snapshot | None,
+    **build_options,
+) -> tuple[np.ndarray, dict]:
+    """Embed the rows of the index that are not in the previous snapshot.
+
+    Rows whose content hash is in the previous snapshot reuse its embedding,
+    the remaining rows are embedded with `build_index_embeddings`, and rows of
+    the previous snapshot that are no longer in the index are dropped.
+
+    Args:
+        texts: The text of each row of the index.
+        row_hashes: The content hash of each row of the index.
+        previous: The previous snapshot built with the same embedding model,
+            if there is one.
+        **build_options: Options passed to `build_index_embeddings`.
+
+    Returns:
+        tuple[np.ndarray, dict]: The float32 embedding of each row, in row
+        order, and the number of rows reused, embedded and removed relative to
+        the previous index version.
+    """
+    previous_rows: dict[str, int] = {}
+    if previous is not None and previous.row_hashes is not None:
+        previous_rows = {
+            row_hash: row for row, row_hash in enumerate(previous.row_hashes.tolist())
+        }
+
+    reused = [
+        row for row, row_hash in enumerate(row_hashes) if row_hash in previous_rows
+    ]
+    pending = [
+        row for row, row_hash in enumerate(row_hashes) if row_hash not in previous_rows
+    ]
+    changes = {
+        "previous_index_version": previous.index_version if previous else "",
+        "reused_rows": len(reused),
+        "embedded_rows": len(pending),
+        "removed_rows": len(previous_rows.keys() - set(row_hashes)),
+    }
+    logger.info(
+        f"Index build: {changes['reused_rows']} rows unchanged, "
+        f"{changes['embedded_rows']} rows to embed, "
+        f"{changes['removed_rows']} rows removed"
+    )
+    if not reused:
+        return build_index_embeddings(texts, **build_options), changes
+
+    build_key = build_options.pop("build_key") | {
+        # Checkpoints are only reused for the same set of rows to embed
+        "pending_rows": hashlib.sha256(
+            "".join(row_hashes[row] for row in pending).encode("utf-8")
+        ).hexdigest()
+    }
+    embedded = build_index_embeddings(
+        [texts[row] for row in pending], build_key=build_key, **build_options
+    )
+
+    embeddings = np.empty((len(texts), previous.embeddings.shape[1]), dtype=np.float32)
+    embeddings[reused] = previous.embeddings[
+        [previous_rows[row_hashes[row]] for row in reused]
+    ]
+    if pending:
+        embeddings[pending] = embedded
+    return embeddings, changes
+
+
+def clear_checkpoints(checkpoint_dir: str):
+    """Remove the checkpoints of a build once its index has been written.
+
+    Args:
+        checkpoint_dir: The directory completed chunks are checkpointed to.
+    """
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+
+def _init_worker(encoder_factory: Callable, threads: int):
+    """Create the encoder of a build worker process.
+
+    Args:
+        encoder_factory: A callable creating the encoder.
+        threads: The number of threads each worker's model may use, so that
+            the workers together do not oversubscribe the cores.
+    """
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[variable] = str(threads)
+    _worker_state["encoder"] = encoder_factory()
+
+
+def _encode_chunk(texts: list[str]) -> np.ndarray:
+    """Encode a chunk of texts in a build worker process.
+
+    Args:
+        texts: The texts in the chunk.
+
+    Returns:
+        np.ndarray: The float32 embedding of each text.
+    """
+    return np.asarray(_worker_state["encoder"].embed_documents(texts), dtype=np.float32)
+
+
+def _prepare_checkpoints(checkpoint_dir: str, build_key: dict):
+    """Discard checkpoints that belong to a different build.
+
+    Args:
+        checkpoint_dir: The directory completed chunks are checkpointed to.
+        build_key: Identifies the sources, model, rows and chunk size of the build.
+    """
+    manifest_path = os.path.join(checkpoint_dir, BUILD_MANIFEST_FILE)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = None
+
+    if previous != build_key:
+        if previous is not None:
+            logger.info("Discarding index build checkpoints from a different build")
+        clear_checkpoints(checkpoint_dir)
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(build_key, f, indent=2)
+
+
+def _checkpoint_rows(checkpoint_dir: str, index: int) -> int:
+    """Return the number of rows in a chunk checkpoint.
+
+    Args:
+        checkpoint_dir: The directory completed chunks are checkpointed to.
+        index: The index of the chunk.
+
+    Returns:
+        int: The number of rows checkpointed, or -1 if there is no readable
+        checkpoint for the chunk.
+    """
+    try:
+        return np.load(
+            os.path.join(checkpoint_dir, CHUNK_FILE.format(index=index)),
+            mmap_mode="r",
+        ).shape[0]
+    except (OSError, ValueError):
+        return -1
+
+
+def _write_checkpoint(checkpoint_dir: str, index: int, embeddings):
+    """Atomically write the embeddings of a completed chunk.
+
+    Args:
+        checkpoint_dir: The directory completed chunks are checkpointed to.
+        index: The index of the chunk.
+        embeddings: The embedding of each row of the chunk.
+    """
+    path = os.path.join(checkpoint_dir, CHUNK_FILE.format(index=index))
+    with open(f"{path}.tmp", "wb") as f:
+        np.save(f, np.asarray(embeddings, dtype=np.float32))
+    os.replace(f"{path}.tmp", path)
@@ -0,0 +1,142 @@
+"""Provides exact matching of job titles against the SOC coding index.
+
+Many survey job titles are, once normalised, exactly the title of a coding
+index entry. This module contains a hash index of the normalised titles of
+the entries, alone and followed by their qualifiers, so those queries can be
+answered without encoding them and searching the vector store.
+"""
+
+from soc_classification_vector_store.utils.batching import collapse_codes
+from soc_classification_vector_store.utils.cache import normalise_text
+from soc_classification_vector_store.utils.metrics import (
+    EXACT_MATCH_LOOKUPS,
+    timed_stage,
+)
+from soc_classification_vector_store.utils.search_backend import in_major_groups
+from soc_classification_vector_store.utils.search_options import SearchOptions
+from soc_classification_vector_store.utils.soc_index import (
+    QUALIFIER_COLUMNS,
+    TITLE_COLUMN,
+    soc_index_documents,
+)
+
+
+class LexicalIndex:
+    """Hash index from normalised coding index titles to their entries.
+
+    Each entry is indexed under its title, its title followed by each of its
+    qualifiers, and its full text. A key maps to the first entry of each SOC
+    code indexed under it, in coding index order.
+    """
+
+    def __init__(self):
+        """Initialise an empty lexical index."""
+        self._entries: dict[str, list[dict]] = {}
+
+    @classmethod
+    def from_frame(cls, frame) -> "LexicalIndex":
+        """Build the lexical index of the coding index entries.
+
+        Args:
+            frame: The coding index entries read by `read_soc_index`.
+
+        Returns:
+            LexicalIndex: The lexical index.
+        """
+        index = cls()
+        _texts, metadata = soc_index_documents(frame)
+        qualifiers = zip(*(frame[name] for name in QUALIFIER_COLUMNS), strict=True)
+        for title, entry_qualifiers, entry in zip(
+            frame[TITLE_COLUMN], qualifiers, metadata, strict=True
+        ):
+            present = [part for part in entry_qualifiers if part.strip()]
+            for key in (title, *(f"{title} {part}" for part in present)):
+                index.add(key, entry)
+            index.add(entry["title"], entry)
+        return index
+
+    @property
+    def size(self) -> int:
+        """The number of distinct normalised keys in the index."""
+        return len(self._entries)
+
+    def add(self, text: str, entry: dict):
+        """Index an entry under a text.
+
+        Args:
+            text: The text the entry is found by.
+            entry: The metadata of the entry, with its code and title.
+        """
+        key = normalise_text(text)
+        if not key:
+            return
+        entries = self._entries.setdefault(key, [])
+        if all(existing["code"] != entry["code"] for existing in entries):
+            entries.append(entry)
+
+    def lookup(self, industry_descr: str, job_title: str) -> list[dict]:
+        """Find the entries whose title matches a job title exactly.
+
+        The job title followed by the industry description is looked up first,
+        so that an industry qualifier picks out its entry, then the job title.
+
+        Args:
+            industry_descr: The industry description of the query.
+            job_title: The job title of the query.
+
+        Returns:
+            list[dict]: The matching entries with a distance of 0, in coding
+            index order, or an empty list if there is no exact match.
+        """
+        for text in (f"{job_title} {industry_descr}", job_title):
+            entries = self._entries.get(normalise_text(text))
+            if entries:
+                return [{"distance": 0.0} | entry for entry in entries]
+        return []
+
+
+def exact_hits(
+    lexical_index: LexicalIndex, query: list[str], options: SearchOptions | None
+) -> list[dict]:
+    """Look up the exact title matches of a query, counting hits and misses.
+
+    Args:
+        lexical_index: The lexical index of the loaded coding index.
+        query: The industry description, job title and job description.
+        options: The search options, None for the defaults.
+
+    Returns:
+        list[dict]: The exact matches allowed by the options, at most `k`.
+    """
+    with timed_stage("exact_match"):
+        hits = lexical_index.lookup(query[0], query[1])
+    EXACT_MATCH_LOOKUPS.inc(result="hit" if hits else "miss")
+    if options is None:
+        return hits
+    hits = [hit for hit in hits if in_major_groups(hit, options.major_groups)]
+    return hits if options.k is None else hits[: options.k]
+
+
+def merge_exact_hits(
+    hits: list[dict], matches: list[dict], k: int | None, unique_codes: bool
+) -> list[dict]:
+    """Put exact matches ahead of the vector search results of a query.
+
+    Args:
+        hits: The exact matches of the query.
+        matches: The vector search results, nearest first.
+        k: The number of results to keep, or None to keep them all.
+        unique_codes: Whether to keep only the first result for each code.
+
+    Returns:
+        list[dict]: The exact matches followed by the other results.
+    """
+    found = {(hit.get("code"), hit.get("title")) for hit in hits}
+    merged = hits + [
+        match
+        for match in matches
+        if (match.get("code"), match.get("title")) not in found
+    ]
+    if unique_codes:
+        return collapse_codes(merged, k)
+    return merged if k is None else merged[:k]
@@ -0,0 +1,478 @@
+"""Provides lightweight metrics for the vector store service.
+
+This module contains a small, thread-safe metrics registry with counters,
+gauges and histograms that render in the Prometheus text exposition format,
+and helpers to time each stage of a search and each phase of loading the
+index. Stage timings are recorded in the stage histogram and, for the request
+being served, in a per-request dictionary used to build the `Server-Timing`
+response header.
+
+Recording a sample is a lock and a few additions, so the metrics are cheap
+enough to leave on in production.
+"""
+
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# The stage timings of the request being served, if any
+_stage_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "stage_timings", default=None
+)
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    """Format label pairs for the text exposition format.
+
+    Args:
+        labels: The label names and values.
+
+    Returns:
+        str: The labels in braces, or an empty string if there are none.
+    """
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return f"{{{pairs}}}"
+
+
+def render_samples(
+    name: str, metric_type: str, documentation: str, samples: list[tuple[dict, float]]
+) -> list[str]:
+    """Render samples of a metric in the text exposition format.
+
+    Args:
+        name: The metric name.
+        metric_type: The metric type, counter or gauge.
+        documentation: The help text of the metric.
+        samples: The labels and value of each sample.
+
+    Returns:
+        list[str]: The lines describing the metric.
+    """
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    lines.extend(
+        f"{name}{_format_labels(tuple(labels.items()))} {value}"
+        for labels, value in samples
+    )
+    return lines
+
+
+class _Metric:
+    """Base class for a metric with optional labels."""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str):
+        """Initialise the metric.
+
+        Args:
+            name: The metric name.
+            documentation: The help text of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self._values: dict[tuple[tuple[str, str], ...], float] = {}
+        self._lock = Lock()
+
+    def value(self, **labels) -> float:
+        """Return the current value of the metric.
+
+        Args:
+            **labels: The labels of the sample.
+
+        Returns:
+            float: The value of the sample, 0 if it has not been recorded.
+        """
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def samples(self) -> list[tuple[dict, float]]:
+        """Return every recorded sample of the metric.
+
+        Returns:
+            list[tuple[dict, float]]: The labels and value of each sample.
+        """
+        with self._lock:
+            return [(dict(labels), value) for labels, value in self._values.items()]
+
+    def clear(self):
+        """Remove every recorded sample of the metric."""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        """Render the metric in the text exposition format.
+
+        Returns:
+            list[str]: The lines describing the metric.
+        """
+        return render_samples(
+            self.name, self.metric_type, self.documentation, self.samples()
+        )
+
+
+class Counter(_Metric):
+    """A monotonically increasing counter."""
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        """Increase the counter.
+
+        Args:
+            amount: The amount to increase the counter by.
+            **labels: The labels of the sample.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels):
+        """Set the gauge.
+
+        Args:
+            value: The new value.
+            **labels: The labels of the sample.
+        """
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount: float = 1, **labels):
+        """Increase the gauge.
+
+        Args:
+            amount: The amount to increase the gauge by, negative to decrease.
+            **labels: The labels of the sample.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    """A histogram of observed values in cumulative buckets."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple = DEFAULT_BUCKETS):
+        """Initialise the histogram.
+
+        Args:
+            name: The metric name.
+            documentation: The help text of the metric.
+            buckets: The upper bounds of the buckets, in increasing order.
+        """
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        # Per label set: a count for each bucket plus +Inf, then the sum
+        self._histograms: dict[tuple[tuple[str, str], ...], list[float]] = {}
+
+    def observe(self, value: float, **labels):
+        """Record an observation.
+
+        Args:
+            value: The observed value.
+            **labels: The labels of the sample.
+        """
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0.0] * (len(self.buckets) + 2)
+            histogram[index] += 1
+            histogram[-1] += value
+
+    def count(self, **labels) -> int:
+        """Return the number of observations.
+
+        Args:
+            **labels: The labels of the sample.
+
+        Returns:
+            int: The number of observations recorded.
+        """
+        with self._lock:
+            histogram = self._histograms.get(tuple(sorted(labels.items())))
+            return int(sum(histogram[:-1])) if histogram else 0
+
+    def render(self) -> list[str]:
+        """Render the histogram in the text exposition format.
+
+        Returns:
+            list[str]: The lines describing the histogram.
+        """
+        with self._lock:
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for labels, histogram in histograms.items():
+            cumulative = 0.0
+            for bound, count in zip(
+                (*self.buckets, "+Inf"), histogram[:-1], strict=True
+            ):
+                cumulative += count
+                bucket_labels = _format_labels((*labels, ("le", str(bound))))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {histogram[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """A collection of metrics rendered together."""
+
+    def __init__(self):
+        """Initialise the registry."""
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric):
+        """Add a metric to the registry.
+
+        Args:
+            metric: The metric to add.
+
+        Returns:
+            The metric, so that it can be created and registered in one step.
+        """
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> list[str]:
+        """Render every metric in the text exposition format.
+
+        Returns:
+            list[str]: The lines describing every metric.
+        """
+        return [line for metric in self._metrics for line in metric.render()]
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "vector_store_search_stage_seconds",
+        "Time spent in each stage of the search path.",
+    )
+)
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "vector_store_request_seconds", "Time taken to serve each search request."
+    )
+)
+REQUESTS_IN_FLIGHT = REGISTRY.register(
+    Gauge("vector_store_requests_in_flight", "Search requests being served.")
+)
+UNAVAILABLE_RESPONSES = REGISTRY.register(
+    Counter(
+        "vector_store_unavailable_responses_total",
+        "Search requests answered with a 503, by reason.",
+    )
+)
+SHED_REQUESTS = REGISTRY.register(
+    Counter(
+        "vector_store_shed_requests_total",
+        "Search requests given up before completing, by reason.",
+    )
+)
+INDEX_LOAD_SECONDS = REGISTRY.register(
+    Gauge("vector_store_index_load_seconds", "Time taken to load the index.")
+)
+STARTUP_PHASE_SECONDS = REGISTRY.register(
+    Gauge(
+        "vector_store_startup_phase_seconds",
+        "Time taken by each phase of the last index load, by phase.",
+    )
+)
+EXACT_MATCH_LOOKUPS = REGISTRY.register(
+    Counter(
+        "vector_store_exact_match_lookups_total",
+        "Exact title lookups in the coding index before vector search, by result.",
+    )
+)
+EXACT_MATCH_SECONDS_SAVED = REGISTRY.register(
+    Counter(
+        "vector_store_exact_match_seconds_saved_total",
+        "Estimated vector search time saved by answering queries from exact "
+        "title matches.",
+    )
+)
+
+
+def record_stage(stage: str, seconds: float, timings: dict[str, float] | None = None):
+    """Record the time spent in a stage of the search path.
+
+    Args:
+        stage: The name of the stage.
+        seconds: The time spent in the stage.
+        timings: The stage timings of the request the time is recorded for,
+            defaults to those of the request being served.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _stage_timings.get() if timings is None else timings
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Time a stage of the search path.
+
+    Args:
+        stage: The name of the stage.
+
+    Yields:
+        None: While the stage runs.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, perf_counter() - start)
+
+
+@contextmanager
+def timed_startup_phase(phase: str) -> Iterator[None]:
+    """Time a phase of loading the index, adding to any earlier time in it.
+
+    Args:
+        phase: The name of the phase, for example "model_load".
+
+    Yields:
+        None: While the phase runs.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_PHASE_SECONDS.inc(perf_counter() - start, phase=phase)
+
+
+def startup_phases() -> dict[str, float]:
+    """Return the time taken by each phase of the last index load.
+
+    Returns:
+        dict[str, float]: The seconds taken by each phase, in the order they
+        started.
+    """
+    return {
+        labels["phase"]: seconds for labels, seconds in STARTUP_PHASE_SECONDS.samples()
+    }
+
+
+def current_stage_timings() -> dict[str, float] | None:
+    """Return the stage timings of the request being served.
+
+    Returns:
+        dict[str, float] | None: The seconds spent in each stage so far, or
+        None outside of a tracked request.
+    """
+    return _stage_timings.get()
+
+
+@contextmanager
+def stage_timings(timings: dict[str, float] | None = None) -> Iterator[dict]:
+    """Collect the stage timings recorded within a block.
+
+    Args:
+        timings: The dictionary to record timings in, a new one by default.
+
+    Yields:
+        dict[str, float]: The seconds spent in each stage.
+    """
+    timings = {} if timings is None else timings
+    token = _stage_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _stage_timings.reset(token)
+
+
+def start_request(endpoint: str) -> Callable[[], None]:
+    """Count a search request as in flight until it finishes.
+
+    Args:
+        endpoint: The name of the endpoint serving the request.
+
+    Returns:
+        Callable[[], None]: Records that the request has finished, and its
+        latency. Only the first call has an effect, so a request handed on
+        to a streaming response can be finished by whichever ends it.
+    """
+    REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+    start = perf_counter()
+    finished = False
+
+    def finish():
+        nonlocal finished
+        if not finished:
+            finished = True
+            REQUEST_SECONDS.observe(perf_counter() - start, endpoint=endpoint)
+            REQUESTS_IN_FLIGHT.inc(-1, endpoint=endpoint)
+
+    return finish
+
+
+@contextmanager
+def track_request(endpoint: str) -> Iterator[dict]:
+    """Track a search request and collect its stage timings.
+
+    Args:
+        endpoint: The name of the endpoint serving the request.
+
+    Yields:
+        dict[str, float]: The seconds spent in each stage of the request.
+    """
+    finish = start_request(endpoint)
+    try:
+        with stage_timings() as timings:
+            yield timings
+    finally:
+        finish()
+
+
+def server_timing(timings: dict[str, float]) -> str:
+    """Build a `Server-Timing` header value from stage timings.
+
+    Args:
+        timings: The seconds spent in each stage.
+
+    Returns:
+        str: The header value, with durations in milliseconds.
+    """
+    return ", ".join(
+        f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in timings.items()
+    )
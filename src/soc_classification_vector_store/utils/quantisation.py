@@ -0,0 +1,71 @@
+"""Provides compact storage of the index embeddings.
+
+This module contains the conversion of the float32 embedding matrix to the
+reduced precision representations searched by the exact search backend:
+
+- `float16`: half precision, halving the memory of the matrix.
+- `int8`: symmetric scalar quantisation with one scale factor per dimension,
+  a quarter of the memory of the matrix. Each dimension is scaled so that its
+  largest absolute value maps to 127, so a row is recovered as its codes
+  multiplied by the scales.
+"""
+
+import numpy as np
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+INT8_MAX = 127
+
+# Rows of a matrix converted at a time, bounding the temporary memory used
+_BLOCK_ROWS = 4096
+
+
+def quantise(matrix: np.ndarray, dtype: str) -> tuple[np.ndarray, np.ndarray | None]:
+    """Convert an embedding matrix to a storage dtype.
+
+    Args:
+        matrix: The float32 embeddings, one per row.
+        dtype: The storage dtype, one of `STORAGE_DTYPES`.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray | None]: The converted matrix, and the
+        float32 scale of each dimension for int8, otherwise None.
+
+    Raises:
+        ValueError: If the dtype is not a storage dtype.
+    """
+    if dtype not in STORAGE_DTYPES:
+        raise ValueError(
+            f"Unknown storage dtype {dtype!r}, expected one of {STORAGE_DTYPES}"
+        )
+    if dtype != "int8":
+        # A matrix already in the requested dtype, memory-mapped or not, is used as is
+        return np.asarray(matrix, dtype=np.dtype(dtype)), None
+
+    rows = matrix.shape[0]
+    max_abs = np.zeros(matrix.shape[1], dtype=np.float32)
+    for start in range(0, rows, _BLOCK_ROWS):
+        block = np.abs(np.asarray(matrix[start : start + _BLOCK_ROWS], np.float32))
+        np.maximum(max_abs, block.max(axis=0), out=max_abs)
+    scales = np.where(max_abs > 0, max_abs / INT8_MAX, 1.0).astype(np.float32)
+
+    codes = np.empty(matrix.shape, dtype=np.int8)
+    for start in range(0, rows, _BLOCK_ROWS):
+        block = np.asarray(matrix[start : start + _BLOCK_ROWS], np.float32) / scales
+        codes[start : start + _BLOCK_ROWS] = np.clip(
+            np.rint(block), -INT8_MAX, INT8_MAX
+        )
+    return codes, scales
+
+
+def dequantise(values: np.ndarray, scales: np.ndarray | None = None) -> np.ndarray:
+    """Convert rows of a stored matrix back to float32.
+
+    Args:
+        values: The stored rows.
+        scales: The scale of each dimension, for int8 rows.
+
+    Returns:
+        np.ndarray: The float32 rows.
+    """
+    rows = np.asarray(values, dtype=np.float32)
+    return rows * scales if scales is not None else rows
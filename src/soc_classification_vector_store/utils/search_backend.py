@@ -0,0 +1,890 @@
+"""Provides the search backends used to query the SOC index.
+
+This module contains the interface implemented by every search backend and
+two implementations:
+
+- `EmbeddingHandlerBackend`: searches the Chroma vector store built by
+  `EmbeddingHandler`, exactly as the service always has.
+- `ExactSearchBackend`: holds the normalised index embeddings in a NumPy array
+  and finds the exact nearest neighbours of a batch of queries with one matrix
+  product and `argpartition`. At the size of the SOC coding index this is
+  faster and more predictable than a vector database round trip.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from soc_classification_vector_store.utils.batching import (
+    collapse_codes,
+    search_index_multi_batch,
+)
+from soc_classification_vector_store.utils.metrics import timed_stage
+from soc_classification_vector_store.utils.quantisation import dequantise, quantise
+from soc_classification_vector_store.utils.query_encoder import QUERY_ENCODER_DEFAULT
+from soc_classification_vector_store.utils.snapshot import Snapshot
+
+# Rows of a reduced precision matrix converted to float32 at a time
+_BLOCK_ROWS = 4096
+# Times as many documents fetched from Chroma when collapsing results by code
+UNIQUE_CODES_OVERFETCH = 4
+# Characters of a SOC 2020 unit group code giving its major and minor group
+MAJOR_GROUP_DIGITS = 1
+MINOR_GROUP_DIGITS = 3
+
+
+def select_fields(metadata: dict, fields: frozenset[str] | None) -> dict:
+    """Select some fields of the metadata of a document.
+
+    Args:
+        metadata: The metadata of the document.
+        fields: The fields to keep, or None to keep every field.
+
+    Returns:
+        dict: The selected metadata.
+    """
+    if fields is None:
+        return dict(metadata)
+    return {field: value for field, value in metadata.items() if field in fields}
+
+
+def in_major_groups(metadata: dict, major_groups: frozenset[str] | None) -> bool:
+    """Check whether a document belongs to one of the given major groups.
+
+    Args:
+        metadata: The metadata of the document.
+        major_groups: The SOC major groups, or None for every group.
+
+    Returns:
+        bool: True if the code of the document is in one of the major groups.
+    """
+    if major_groups is None:
+        return True
+    return str(metadata.get("code", ""))[:MAJOR_GROUP_DIGITS] in major_groups
+
+
+class SearchBackend(ABC):
+    """Interface for nearest-neighbour search over the embedded SOC index.
+
+    Attributes:
+        name (str): The name used to select the backend.
+        embed: The `EmbeddingHandler` whose embedding model encodes queries.
+        encoder: The encoder used instead of the embedding model, if any.
+    """
+
+    name = ""
+
+    def __init__(self, embed, encoder=None):
+        """Initialise the search backend.
+
+        Args:
+            embed: The `EmbeddingHandler` whose embedding model encodes queries.
+            encoder: An encoder with an `embed_documents` method used instead
+                of the embedding model, such as a `QuantisedEncoder`.
+        """
+        self.embed = embed
+        self.encoder = encoder
+
+    @property
+    def embeddings(self):
+        """The embedding model used to encode queries."""
+        return self.embed.embeddings if self.encoder is None else self.encoder
+
+    @property
+    def query_encoder(self) -> str:
+        """The name of the encoder of the queries."""
+        return QUERY_ENCODER_DEFAULT if self.encoder is None else self.encoder.name
+
+    @property
+    def k_matches(self) -> int:
+        """The number of nearest matches returned for each search term."""
+        return self.embed.k_matches
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Encode texts in a single batch.
+
+        Args:
+            texts: The texts to encode.
+
+        Returns:
+            np.ndarray: The float32 embedding of each text, one per row.
+        """
+        return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+    @abstractmethod
+    def search_by_vectors(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+        self,
+        vectors,
+        k: int | None = None,
+        unique_codes: bool = False,
+        *,
+        major_groups: frozenset[str] | None = None,
+        max_distance: float | None = None,
+        metadata_fields: frozenset[str] | None = None,
+    ) -> list[list[dict]]:
+        """Return the nearest documents to each of a batch of query vectors.
+
+        Args:
+            vectors: The query embeddings, one per row.
+            k: The number of matches for each query, defaults to `k_matches`.
+            unique_codes: Whether to return only the nearest document for each
+                SOC code, searching further until there are `k` distinct codes.
+            major_groups: The SOC major groups to restrict results to, or None
+                for every group.
+            max_distance: The largest distance of a match, or None for no limit.
+            metadata_fields: The metadata fields of each match, or None for all.
+
+        Returns:
+            list[list[dict]]: The nearest documents for each query, nearest first.
+        """
+
+    def search_index(self, query: str) -> list[dict]:
+        """Return the nearest documents to a query.
+
+        Args:
+            query: The text to search for.
+
+        Returns:
+            list[dict]: The nearest documents with their distances, nearest first.
+        """
+        return self.search_by_vectors(self.encode([query]))[0]
+
+    def search_index_multi(self, query: list[str]) -> list[dict]:
+        """Return the nearest documents to a list of query fields.
+
+        Args:
+            query: The query fields in priority order.
+
+        Returns:
+            list[dict]: The nearest documents for every search term, nearest first.
+        """
+        return search_index_multi_batch(self, [query])[0]
+
+    def get_embed_config(self) -> dict:
+        """Return the embedding configuration of the loaded index.
+
+        Returns:
+            dict: The embedding handler configuration, the backend name and
+            the query encoder name.
+        """
+        return dict(self.embed.get_embed_config()) | {
+            "search_backend": self.name,
+            "query_encoder": self.query_encoder,
+        }
+
+
+class EmbeddingHandlerBackend(SearchBackend):
+    """Search backend using the Chroma vector store of an `EmbeddingHandler`."""
+
+    name = "embedding_handler"
+
+    def search_by_vectors(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+        self,
+        vectors,
+        k: int | None = None,
+        unique_codes: bool = False,
+        *,
+        major_groups: frozenset[str] | None = None,
+        max_distance: float | None = None,
+        metadata_fields: frozenset[str] | None = None,
+    ) -> list[list[dict]]:
+        """Return the nearest documents to each of a batch of query vectors.
+
+        Chroma is queried once per vector. For unique codes or major groups it
+        is queried for `UNIQUE_CODES_OVERFETCH` times as many documents, which
+        are then filtered, so fewer than `k` matches are returned if there are
+        not enough among those. Documents beyond `max_distance` are dropped.
+
+        Args:
+            vectors: The query embeddings, one per row.
+            k: The number of matches for each query, defaults to `k_matches`.
+            unique_codes: Whether to return only the nearest document for each
+                SOC code.
+            major_groups: The SOC major groups to restrict results to, or None
+                for every group.
+            max_distance: The largest distance of a match, or None for no limit.
+            metadata_fields: The metadata fields of each match, or None for all.
+
+        Returns:
+            list[list[dict]]: The nearest documents for each query, nearest first.
+        """
+        vector_store = self.embed.vector_store
+        k = k or self.k_matches
+        results = [
+            [
+                {"distance": float(score)}
+                | select_fields(doc.metadata, metadata_fields)
+                for doc, score in (
+                    vector_store.similarity_search_by_vector_with_relevance_scores(
+                        embedding=list(map(float, vector)),
+                        k=(
+                            k * UNIQUE_CODES_OVERFETCH
+                            if unique_codes or major_groups
+                            else k
+                        ),
+                    )
+                )
+                if in_major_groups(doc.metadata, major_groups)
+                and (max_distance is None or score <= max_distance)
+            ]
+            for vector in vectors
+        ]
+        if unique_codes:
+            return [collapse_codes(matches, k) for matches in results]
+        return [matches[:k] for matches in results]
+
+    def search_index_multi(self, query: list[str]) -> list[dict]:
+        """Return the nearest documents to a list of query fields.
+
+        The embedding handler encodes and searches in one call, so both are
+        timed as the search stage.
+
+        Args:
+            query: The query fields in priority order.
+
+        Returns:
+            list[dict]: The results of `EmbeddingHandler.search_index_multi`.
+        """
+        with timed_stage("search"):
+            return self.embed.search_index_multi(query=query)
+
+
+class ExactSearchBackend(SearchBackend):  # pylint: disable=too-many-instance-attributes
+    """Exact nearest-neighbour search over an in-memory embedding matrix.
+
+    Distances are squared L2 distances, matching the default Chroma collection
+    space. The matrix can be held as float16, or as int8 with a scale factor
+    per dimension, to halve or quarter its memory, in which case it is
+    converted to float32 a block of rows at a time while searching. The nearest
+    candidates found in a reduced precision matrix can then be re-ranked using
+    the full precision embeddings, which are memory-mapped so that only the rows
+    of the candidates are read.
+
+    In a deduplicated index several documents share a row of the matrix. The
+    nearest rows are searched and then expanded to their documents.
+
+    The rows are grouped by the SOC 2020 minor group of their codes, the first
+    three digits. Results restricted to some major groups only score the rows
+    of their minor groups. With a hierarchical search, each query is first
+    matched against the centroid of every minor group and only the rows of the
+    `hierarchy_branches` nearest groups are scored, taking further groups when
+    those have fewer than `k` rows.
+
+    Attributes:
+        matrix (np.ndarray): The index embeddings, one row per document or per
+            unique document text.
+        metadata (dict[str, np.ndarray]): The values of each metadata field,
+            one per document.
+        index_version (str): The version of the index, if known.
+        scales (np.ndarray | None): The scale of each dimension of an int8 matrix.
+        full_matrix (np.ndarray | None): The float32 embeddings used to re-rank
+            candidates, if re-ranking is enabled.
+        rerank_candidates (int): The number of candidates re-ranked for each query.
+        hierarchy_branches (int): The number of minor groups searched for each
+            query in a hierarchical search, 0 to search every row.
+        groups (np.ndarray): The SOC minor groups of the documents, sorted.
+    """
+
+    name = "exact"
+
+    def __init__(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+        self,
+        embed,
+        matrix: np.ndarray,
+        metadata: dict[str, np.ndarray],
+        index_version: str = "",
+        dtype: str = "float32",
+        *,
+        row_vectors: np.ndarray | None = None,
+        scales: np.ndarray | None = None,
+        full_matrix: np.ndarray | None = None,
+        rerank_candidates: int = 0,
+        hierarchy_branches: int = 0,
+        encoder=None,
+    ):
+        """Initialise the exact search backend.
+
+        Args:
+            embed: The `EmbeddingHandler` whose embedding model encodes queries.
+            matrix: The index embeddings, one row per document, or one row per
+                unique document text if `row_vectors` is given. A float32 matrix
+                is converted to `dtype`, a matrix already in `dtype` is used as is.
+            metadata: The values of each metadata field, one per document.
+            index_version: The version of the index, if known.
+            dtype: The dtype the matrix is held in, float32, float16 or int8.
+            row_vectors: The row of the matrix of each document, for a
+                deduplicated index.
+            scales: The scale of each dimension of a matrix already in int8.
+            full_matrix: The float32 embeddings used to re-rank candidates,
+                defaults to `matrix` when it is converted.
+            rerank_candidates: The number of nearest candidates in a reduced
+                precision matrix to re-rank at full precision, 0 to disable.
+            hierarchy_branches: The number of minor groups searched for each
+                query, 0 to search every row.
+            encoder: The encoder of the queries, if not the embedding model.
+        """
+        super().__init__(embed, encoder)
+        if matrix.dtype == np.dtype(dtype) and (dtype != "int8" or scales is not None):
+            self.matrix, self.scales = np.asarray(matrix), scales
+        else:
+            self.matrix, self.scales = quantise(matrix, dtype)
+            full_matrix = matrix if full_matrix is None else full_matrix
+        self._memory_mapped = isinstance(matrix, np.memmap) and np.may_share_memory(
+            self.matrix, matrix
+        )
+        self.rerank_candidates = max(0, rerank_candidates)
+        self.full_matrix = (
+            full_matrix
+            if self.rerank_candidates and self.matrix.dtype != np.float32
+            else None
+        )
+        self.metadata = metadata
+        self.index_version = index_version
+        # The documents of each row, as offsets into the documents sorted by row
+        self._row_documents = self._row_offsets = None
+        if row_vectors is not None:
+            self._row_documents = np.argsort(row_vectors, kind="stable")
+            self._row_offsets = np.searchsorted(
+                np.asarray(row_vectors)[self._row_documents],
+                np.arange(self.size + 1),
+            )
+        self._squared_norms = np.concatenate(
+            [np.einsum("ij,ij->i", block, block) for block in self._float32_blocks()]
+            or [np.empty(0, dtype=np.float32)]
+        )
+        self.groups, self._group_rows = self._minor_group_rows(row_vectors)
+        self.hierarchy_branches = max(0, hierarchy_branches)
+        # The mean embedding of each minor group, matched in a hierarchical search
+        self._centroids = None
+        if self.hierarchy_branches and len(self.groups):
+            self._centroids = np.stack(
+                [
+                    dequantise(self.matrix[rows], self.scales).mean(axis=0)
+                    for rows in self._group_rows
+                ]
+            )
+
+    @classmethod
+    def from_snapshot(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+        cls,
+        snapshot: Snapshot,
+        embed,
+        dtype: str = "float32",
+        rerank_candidates: int = 0,
+        hierarchy_branches: int = 0,
+        *,
+        encoder=None,
+    ) -> "ExactSearchBackend":
+        """Create an exact search backend over a loaded snapshot.
+
+        The compact copy of the matrix in the snapshot is memory-mapped if there
+        is one in the requested dtype, otherwise the matrix is converted.
+
+        Args:
+            snapshot: The memory-mapped snapshot.
+            embed: The `EmbeddingHandler` whose embedding model encodes queries.
+            dtype: The dtype the matrix is held in, float32, float16 or int8.
+            rerank_candidates: The number of candidates to re-rank at full
+                precision, 0 to disable.
+            hierarchy_branches: The number of minor groups searched for each
+                query, 0 to search every row.
+            encoder: The encoder of the queries, if not the embedding model.
+
+        Returns:
+            ExactSearchBackend: The search backend.
+
+        Raises:
+            ValueError: If the snapshot was built with a different encoder.
+        """
+        name = QUERY_ENCODER_DEFAULT if encoder is None else encoder.name
+        if snapshot.query_encoder != name:
+            raise ValueError(
+                f"Snapshot {snapshot.index_version} was built with the "
+                f"{snapshot.query_encoder} encoder, not the {name} query encoder"
+            )
+        matrix, scales = snapshot.compact.get(dtype, (snapshot.embeddings, None))
+        return cls(
+            embed,
+            matrix=matrix,
+            metadata=snapshot.metadata,
+            index_version=snapshot.index_version,
+            dtype=dtype,
+            row_vectors=snapshot.row_vectors,
+            scales=scales,
+            full_matrix=snapshot.embeddings,
+            rerank_candidates=rerank_candidates,
+            hierarchy_branches=hierarchy_branches,
+            encoder=encoder,
+        )
+
+    @classmethod
+    def from_embedding_handler(
+        cls,
+        embed,
+        dtype: str = "float32",
+        rerank_candidates: int = 0,
+        hierarchy_branches: int = 0,
+    ) -> "ExactSearchBackend":
+        """Create an exact search backend from an embedded Chroma vector store.
+
+        Args:
+            embed: The `EmbeddingHandler` holding the embedded SOC index.
+            dtype: The dtype the matrix is held in, float32, float16 or int8.
+            rerank_candidates: The number of candidates to re-rank at full
+                precision, 0 to disable.
+            hierarchy_branches: The number of minor groups searched for each
+                query, 0 to search every row.
+
+        Returns:
+            ExactSearchBackend: The search backend.
+        """
+        documents = embed.vector_store.get(include=["embeddings", "metadatas"])
+        metadatas = documents["metadatas"]
+        fields = list(dict.fromkeys(field for row in metadatas for field in row))
+        return cls(
+            embed,
+            matrix=np.asarray(documents["embeddings"], dtype=np.float32),
+            metadata={
+                field: np.asarray([row.get(field, "") for row in metadatas])
+                for field in fields
+            },
+            dtype=dtype,
+            rerank_candidates=rerank_candidates,
+            hierarchy_branches=hierarchy_branches,
+        )
+
+    @property
+    def size(self) -> int:
+        """The number of rows in the embedding matrix."""
+        return self.matrix.shape[0]
+
+    @property
+    def documents(self) -> int:
+        """The number of documents in the index."""
+        if self._row_documents is None:
+            return self.size
+        return len(self._row_documents)
+
+    def search(
+        self, queries, k: int, major_groups: frozenset[str] | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find the exact nearest documents to a batch of query vectors.
+
+        With re-ranking, the nearest `rerank_candidates` rows of the reduced
+        precision matrix are found and the `k` nearest of those at full
+        precision are returned. A hierarchical search scores each query
+        against the rows of its nearest minor groups only.
+
+        Args:
+            queries: The query embeddings, one per row.
+            k: The number of matches for each query.
+            major_groups: The SOC major groups whose rows are searched, or None
+                for every row.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The row indices and distances of the
+            nearest documents for each query, nearest first.
+        """
+        queries = np.atleast_2d(np.asarray(queries, np.float32))
+        allowed = self._allowed_groups(major_groups)
+        if self._centroids is None or queries.shape[0] == 0:
+            rows = None if allowed is None else self._rows(np.flatnonzero(allowed))
+            return self._search_rows(queries, k, rows)
+
+        results = [
+            self._search_rows(query[None], k, self._branch_rows(query, k, allowed))
+            for query in queries
+        ]
+        return (
+            np.vstack([indices for indices, _distances in results]),
+            np.vstack([distances for _indices, distances in results]),
+        )
+
+    def _search_rows(
+        self, queries: np.ndarray, k: int, rows: np.ndarray | None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find the nearest of some rows, re-ranking them if enabled.
+
+        Args:
+            queries: The float32 query embeddings, one per row.
+            k: The number of matches for each query.
+            rows: The rows to search, or None for every row.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The row indices and distances of the
+            nearest rows for each query, nearest first.
+        """
+        if self.full_matrix is None:
+            return self._nearest(queries, k, rows)
+
+        candidates, _distances = self._nearest(
+            queries, max(k, self.rerank_candidates), rows
+        )
+        return self._rerank(queries, candidates, k)
+
+    def _nearest(
+        self, queries: np.ndarray, k: int, rows: np.ndarray | None = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find the nearest rows of the matrix to a batch of query vectors.
+
+        Args:
+            queries: The float32 query embeddings, one per row.
+            k: The number of matches for each query.
+            rows: The rows to search, or None for every row.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The row indices and distances of the
+            nearest rows for each query, nearest first.
+        """
+        distances = self._distances(queries, rows)
+        k = min(k, distances.shape[1])
+        if k <= 0:
+            empty = np.empty((distances.shape[0], 0))
+            return empty.astype(np.intp), empty.astype(np.float32)
+
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+        order = np.argsort(nearest_distances, axis=1, kind="stable")
+        nearest = np.take_along_axis(nearest, order, axis=1)
+        return (
+            nearest if rows is None else rows[nearest],
+            np.take_along_axis(nearest_distances, order, axis=1),
+        )
+
+    def _allowed_groups(self, major_groups: frozenset[str] | None) -> np.ndarray | None:
+        """Select the minor groups within some major groups.
+
+        Args:
+            major_groups: The SOC major groups, or None for every group.
+
+        Returns:
+            np.ndarray | None: Whether each minor group is in the major groups,
+            or None for every group.
+        """
+        if major_groups is None:
+            return None
+        return np.isin(
+            self.groups.astype(f"U{MAJOR_GROUP_DIGITS}"), sorted(major_groups)
+        )
+
+    def _rows(self, groups) -> np.ndarray:
+        """Return the rows of the matrix holding documents of some minor groups.
+
+        Args:
+            groups: The indices of the minor groups.
+
+        Returns:
+            np.ndarray: The sorted unique rows.
+        """
+        return np.unique(
+            np.concatenate(
+                [self._group_rows[group] for group in groups]
+                or [np.empty(0, dtype=np.intp)]
+            )
+        )
+
+    def _branch_rows(
+        self, query: np.ndarray, k: int, allowed: np.ndarray | None
+    ) -> np.ndarray:
+        """Select the rows of the minor groups nearest to a query.
+
+        The `hierarchy_branches` groups with the nearest centroids are taken,
+        then further groups until there are at least `k` rows, or every
+        allowed group has been taken.
+
+        Args:
+            query: The float32 query embedding.
+            k: The number of matches wanted for the query.
+            allowed: Whether each minor group can be searched, or None for all.
+
+        Returns:
+            np.ndarray: The rows to search.
+        """
+        differences = self._centroids - query
+        distances = np.einsum("ij,ij->i", differences, differences)
+        order = np.argsort(distances, kind="stable")
+        if allowed is not None:
+            order = order[allowed[order]]
+
+        taken = min(self.hierarchy_branches, len(order))
+        rows = self._rows(order[:taken])
+        while len(rows) < k and taken < len(order):
+            taken += 1
+            rows = np.union1d(rows, self._group_rows[order[taken - 1]])
+        return rows
+
+    def _minor_group_rows(
+        self, row_vectors: np.ndarray | None
+    ) -> tuple[np.ndarray, list[np.ndarray]]:
+        """Group the rows of the matrix by the SOC minor group of their documents.
+
+        Args:
+            row_vectors: The row of each document, for a deduplicated index.
+
+        Returns:
+            tuple[np.ndarray, list[np.ndarray]]: The sorted minor groups, and
+            the sorted rows holding documents of each group.
+        """
+        codes = np.asarray(self.metadata.get("code", np.empty(0)), dtype=str)
+        document_rows = (
+            np.arange(len(codes)) if row_vectors is None else np.asarray(row_vectors)
+        )
+        groups, group_of_document = np.unique(
+            codes.astype(f"U{MINOR_GROUP_DIGITS}"), return_inverse=True
+        )
+        return groups, [
+            np.unique(document_rows[group_of_document == group])
+            for group in range(len(groups))
+        ]
+
+    def search_by_vectors(  # noqa: PLR0913 # pylint: disable=too-many-arguments,too-many-locals
+        self,
+        vectors,
+        k: int | None = None,
+        unique_codes: bool = False,
+        *,
+        major_groups: frozenset[str] | None = None,
+        max_distance: float | None = None,
+        metadata_fields: frozenset[str] | None = None,
+    ) -> list[list[dict]]:
+        """Return the nearest documents to each of a batch of query vectors.
+
+        The `k` nearest rows are searched first. Queries whose rows expand to
+        fewer than `k` documents, or distinct codes, are searched again for
+        more rows until they have enough, every row has been searched or the
+        rows are beyond `max_distance`. Documents are expanded nearest first,
+        stopping at the first beyond `max_distance`.
+
+        Args:
+            vectors: The query embeddings, one per row.
+            k: The number of matches for each query, defaults to `k_matches`.
+            unique_codes: Whether to return only the nearest document for each
+                SOC code.
+            major_groups: The SOC major groups to restrict results to, or None
+                for every group.
+            max_distance: The largest distance of a match, or None for no limit.
+            metadata_fields: The metadata fields of each match, or None for all.
+
+        Returns:
+            list[list[dict]]: The nearest documents for each query, nearest first.
+        """
+        k = k or self.k_matches
+        vectors = np.atleast_2d(np.asarray(vectors, np.float32))
+        results: list[list[dict]] = [[] for _ in range(len(vectors))]
+        pending, depth = np.arange(len(vectors)), k
+        while pending.size:
+            indices, distances = self.search(vectors[pending], depth, major_groups)
+            short = []
+            for query, row_indices, row_distances in zip(
+                pending, indices, distances, strict=True
+            ):
+                results[query] = self._expand(
+                    row_indices,
+                    row_distances,
+                    k,
+                    unique_codes,
+                    major_groups=major_groups,
+                    max_distance=max_distance,
+                    metadata_fields=metadata_fields,
+                )
+                beyond_distance = (
+                    max_distance is not None
+                    and len(row_distances) > 0
+                    and row_distances[-1] > max_distance
+                )
+                if (
+                    len(results[query]) < k
+                    and depth < self.size
+                    and not beyond_distance
+                ):
+                    short.append(query)
+            pending, depth = np.asarray(short, dtype=np.intp), depth * 4
+        return results
+
+    def row_metadata(self, row: int, fields: frozenset[str] | None = None) -> dict:
+        """Return the metadata of a single document.
+
+        Args:
+            row: The row of the document in the matrix.
+            fields: The metadata fields to return, or None for every field.
+
+        Returns:
+            dict: The value of each metadata field for the document.
+        """
+        return {
+            field: values[row].item()
+            for field, values in self.metadata.items()
+            if fields is None or field in fields
+        }
+
+    def get_embed_config(self) -> dict:
+        """Return the embedding configuration of the loaded index.
+
+        Returns:
+            dict: The embedding handler configuration, with the index size,
+            number of embedding rows, version and backend name.
+        """
+        return super().get_embed_config() | {
+            "index_size": self.documents,
+            "index_vectors": self.size,
+            "index_version": self.index_version,
+        }
+
+    def _expand(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+        self,
+        row_indices,
+        row_distances,
+        k: int,
+        unique_codes: bool,
+        *,
+        major_groups: frozenset[str] | None = None,
+        max_distance: float | None = None,
+        metadata_fields: frozenset[str] | None = None,
+    ) -> list[dict]:
+        """Expand the nearest rows of the matrix to their documents.
+
+        Args:
+            row_indices: The nearest rows, nearest first.
+            row_distances: The distance to each row.
+            k: The maximum number of documents to return.
+            unique_codes: Whether to return only the first document for each code.
+            major_groups: The SOC major groups of the documents to return, or
+                None for every group.
+            max_distance: The largest distance of a document, or None for no limit.
+            metadata_fields: The metadata fields of each document, or None for all.
+
+        Returns:
+            list[dict]: Up to `k` documents with their distances, nearest first.
+        """
+        matches = []
+        codes = set()
+        for index, distance in zip(row_indices, row_distances, strict=True):
+            if max_distance is not None and distance > max_distance:
+                return matches
+            if self._row_documents is None:
+                documents = (index,)
+            else:
+                documents = self._row_documents[
+                    self._row_offsets[index] : self._row_offsets[index + 1]
+                ]
+            for document in documents:
+                metadata = self.row_metadata(document, metadata_fields)
+                if not in_major_groups(metadata, major_groups):
+                    continue
+                if unique_codes:
+                    if metadata.get("code") in codes:
+                        continue
+                    codes.add(metadata.get("code"))
+                matches.append({"distance": float(distance)} | metadata)
+                if len(matches) == k:
+                    return matches
+        return matches
+
+    def memory_footprint(self) -> dict:
+        """Return the memory used by the index.
+
+        Returns:
+            dict: The storage dtype, the bytes of the search matrix with its
+            scales, norms and group centroids, the bytes it would take as
+            float32, the bytes of the metadata and row groups, whether the
+            matrix is memory-mapped and shared between processes, and the
+            number of candidates re-ranked.
+        """
+        matrix_bytes = self.matrix.nbytes + self._squared_norms.nbytes
+        if self.scales is not None:
+            matrix_bytes += self.scales.nbytes
+        if self._centroids is not None:
+            matrix_bytes += self._centroids.nbytes
+        metadata_bytes = sum(values.nbytes for values in self.metadata.values())
+        metadata_bytes += sum(rows.nbytes for rows in self._group_rows)
+        if self._row_documents is not None:
+            metadata_bytes += self._row_documents.nbytes + self._row_offsets.nbytes
+        return {
+            "storage_dtype": str(self.matrix.dtype),
+            "matrix_bytes": int(matrix_bytes),
+            "float32_matrix_bytes": int(self.matrix.size * 4),
+            "metadata_bytes": int(metadata_bytes),
+            "memory_mapped": bool(self._memory_mapped),
+            "rerank_candidates": (
+                self.rerank_candidates if self.full_matrix is not None else 0
+            ),
+        }
+
+    def _rerank(
+        self, queries: np.ndarray, candidates: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Re-rank candidate rows by their distance at full precision.
+
+        Args:
+            queries: The float32 query embeddings, one per row.
+            candidates: The candidate rows for each query.
+            k: The number of matches for each query.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The row indices and distances of the
+            `k` nearest candidates for each query, nearest first.
+        """
+        rows = np.asarray(self.full_matrix[candidates.ravel()], np.float32)
+        differences = rows.reshape(*candidates.shape, -1) - queries[:, None, :]
+        distances = np.einsum("ijk,ijk->ij", differences, differences)
+        order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        return (
+            np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(distances, order, axis=1),
+        )
+
+    def _distances(
+        self, queries: np.ndarray, rows: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Compute the squared L2 distance from each query to every document.
+
+        Args:
+            queries: The float32 query embeddings, one per row.
+            rows: The rows to compute distances to, or None for every row.
+
+        Returns:
+            np.ndarray: The distances, one row per query.
+        """
+        squared_norms = self._squared_norms
+        if rows is not None:
+            dots = queries @ dequantise(self.matrix[rows], self.scales).T
+            squared_norms = squared_norms[rows]
+        elif self.matrix.dtype == np.float32:
+            dots = queries @ self.matrix.T
+        else:
+            dots = np.empty((queries.shape[0], self.size), dtype=np.float32)
+            for start, block in zip(
+                range(0, self.size, _BLOCK_ROWS), self._float32_blocks(), strict=True
+            ):
+                dots[:, start : start + block.shape[0]] = queries @ block.T
+
+        distances = (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            - 2 * dots
+            + squared_norms[None, :]
+        )
+        return np.maximum(distances, 0, out=distances)
+
+    def _float32_blocks(self):
+        """Yield the matrix as float32 blocks of rows.
+
+        Yields:
+            np.ndarray: The next block of rows as float32.
+        """
+        for start in range(0, self.size, _BLOCK_ROWS):
+            yield dequantise(self.matrix[start : start + _BLOCK_ROWS], self.scales)
+
+
+def as_search_backend(embed) -> SearchBackend:
+    """Wrap a loaded vector store in a search backend.
+
+    Args:
+        embed: A `SearchBackend` or an `EmbeddingHandler`.
+
+    Returns:
+        SearchBackend: The backend itself, or an `EmbeddingHandlerBackend`
+        wrapping the embedding handler.
+    """
+    if isinstance(embed, SearchBackend):
+        return embed
+    return EmbeddingHandlerBackend(embed)
@@ -0,0 +1,126 @@
+"""Provides the per-request options of a vector store search.
+
+This module contains the options a client can set on a search, which are
+passed from the API through the batcher and cache down to the search backend.
+Queries with different options are searched separately and cached under
+different keys.
+"""
+
+from dataclasses import dataclass
+
+# The fields of a search result
+RESULT_FIELDS = ("distance", "title", "code")
+
+# How the fields of a query are searched, see `batching`
+QUERY_MODE_MULTI = "multi"
+QUERY_MODE_SKIP_EMPTY = "skip_empty"
+QUERY_MODE_FUSED = "fused"
+QUERY_MODES = (QUERY_MODE_MULTI, QUERY_MODE_SKIP_EMPTY, QUERY_MODE_FUSED)
+
+# Whether exact title matches from the coding index are returned instead of,
+# or ahead of, the vector search results
+EXACT_MATCH_OFF = "off"
+EXACT_MATCH_DIRECT = "direct"
+EXACT_MATCH_MERGE = "merge"
+EXACT_MATCH_MODES = (EXACT_MATCH_OFF, EXACT_MATCH_DIRECT, EXACT_MATCH_MERGE)
+
+
+@dataclass(frozen=True)
+class SearchOptions:
+    """Options changing the results of a search.
+
+    Attributes:
+        major_groups (frozenset[str] | None): The SOC 2020 major groups, the
+            first digit of the codes, that results are restricted to, or None
+            for every group.
+        k (int | None): The number of results to return, or None for the
+            number of matches the index was loaded with.
+        max_distance (float | None): The largest distance of a result, or None
+            for no limit.
+        unique_codes (bool | None): Whether to return only the nearest result
+            for each SOC code, or None for the service default.
+        fields (frozenset[str] | None): The result fields to return, or None
+            for every field.
+        query_mode (str | None): How the query fields are searched, one of
+            `QUERY_MODES`, or None for the service default.
+        exact_match (str | None): How exact title matches are used, one of
+            `EXACT_MATCH_MODES`, or None for the service default.
+    """
+
+    major_groups: frozenset[str] | None = None
+    k: int | None = None
+    max_distance: float | None = None
+    unique_codes: bool | None = None
+    fields: frozenset[str] | None = None
+    query_mode: str | None = None
+    exact_match: str | None = None
+
+    @classmethod
+    def create(  # noqa: PLR0913 # pylint: disable=too-many-arguments
+        cls,
+        *,
+        major_groups=None,
+        k: int | None = None,
+        max_distance: float | None = None,
+        unique_codes: bool | None = None,
+        fields=None,
+        query_mode: str | None = None,
+        exact_match: str | None = None,
+    ) -> "SearchOptions | None":
+        """Create search options, or None if every option has its default.
+
+        Args:
+            major_groups: The major groups to restrict results to, if any.
+            k: The number of results to return, if not the default.
+            max_distance: The largest distance of a result, if any.
+            unique_codes: Whether to return one result per code, if not the default.
+            fields: The result fields to return, if not all of them.
+            query_mode: How the query fields are searched, if not the default.
+            exact_match: How exact title matches are used, if not the default.
+
+        Returns:
+            SearchOptions | None: The search options, or None for a default search.
+        """
+        options = cls(
+            major_groups=frozenset(major_groups) if major_groups else None,
+            k=k,
+            max_distance=max_distance,
+            unique_codes=unique_codes,
+            fields=(
+                frozenset(fields)
+                if fields and not set(RESULT_FIELDS) <= set(fields)
+                else None
+            ),
+            query_mode=query_mode,
+            exact_match=exact_match,
+        )
+        return None if options == cls() else options
+
+    def resolve_unique_codes(self, default: bool) -> bool:
+        """Return whether results are collapsed to one per SOC code.
+
+        Args:
+            default: The service default.
+
+        Returns:
+            bool: The requested value, or the default if none was requested.
+        """
+        return default if self.unique_codes is None else self.unique_codes
+
+    def backend_kwargs(self) -> dict:
+        """Return the keyword arguments passed to `SearchBackend.search_by_vectors`.
+
+        The code is always included in the metadata returned by the backend, as
+        it is needed to collapse results by code.
+
+        Returns:
+            dict: The options understood by the search backends.
+        """
+        return {
+            "k": self.k,
+            "major_groups": self.major_groups,
+            "max_distance": self.max_distance,
+            "metadata_fields": (
+                None if self.fields is None else (self.fields - {"distance"}) | {"code"}
+            ),
+        }
@@ -0,0 +1,168 @@
+"""Provides the encoding of search results in API responses.
+
+This module contains the fast path that encodes the results returned by the
+vector store, plain dicts of `distance`, `title` and `code`, straight to the
+response body. No `SearchIndexItem` model is created or validated for each
+result: the results are selected into plain rows in the order of the model
+fields and encoded by the JSON serialiser of pydantic, so the body is the
+same as `SearchIndexResponse.model_dump_json` would give.
+
+Callers sending many requests can ask for MessagePack instead, with
+`Accept: application/msgpack`, for a smaller body that is faster to decode.
+It holds the same documents as the JSON and needs `msgpack`; without it the
+response is JSON.
+"""
+
+from pydantic_core import to_json
+
+from soc_classification_vector_store.utils.search_options import RESULT_FIELDS
+
+try:
+    # MessagePack responses are optional, needing msgpack
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Media types of MessagePack accepted from clients
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+# Media ranges that accept JSON
+JSON_MEDIA_RANGES = (JSON_MEDIA_TYPE, "application/*", "*/*")
+# Batch search results can be streamed as one JSON document per line
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def result_rows(results: list[dict], fields: list[str] | None = None) -> list[dict]:
+    """Select the fields of search results to return.
+
+    Args:
+        results: The results of a query, as returned by the vector store.
+        fields: The result fields requested, or None for every field.
+
+    Returns:
+        list[dict]: The requested fields of each result, in the order of the
+        `SearchIndexItem` fields, with a missing title as "".
+    """
+    rows = [
+        {
+            "distance": float(result["distance"]),
+            "title": result.get("title", ""),
+            "code": result["code"],
+        }
+        for result in results
+    ]
+    if fields is None or set(RESULT_FIELDS) <= set(fields):
+        return rows
+    names = [name for name in RESULT_FIELDS if name in fields]
+    return [{name: row[name] for name in names} for row in rows]
+
+
+def search_document(results: list[dict], fields: list[str] | None = None) -> dict:
+    """Build the `SearchIndexResponse` document of the results of a query.
+
+    Args:
+        results: The results of the query.
+        fields: The result fields requested, or None for every field.
+
+    Returns:
+        dict: The response document.
+    """
+    return {"results": result_rows(results, fields)}
+
+
+def batch_document(results: list[list[dict]], fields: list[list[str] | None]) -> dict:
+    """Build the `SearchIndexBatchResponse` document of the results of a batch.
+
+    Args:
+        results: The results of each query, in order.
+        fields: The result fields requested by each query.
+
+    Returns:
+        dict: The response document.
+    """
+    return {
+        "results": [
+            search_document(result, query_fields)
+            for result, query_fields in zip(results, fields, strict=True)
+        ]
+    }
+
+
+def media_ranges(accept: str) -> dict[str, float]:
+    """Parse the media ranges of an `Accept` header with their quality.
+
+    Args:
+        accept: The `Accept` header of a request.
+
+    Returns:
+        dict[str, float]: The quality (`q`) of each media range, in lower
+        case, with 1 for a range without a valid quality.
+    """
+    ranges: dict[str, float] = {}
+    for entry in accept.split(","):
+        media_range, *params = entry.split(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    value = float(value)
+                except ValueError:
+                    continue
+                quality = min(max(value, 0.0), 1.0)
+        ranges[media_range] = max(quality, ranges.get(media_range, 0.0))
+    return ranges
+
+
+def negotiate_media_type(accept: str, stream: bool = False) -> str:
+    """Choose the media type of a search response.
+
+    MessagePack is chosen when the client names it with a quality above 0
+    and no lower than that of JSON, which is also accepted through
+    `application/*` and `*/*`. A response that can be streamed is NDJSON when
+    the client names it the same way, with a quality no lower than those of
+    JSON and MessagePack.
+
+    Args:
+        accept: The `Accept` header of the request.
+        stream: Whether the response can be streamed as NDJSON.
+
+    Returns:
+        str: `NDJSON_MEDIA_TYPE` if the response can be streamed and the
+        client prefers NDJSON, `MSGPACK_MEDIA_TYPE` if the client prefers
+        MessagePack and msgpack is installed, otherwise `JSON_MEDIA_TYPE`.
+    """
+    ranges = media_ranges(accept)
+    json_quality = max(
+        ranges.get(media_range, 0.0) for media_range in JSON_MEDIA_RANGES
+    )
+    msgpack_quality = 0.0
+    if msgpack is not None:
+        msgpack_quality = max(
+            ranges.get(media_type, 0.0) for media_type in MSGPACK_MEDIA_TYPES
+        )
+    ndjson_quality = ranges.get(NDJSON_MEDIA_TYPE, 0.0) if stream else 0.0
+    if ndjson_quality > 0 and ndjson_quality >= max(json_quality, msgpack_quality):
+        return NDJSON_MEDIA_TYPE
+    if msgpack_quality > 0 and msgpack_quality >= json_quality:
+        return MSGPACK_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def encode(document: dict, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    """Encode a response document.
+
+    Args:
+        document: The response document.
+        media_type: The media type chosen by `negotiate_media_type`.
+
+    Returns:
+        bytes: The response body.
+    """
+    if media_type == MSGPACK_MEDIA_TYPE:
+        return msgpack.packb(document)
+    return to_json(document)
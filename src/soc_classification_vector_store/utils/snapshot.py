@@ -0,0 +1,626 @@
+"""Provides a persisted, versioned snapshot of the vector store index.
+
+This module contains functions to write the embedded SOC index to disk as a
+self-contained snapshot and to memory-map it back, so that the service can
+start without re-embedding the coding index. A snapshot is made up of:
+
+- `embeddings.npy`: the float32 embedding matrix, one row per document, or one
+  row per unique document text when the index is deduplicated.
+- `metadata_<field>.npy`: one array per metadata field (code, title), in
+  document order.
+- `row_vectors.npy`: for a deduplicated index, the embedding row of each
+  document.
+- `embeddings_<dtype>.npy` and `scales_<dtype>.npy`: optional compact copies
+  of the embedding matrix, as float16 or int8 with per-dimension scales, that
+  the exact search backend can memory-map instead of the float32 matrix.
+- `row_hashes.npy`: the content hash of each embedding row, when known, used to
+  reuse the embeddings of unchanged rows when the spreadsheets are updated.
+- `manifest.json`: the format version, embedding model, query encoder, source
+  spreadsheet checksums, shape, metadata fields, index version, where the
+  documents came from and, for an incremental build, the changes from the
+  previous version of the snapshot.
+
+Every array is memory-mapped read-only, so several worker processes serving
+the same snapshot share a single copy of it in the page cache.
+
+Each snapshot is written to a new directory under `versions/`, with its
+manifest last, and then published by atomically replacing the `CURRENT`
+file, which names the version to load. Readers resolve `CURRENT` once, so
+they never pair the metadata of one version with the vectors of another,
+and a write that fails part way leaves the published snapshot untouched.
+The previous version is kept for readers still opening it, and older ones
+are removed. Snapshots written before versioning, with their files directly
+in the snapshot directory, are still loaded until a new one is published.
+"""
+
+import dataclasses
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from importlib.resources import files
+
+import numpy as np
+from survey_assist_utils.logging import get_logger
+
+from soc_classification_vector_store.utils.quantisation import quantise
+from soc_classification_vector_store.utils.query_encoder import QUERY_ENCODER_DEFAULT
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 2
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata_{field}.npy"
+ROW_HASHES_FILE = "row_hashes.npy"
+ROW_VECTORS_FILE = "row_vectors.npy"
+COMPACT_FILE = "embeddings_{dtype}.npy"
+SCALES_FILE = "scales_{dtype}.npy"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".snapshot.lock"
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+# Prefix of the directory a snapshot is written to before it is complete
+PARTIAL_PREFIX = ".partial-"
+# Published versions kept, so readers resolving the previous one can open it
+KEEP_VERSIONS = 2
+# Where the documents of a snapshot came from: the vector store filled by
+# `EmbeddingHandler.embed_index`, or the coding index parsed by `soc_index`
+DOCUMENT_SOURCE_EMBEDDING_HANDLER = "embedding_handler"
+DOCUMENT_SOURCE_SOC_INDEX = "soc_index"
+LEGACY_FILES = (
+    MANIFEST_FILE,
+    EMBEDDINGS_FILE,
+    ROW_HASHES_FILE,
+    ROW_VECTORS_FILE,
+)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """A loaded vector store snapshot.
+
+    Attributes:
+        embeddings (np.ndarray): The read-only, memory-mapped embedding matrix.
+        metadata (dict[str, np.ndarray]): The read-only, memory-mapped values of
+            each metadata field, one per document.
+        manifest (dict): The snapshot manifest.
+        row_hashes (np.ndarray | None): The read-only, memory-mapped content
+            hash of each embedding row, if the snapshot records them.
+        row_vectors (np.ndarray | None): The read-only, memory-mapped embedding
+            row of each document, if the index is deduplicated. Otherwise each
+            document has its own row.
+        compact (dict[str, tuple[np.ndarray, np.ndarray | None]]): The
+            read-only, memory-mapped compact copies of the embedding matrix and
+            their per-dimension scales, keyed by storage dtype.
+    """
+
+    embeddings: np.ndarray
+    metadata: dict[str, np.ndarray]
+    manifest: dict
+    row_hashes: np.ndarray | None = None
+    row_vectors: np.ndarray | None = None
+    compact: dict[str, tuple[np.ndarray, np.ndarray | None]] = dataclasses.field(
+        default_factory=dict
+    )
+
+    @property
+    def index_version(self) -> str:
+        """The content hash identifying this version of the index."""
+        return self.manifest["index_version"]
+
+    @property
+    def query_encoder(self) -> str:
+        """The encoder that produced the embeddings, which must encode queries."""
+        return self.manifest.get("query_encoder", QUERY_ENCODER_DEFAULT)
+
+
+def file_checksum(resource: tuple[str, str]) -> str:
+    """Compute the SHA-256 checksum of a packaged data file.
+
+    Args:
+        resource: The package reference and file name of the data file.
+
+    Returns:
+        str: The hex digest of the file contents.
+    """
+    package, name = resource
+    digest = hashlib.sha256()
+    with files(package).joinpath(name).open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_content_hash(text: str, metadata: dict) -> str:
+    """Compute the content hash of an index row.
+
+    Args:
+        text: The text embedded for the row.
+        metadata: The metadata of the row.
+
+    Returns:
+        str: A hex digest identifying the text and metadata of the row.
+    """
+    content = json.dumps([text, metadata], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
+
+def source_checksums(*resources: tuple[str, str]) -> dict[str, str]:
+    """Compute the checksums of the source spreadsheets used to build an index.
+
+    Args:
+        *resources: The package reference and file name of each spreadsheet.
+
+    Returns:
+        dict[str, str]: The checksum of each spreadsheet, keyed by file name.
+    """
+    return {name: file_checksum((package, name)) for package, name in resources}
+
+
+def write_snapshot(  # noqa: PLR0913 # pylint: disable=too-many-arguments,too-many-locals
+    directory: str,
+    embeddings: np.ndarray,
+    metadata: list[dict],
+    embedding_model_name: str,
+    checksums: dict[str, str],
+    *,
+    row_hashes: list[str] | None = None,
+    row_vectors: list[int] | np.ndarray | None = None,
+    changes: dict | None = None,
+    storage_dtypes: tuple[str, ...] = (),
+    query_encoder: str = QUERY_ENCODER_DEFAULT,
+    document_source: str | None = None,
+    document_parity: str | None = None,
+) -> dict:
+    """Write a snapshot of the embedded index and publish it.
+
+    The snapshot is written to a new version directory and then made the one
+    loaded from `directory` by atomically replacing its `CURRENT` file.
+
+    Args:
+        directory: The snapshot directory to publish the snapshot in.
+        embeddings: The embedding matrix, one row per document, or one row per
+            unique document text if `row_vectors` is given.
+        metadata: The metadata for each document, in document order.
+        embedding_model_name: The name of the model that produced the embeddings.
+        checksums: The checksums of the source spreadsheets.
+        row_hashes: The content hash of each embedding row, if known.
+        row_vectors: The embedding row of each document, for a deduplicated index.
+        changes: The changes from the previous version of the index, recorded
+            in the manifest of an incremental build.
+        storage_dtypes: The reduced precision dtypes to also write compact
+            copies of the embedding matrix in.
+        query_encoder: The encoder that produced the embeddings, see
+            `query_encoder`.
+        document_source: Where the documents came from, one of the
+            `DOCUMENT_SOURCE_*` values, if known.
+        document_parity: The `document_parity_key` the parsed coding index
+            documents were checked against the upstream handler with, if they
+            were.
+
+    Returns:
+        dict: The manifest of the written snapshot.
+
+    Raises:
+        ValueError: If the numbers of embeddings, metadata rows, row vectors
+            and row hashes do not match.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if row_vectors is not None:
+        row_vectors = np.asarray(row_vectors, dtype=np.int32)
+    _check_rows(embeddings, metadata, row_hashes, row_vectors)
+
+    fields = list(dict.fromkeys(field for row in metadata for field in row))
+    columns = {field: _metadata_column(metadata, field) for field in fields}
+    digest = hashlib.sha256(embeddings.tobytes())
+    for column in columns.values():
+        digest.update(column.tobytes())
+    if row_vectors is not None:
+        digest.update(row_vectors.tobytes())
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "embedding_model_name": embedding_model_name,
+        "query_encoder": query_encoder,
+        "source_checksums": checksums,
+        "rows": int(embeddings.shape[0]),
+        "documents": len(metadata),
+        "dimensions": int(embeddings.shape[1]),
+        "dtype": str(embeddings.dtype),
+        "metadata_fields": fields,
+        "index_version": digest.hexdigest()[:16],
+        "created_at": datetime.now(UTC).isoformat(),
+        "row_hashes": row_hashes is not None,
+        "row_vectors": row_vectors is not None,
+        "storage_dtypes": [dtype for dtype in storage_dtypes if dtype != "float32"],
+    }
+    if changes is not None:
+        manifest["changes"] = changes
+    if document_source is not None:
+        manifest["document_source"] = document_source
+    if document_parity is not None:
+        manifest["document_parity"] = document_parity
+
+    versions = os.path.join(directory, VERSIONS_DIR)
+    os.makedirs(versions, exist_ok=True)
+    version = f"{manifest['index_version']}-{uuid.uuid4().hex[:8]}"
+    partial = os.path.join(versions, f"{PARTIAL_PREFIX}{os.getpid()}-{version}")
+    os.makedirs(partial)
+    try:
+        arrays = {EMBEDDINGS_FILE: embeddings} | {
+            METADATA_FILE.format(field=field): column
+            for field, column in columns.items()
+        }
+        if row_hashes is not None:
+            arrays[ROW_HASHES_FILE] = np.asarray(row_hashes, dtype="U32")
+        if row_vectors is not None:
+            arrays[ROW_VECTORS_FILE] = row_vectors
+        _write_version(partial, arrays, manifest)
+        os.rename(partial, os.path.join(versions, version))
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+
+    _write_atomic(
+        os.path.join(directory, CURRENT_FILE),
+        lambda f: f.write(version.encode("utf-8")),
+    )
+    _remove_old_versions(directory, version)
+
+    logger.info(f"Wrote vector store snapshot {manifest['index_version']}")
+    return manifest
+
+
+def load_snapshot(
+    directory: str,
+    checksums: dict[str, str] | None,
+    embedding_model_name: str | None = None,
+    query_encoder: str | None = None,
+) -> Snapshot | None:
+    """Memory-map a snapshot if it exists and matches the expected sources.
+
+    Args:
+        directory: The directory containing the snapshot.
+        checksums: The checksums of the source spreadsheets the index must be
+            built from, or None to accept any sources.
+        embedding_model_name: The embedding model the index must be built with,
+            or None to accept any model.
+        query_encoder: The encoder the index must be built with, or None to
+            accept any encoder. Snapshots that do not record one were built
+            with the default encoder.
+
+    Returns:
+        Snapshot | None: The loaded snapshot, or None if there is no usable
+        snapshot in the directory.
+    """
+    # Resolved once, so every file is read from the same version
+    path = snapshot_path(directory)
+    manifest = _read_manifest_file(path)
+    if manifest is None:
+        logger.info(f"No vector store snapshot found in {directory}")
+        return None
+
+    stale = []
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        stale.append("format version")
+    if checksums is not None and manifest.get("source_checksums") != checksums:
+        stale.append("source checksums")
+    if embedding_model_name and (
+        manifest.get("embedding_model_name") != embedding_model_name
+    ):
+        stale.append("embedding model")
+    if query_encoder and (
+        manifest.get("query_encoder", QUERY_ENCODER_DEFAULT) != query_encoder
+    ):
+        stale.append("query encoder")
+    if stale:
+        logger.info(f"Ignoring stale vector store snapshot: {', '.join(stale)} differ")
+        return None
+
+    try:
+        embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        metadata = {
+            field: np.load(
+                os.path.join(path, METADATA_FILE.format(field=field)),
+                mmap_mode="r",
+            )
+            for field in manifest["metadata_fields"]
+        }
+        row_hashes = (
+            np.load(os.path.join(path, ROW_HASHES_FILE), mmap_mode="r")
+            if manifest.get("row_hashes")
+            else None
+        )
+        row_vectors = (
+            np.load(os.path.join(path, ROW_VECTORS_FILE), mmap_mode="r")
+            if manifest.get("row_vectors")
+            else None
+        )
+        compact = {
+            dtype: _load_compact(path, dtype)
+            for dtype in manifest.get("storage_dtypes", [])
+        }
+    except (OSError, ValueError):
+        metadata = {}
+        embeddings = np.empty((0, 0))
+        row_hashes = row_vectors = None
+        compact = {}
+
+    documents = manifest.get("documents", manifest["rows"])
+    per_document = [*metadata.values(), *([] if row_vectors is None else [row_vectors])]
+    if (
+        embeddings.shape != (manifest["rows"], manifest["dimensions"])
+        or any(len(values) != documents for values in per_document)
+        or (row_hashes is not None and len(row_hashes) != manifest["rows"])
+        or any(values.shape != embeddings.shape for values, _ in compact.values())
+    ):
+        logger.warning(f"Ignoring corrupt vector store snapshot in {directory}")
+        return None
+
+    logger.info(
+        f"Loaded vector store snapshot {manifest['index_version']} "
+        f"with {manifest['rows']} rows"
+    )
+    return Snapshot(
+        embeddings=embeddings,
+        metadata=metadata,
+        manifest=manifest,
+        row_hashes=row_hashes,
+        row_vectors=row_vectors,
+        compact=compact,
+    )
+
+
+def read_manifest(directory: str) -> dict | None:
+    """Read the manifest of the snapshot published in a directory.
+
+    Args:
+        directory: The snapshot directory.
+
+    Returns:
+        dict | None: The manifest, or None if there is no complete snapshot.
+    """
+    return _read_manifest_file(snapshot_path(directory))
+
+
+def snapshot_path(directory: str) -> str:
+    """Return the directory holding the files of the published snapshot.
+
+    Args:
+        directory: The snapshot directory.
+
+    Returns:
+        str: The version directory named by `CURRENT`, or `directory` itself
+        for a snapshot written before versioning.
+    """
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            version = f.read().strip()
+    except OSError:
+        return directory
+    return os.path.join(directory, VERSIONS_DIR, version)
+
+
+def _read_manifest_file(path: str) -> dict | None:
+    """Read the manifest of the snapshot whose files are in a directory.
+
+    Args:
+        path: The directory holding the snapshot files.
+
+    Returns:
+        dict | None: The manifest, or None if there is no complete snapshot.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_old_versions(directory: str, current: str):
+    """Remove the snapshot versions no longer needed once one is published.
+
+    The newest `KEEP_VERSIONS` versions are kept, as are partial snapshots
+    still being written by a running process. Files of a snapshot written
+    before versioning are removed. Processes that have already memory-mapped
+    a removed version keep reading it until they unmap it.
+
+    Args:
+        directory: The snapshot directory.
+        current: The version just published.
+    """
+    versions = os.path.join(directory, VERSIONS_DIR)
+    published = sorted(
+        (
+            entry
+            for entry in os.scandir(versions)
+            if entry.is_dir() and not entry.name.startswith(PARTIAL_PREFIX)
+        ),
+        key=lambda entry: (entry.name == current, entry.stat().st_mtime),
+        reverse=True,
+    )
+    stale = [entry.path for entry in published[KEEP_VERSIONS:]]
+    stale += [
+        entry.path
+        for entry in os.scandir(versions)
+        if entry.name.startswith(PARTIAL_PREFIX) and not _writer_running(entry.name)
+    ]
+    for path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+
+    legacy = [os.path.join(directory, name) for name in LEGACY_FILES] + [
+        entry.path
+        for entry in os.scandir(directory)
+        if entry.is_file()
+        and entry.name.endswith(".npy")
+        and entry.name.startswith(("metadata_", "embeddings_", "scales_"))
+    ]
+    for path in legacy:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _writer_running(partial: str) -> bool:
+    """Check whether the process writing a partial snapshot is still running.
+
+    Args:
+        partial: The name of the partial snapshot directory.
+
+    Returns:
+        bool: False if the process has exited, leaving the snapshot incomplete.
+    """
+    try:
+        pid = int(partial.removeprefix(PARTIAL_PREFIX).split("-", 1)[0])
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (ValueError, PermissionError):
+        return True
+    return True
+
+
+@contextmanager
+def snapshot_lock(directory: str) -> Iterator[None]:
+    """Hold an exclusive lock on a snapshot directory across processes.
+
+    Worker processes that find no usable snapshot take this lock before
+    building one, so only the first worker builds the index and the others
+    wait and then load the snapshot it wrote.
+
+    Args:
+        directory: The snapshot directory to lock.
+
+    Yields:
+        None: Once the lock is held.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), "w", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _check_rows(
+    embeddings: np.ndarray,
+    metadata: list[dict],
+    row_hashes: list[str] | None,
+    row_vectors: np.ndarray | None,
+):
+    """Check that a snapshot has an embedding for every metadata row.
+
+    Args:
+        embeddings: The embedding matrix.
+        metadata: The metadata for each document.
+        row_hashes: The content hash of each embedding row, if known.
+        row_vectors: The embedding row of each document, if deduplicated.
+
+    Raises:
+        ValueError: If the numbers of embeddings, metadata rows, row vectors
+            and row hashes do not match.
+    """
+    if row_vectors is not None:
+        if len(row_vectors) != len(metadata) or (
+            row_vectors.size
+            and (row_vectors.min() < 0 or row_vectors.max() >= len(embeddings))
+        ):
+            raise ValueError(
+                f"Expected an embedding row for each of {len(metadata)} metadata "
+                f"rows, got {len(row_vectors)} row vectors"
+            )
+    elif embeddings.ndim != 2 or embeddings.shape[0] != len(metadata):  # noqa: PLR2004
+        raise ValueError(
+            f"Expected one embedding per metadata row, got {embeddings.shape} "
+            f"embeddings for {len(metadata)} rows"
+        )
+    if row_hashes is not None and len(row_hashes) != embeddings.shape[0]:
+        raise ValueError(
+            f"Expected one row hash per embedding, got {len(row_hashes)} "
+            f"hashes for {embeddings.shape[0]} embeddings"
+        )
+
+
+def _write_version(path: str, arrays: dict[str, np.ndarray], manifest: dict):
+    """Write the files of a snapshot version, with its manifest last.
+
+    Args:
+        path: The directory the snapshot files are written to.
+        arrays: The arrays to write, keyed by file name.
+        manifest: The manifest of the snapshot.
+    """
+    for name, values in arrays.items():
+        np.save(os.path.join(path, name), values)
+    for dtype in manifest["storage_dtypes"]:
+        _write_compact(path, arrays[EMBEDDINGS_FILE], dtype)
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _write_compact(path: str, embeddings: np.ndarray, dtype: str):
+    """Write a compact copy of the embedding matrix and its scales.
+
+    Args:
+        path: The directory the snapshot files are written to.
+        embeddings: The float32 embedding matrix.
+        dtype: The storage dtype of the copy.
+    """
+    values, scales = quantise(embeddings, dtype)
+    np.save(os.path.join(path, COMPACT_FILE.format(dtype=dtype)), values)
+    if scales is not None:
+        np.save(os.path.join(path, SCALES_FILE.format(dtype=dtype)), scales)
+
+
+def _load_compact(path: str, dtype: str) -> tuple[np.ndarray, np.ndarray | None]:
+    """Memory-map a compact copy of the embedding matrix and its scales.
+
+    Args:
+        path: The directory holding the snapshot files.
+        dtype: The storage dtype of the copy.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray | None]: The compact matrix, and the scale
+        of each dimension if the copy is quantised.
+    """
+    values = np.load(
+        os.path.join(path, COMPACT_FILE.format(dtype=dtype)), mmap_mode="r"
+    )
+    scales_path = os.path.join(path, SCALES_FILE.format(dtype=dtype))
+    scales = np.load(scales_path) if os.path.exists(scales_path) else None
+    return values, scales
+
+
+def _metadata_column(metadata: list[dict], field: str) -> np.ndarray:
+    """Build the array of values of one metadata field.
+
+    Args:
+        metadata: The metadata for each document, in row order.
+        field: The metadata field.
+
+    Returns:
+        np.ndarray: The field values. Values that numpy cannot store in a
+        fixed-width array are stored as strings, so the array can be
+        memory-mapped without pickling.
+    """
+    column = np.asarray([row.get(field, "") for row in metadata])
+    if column.dtype.kind not in "biufU":
+        column = np.asarray([str(row.get(field, "")) for row in metadata])
+    return column
+
+
+def _write_atomic(path: str, write):
+    """Write a file via a temporary file so readers never see a partial file.
+
+    Args:
+        path: The path of the file to write.
+        write: Callable that writes the contents to an open binary file.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
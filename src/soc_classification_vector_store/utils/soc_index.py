@@ -0,0 +1,314 @@
+"""Provides parsing of the SOC coding index spreadsheet.
+
+This module reads the entries of the SOC 2020 coding index into the texts that
+are embedded and the metadata returned with each search result, so the index
+can be embedded without going through `EmbeddingHandler.embed_index`, and
+groups entries whose texts only differ in case, punctuation or spacing so each
+text is embedded once. pandas is imported when the spreadsheet is read rather
+than with this module, so it does not slow down starting the API.
+
+The documents embedded by `EmbeddingHandler.embed_index` are built by the
+upstream handler, so `check_document_parity` requires the parsed documents to
+be exactly those before an index is built from them, rather than letting the
+two builds silently embed different texts or return different titles. The
+check only needs repeating when the document format here or the upstream
+handler changes, which `document_parity_key` identifies.
+
+Parsing the workbooks is slow, so the parsed coding index and unit group
+structure can each be cached in a columnar file of NumPy string arrays, keyed
+by the checksum of the workbook. Later reads of the same workbook load the
+cache instead, and a new workbook is parsed and cached again.
+"""
+
+import importlib.metadata
+import os
+from collections import Counter
+from collections.abc import Iterable
+from importlib.resources import files
+from typing import TYPE_CHECKING
+
+import numpy as np
+from survey_assist_utils.logging import get_logger
+
+from soc_classification_vector_store.utils.cache import normalise_text
+from soc_classification_vector_store.utils.snapshot import file_checksum
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = get_logger(__name__)
+
+SOC_INDEX_SHEET = "SOC2020 coding index"
+CODE_COLUMN = "SOC_2020"
+TITLE_COLUMN = "INDEXOCC_-_natural_word_order"
+# Qualifiers that distinguish entries sharing a title, in the order appended
+QUALIFIER_COLUMNS = ("ADD", "IND")
+
+# The version of the documents built by `soc_index_documents`, to be bumped
+# whenever their texts or metadata change
+SOC_INDEX_DOCUMENTS_VERSION = 1
+# The package of the upstream handler the documents must match
+UPSTREAM_PACKAGE = "occupational_classification_utils"
+
+SOC_STRUCTURE_SHEET = "SOC2020 descriptions"
+
+# The cache of a parsed workbook sheet, named by the sheet, its layout version
+# and the workbook checksum
+SOC_INDEX_CACHE_VERSION = 1
+SOC_INDEX_CACHE_FILE = "{name}_v{version}_{checksum}.npz"
+
+
+def read_soc_index(
+    soc_index_file: tuple[str, str], cache_dir: str | None = None
+) -> "pd.DataFrame":
+    """Read the coding index sheet of the SOC index workbook.
+
+    Args:
+        soc_index_file: The package and file name of the SOC index workbook.
+        cache_dir: The directory the parsed sheet is cached in, or None to
+            always parse the workbook.
+
+    Returns:
+        pd.DataFrame: The coding index entries, with every column as a string
+        and missing values as empty strings.
+    """
+    return _read_sheet(soc_index_file, SOC_INDEX_SHEET, "soc_index", cache_dir)
+
+
+def read_soc_structure(
+    soc_structure_file: tuple[str, str], cache_dir: str | None = None
+) -> "pd.DataFrame":
+    """Read the unit group descriptions sheet of the SOC structure workbook.
+
+    Args:
+        soc_structure_file: The package and file name of the SOC structure
+            workbook.
+        cache_dir: The directory the parsed sheet is cached in, or None to
+            always parse the workbook.
+
+    Returns:
+        pd.DataFrame: The major, sub-major, minor and unit groups with their
+        titles and descriptions, as strings like `read_soc_index`.
+    """
+    return _read_sheet(
+        soc_structure_file, SOC_STRUCTURE_SHEET, "soc_structure", cache_dir
+    )
+
+
+def _read_sheet(
+    workbook_file: tuple[str, str], sheet: str, name: str, cache_dir: str | None
+) -> "pd.DataFrame":
+    """Read a sheet of a workbook, from its cache if there is one.
+
+    Args:
+        workbook_file: The package and file name of the workbook.
+        sheet: The name of the sheet.
+        name: The name of the sheet's cache files.
+        cache_dir: The directory the parsed sheet is cached in, or None to
+            always parse the workbook.
+
+    Returns:
+        pd.DataFrame: The rows of the sheet, as returned by `read_soc_index`.
+    """
+    if cache_dir is None:
+        return _parse_sheet(workbook_file, sheet)
+
+    path = os.path.join(
+        cache_dir,
+        SOC_INDEX_CACHE_FILE.format(
+            name=name,
+            version=SOC_INDEX_CACHE_VERSION,
+            checksum=file_checksum(workbook_file)[:16],
+        ),
+    )
+    frame = _read_cached_sheet(path)
+    if frame is None:
+        frame = _parse_sheet(workbook_file, sheet)
+        _write_cached_sheet(path, frame)
+    return frame
+
+
+def _parse_sheet(workbook_file: tuple[str, str], sheet: str) -> "pd.DataFrame":
+    """Parse a sheet of a workbook.
+
+    Args:
+        workbook_file: The package and file name of the workbook.
+        sheet: The name of the sheet.
+
+    Returns:
+        pd.DataFrame: The rows of the sheet, as returned by `read_soc_index`.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    package, name = workbook_file
+    logger.info(f"Parsing the SOC workbook - file: {name}, sheet: {sheet}")
+    with files(package).joinpath(name).open("rb") as f:
+        frame = pd.read_excel(f, sheet_name=sheet, dtype=str)
+    return frame.fillna("")
+
+
+def _read_cached_sheet(path: str) -> "pd.DataFrame | None":
+    """Load a parsed workbook sheet from its cache.
+
+    Args:
+        path: The path of the cache file.
+
+    Returns:
+        pd.DataFrame | None: The rows of the sheet, or None if the cache is
+        missing or unreadable.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+
+    try:
+        with np.load(path, allow_pickle=False) as arrays:
+            columns = np.asarray(arrays["columns"]).tolist()
+            return pd.DataFrame(
+                {
+                    name: arrays[f"column_{position}"].astype(object)
+                    for position, name in enumerate(columns)
+                },
+                columns=columns,
+            )
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable SOC workbook cache {path}: {e}")
+        return None
+
+
+def _write_cached_sheet(path: str, frame: "pd.DataFrame"):
+    """Cache a parsed workbook sheet, one string array per column.
+
+    The cache is written via a temporary file, so a worker reading it never
+    sees a partial file. Failing to write it only logs a warning.
+
+    Args:
+        path: The path of the cache file.
+        frame: The rows of the sheet.
+    """
+    arrays = {
+        f"column_{position}": np.asarray(frame[name].tolist(), dtype=str)
+        for position, name in enumerate(frame.columns)
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.savez(f, columns=np.asarray(frame.columns, dtype=str), **arrays)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write SOC workbook cache {path}: {e}")
+        return
+    logger.info(f"Cached the SOC workbook sheet - path: {path}")
+
+
+def soc_index_documents(frame: "pd.DataFrame") -> tuple[list[str], list[dict]]:
+    """Build the text and metadata of each coding index entry.
+
+    The text of an entry is its title in natural word order followed by any
+    additional qualifier and industry, for example "Manager, advertising".
+
+    Args:
+        frame: The coding index entries read by `read_soc_index`.
+
+    Returns:
+        tuple[list[str], list[dict]]: The text to embed for each entry, and
+        its metadata with the SOC code and title.
+    """
+    columns = [frame[TITLE_COLUMN], *(frame[name] for name in QUALIFIER_COLUMNS)]
+    texts = [
+        ", ".join(part.strip() for part in parts if part.strip())
+        for parts in zip(*columns, strict=True)
+    ]
+    metadata = [
+        {"code": code.strip(), "title": text}
+        for code, text in zip(frame[CODE_COLUMN], texts, strict=True)
+    ]
+    return texts, metadata
+
+
+def load_soc_index(
+    soc_index_file: tuple[str, str], cache_dir: str | None = None
+) -> tuple[list[str], list[dict]]:
+    """Load the text and metadata of each entry of the SOC coding index.
+
+    Args:
+        soc_index_file: The package and file name of the SOC index workbook.
+        cache_dir: The directory the parsed sheet is cached in, or None to
+            always parse the workbook.
+
+    Returns:
+        tuple[list[str], list[dict]]: The text to embed for each entry, and
+        its metadata with the SOC code and title.
+    """
+    return soc_index_documents(read_soc_index(soc_index_file, cache_dir))
+
+
+def document_parity_key() -> str | None:
+    """Identify the document formats a parity check holds for.
+
+    Returns:
+        str | None: The version of `soc_index_documents` and of the installed
+        upstream package, or None if the upstream version is unknown.
+    """
+    distributions = importlib.metadata.packages_distributions().get(UPSTREAM_PACKAGE)
+    if not distributions:
+        return None
+    upstream_version = importlib.metadata.version(distributions[0])
+    return (
+        f"soc_index_documents={SOC_INDEX_DOCUMENTS_VERSION};"
+        f"{distributions[0]}={upstream_version}"
+    )
+
+
+def check_document_parity(row_hashes: Iterable[str], reference_hashes: Iterable[str]):
+    """Check that parsed documents are those of the upstream handler.
+
+    Documents are compared by the content hash of their text and metadata,
+    and both must hold the same documents, for the same workbook.
+
+    Args:
+        row_hashes: The content hash of each parsed document.
+        reference_hashes: The content hash of each document embedded by
+            `EmbeddingHandler.embed_index` from the same workbook.
+
+    Raises:
+        ValueError: If any document is only in one of them.
+    """
+    parsed, reference = Counter(row_hashes), Counter(reference_hashes)
+    if parsed != reference:
+        raise ValueError(
+            f"{(reference - parsed).total()} of the {reference.total()} "
+            "documents embedded by EmbeddingHandler are not in the parsed "
+            f"coding index, and {(parsed - reference).total()} parsed documents "
+            "are not in the handler's, so the parsed texts or metadata differ "
+            "from the upstream format. Update soc_index_documents and bump "
+            "SOC_INDEX_DOCUMENTS_VERSION"
+        )
+    logger.info(f"Parsed documents match EmbeddingHandler's {reference.total()}")
+
+
+def deduplicate_texts(texts: list[str]) -> tuple[list[str], np.ndarray]:
+    """Group texts that are the same once normalised.
+
+    Each group is represented by its first text, so entries repeated under
+    different codes, or differing only in case or punctuation, share one
+    embedding.
+
+    Args:
+        texts: The text of each entry.
+
+    Returns:
+        tuple[list[str], np.ndarray]: The unique texts to embed, and the
+        position in them of each entry's text.
+    """
+    positions: dict[str, int] = {}
+    unique_texts = []
+    row_vectors = np.empty(len(texts), dtype=np.int32)
+    for row, text in enumerate(texts):
+        key = normalise_text(text)
+        if key not in positions:
+            positions[key] = len(unique_texts)
+            unique_texts.append(text)
+        row_vectors[row] = positions[key]
+    return unique_texts, row_vectors
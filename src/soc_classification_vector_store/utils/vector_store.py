@@ -3,12 +3,90 @@
 This module contains utility functions to manage the vector store interface.
 """
 
+# pylint: disable=too-many-lines
+
 import os
-from threading import Event
+import time
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime
+from functools import partial
+from threading import Event, Lock, Thread
+from typing import TYPE_CHECKING
 
-from occupational_classification_utils.embed.embedding import EmbeddingHandler
+import numpy as np
 from survey_assist_utils.logging import get_logger
 
+from soc_classification_vector_store.utils.batching import (
+    SearchBatcher,
+    search_index_multi_batch,
+)
+from soc_classification_vector_store.utils.cache import SearchCache
+from soc_classification_vector_store.utils.common import (
+    safe_bool,
+    safe_float,
+    safe_int,
+)
+from soc_classification_vector_store.utils.executor import (
+    AdmissionController,
+    BoundedSearchExecutor,
+    await_search,
+)
+from soc_classification_vector_store.utils.index_build import (
+    IndexBuildProgress,
+    clear_checkpoints,
+    embedding_model_encoder,
+    update_index_embeddings,
+)
+from soc_classification_vector_store.utils.lexical_index import (
+    LexicalIndex,
+    exact_hits,
+    merge_exact_hits,
+)
+from soc_classification_vector_store.utils.metrics import (
+    EXACT_MATCH_SECONDS_SAVED,
+    INDEX_LOAD_SECONDS,
+    STARTUP_PHASE_SECONDS,
+    timed_startup_phase,
+)
+from soc_classification_vector_store.utils.query_encoder import (
+    QUERY_ENCODER_CPU_INT8,
+    QUERY_ENCODER_DEFAULT,
+    QuantisedEncoder,
+    create_query_encoder,
+)
+from soc_classification_vector_store.utils.search_backend import (
+    ExactSearchBackend,
+    as_search_backend,
+)
+from soc_classification_vector_store.utils.search_options import (
+    EXACT_MATCH_DIRECT,
+    EXACT_MATCH_OFF,
+    QUERY_MODE_MULTI,
+    SearchOptions,
+)
+from soc_classification_vector_store.utils.snapshot import (
+    DOCUMENT_SOURCE_EMBEDDING_HANDLER,
+    DOCUMENT_SOURCE_SOC_INDEX,
+    Snapshot,
+    load_snapshot,
+    read_manifest,
+    row_content_hash,
+    snapshot_lock,
+    source_checksums,
+    write_snapshot,
+)
+from soc_classification_vector_store.utils.soc_index import (
+    check_document_parity,
+    deduplicate_texts,
+    document_parity_key,
+    load_soc_index,
+    read_soc_index,
+    read_soc_structure,
+)
+
+if TYPE_CHECKING:
+    from occupational_classification_utils.embed.embedding import EmbeddingHandler
+
 logger = get_logger(__name__, level="DEBUG")
 
 # Shared variables and events
@@ -36,36 +114,547 @@ SOC_STRUCTURE_FILE = os.getenv(
     "soc2020volume1structureanddescriptionofunitgroupsexcel16042025.xlsx",
 )
 
+# The coding index sheet parsed from its workbook is cached in this directory,
+# keyed by the workbook checksum, so later builds and lexical index loads do
+# not parse the workbook again
+SOC_INDEX_CACHE_ENABLED = safe_bool(os.getenv("SOC_INDEX_CACHE_ENABLED"), default=True)
+SOC_INDEX_CACHE_DIR = os.getenv(
+    "SOC_INDEX_CACHE_DIR", os.path.join(VECTOR_STORE_DIR, "soc_index_cache")
+)
+
+# A snapshot of the embedded index is loaded from this directory, when it
+# matches the source spreadsheets, instead of re-embedding the index
+SNAPSHOT_ENABLED = safe_bool(os.getenv("SNAPSHOT_ENABLED"), default=True)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(VECTOR_STORE_DIR, "snapshot"))
+# When there is no usable snapshot, build one on load. With several uvicorn
+# workers only the first builds it and the others memory-map the result.
+SNAPSHOT_WRITE_ON_LOAD = safe_bool(os.getenv("SNAPSHOT_WRITE_ON_LOAD"), default=False)
+
+# Snapshots can be built by embedding the coding index in parallel chunks on a
+# pool of worker processes instead of a single `embed_index` call. Completed
+# chunks are checkpointed so an interrupted build resumes where it stopped.
+INDEX_BUILD_PARALLEL = safe_bool(os.getenv("INDEX_BUILD_PARALLEL"), default=False)
+INDEX_BUILD_WORKERS = safe_int(
+    os.getenv("INDEX_BUILD_WORKERS"), default=os.cpu_count() or 1
+)
+INDEX_BUILD_CHUNK_SIZE = safe_int(os.getenv("INDEX_BUILD_CHUNK_SIZE"), default=1024)
+INDEX_BUILD_CHECKPOINT_DIR = os.getenv(
+    "INDEX_BUILD_CHECKPOINT_DIR", os.path.join(VECTOR_STORE_DIR, "build")
+)
+
+# Index entries whose texts are the same once normalised can share a single
+# embedding in the snapshot, which the exact backend expands to every entry
+INDEX_DEDUPLICATE = safe_bool(os.getenv("INDEX_DEDUPLICATE"), default=False)
+
+# The search backend: "exact" searches an in-memory NumPy matrix, exporting it
+# from Chroma if there is no snapshot, "embedding_handler" always searches the
+# Chroma vector store, and "auto" uses the exact backend when a snapshot is
+# available. The exact backend can hold its matrix as float32, float16 or int8
+# with per-dimension scales. Snapshots include a compact copy in that dtype, so
+# workers memory-map and share it. The nearest candidates in a compact matrix
+# can be re-ranked using the full precision embeddings.
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto").lower()
+SEARCH_BACKEND_DTYPE = os.getenv("SEARCH_BACKEND_DTYPE", "float32").lower()
+SEARCH_RERANK_CANDIDATES = safe_int(os.getenv("SEARCH_RERANK_CANDIDATES"), default=0)
+
+# The exact backend can search coarse to fine along the SOC 2020 hierarchy:
+# each query is matched against the centroid of every minor group, and only
+# the unit groups under the nearest branches are scored. 0 searches every row.
+SEARCH_HIERARCHY_BRANCHES = safe_int(os.getenv("SEARCH_HIERARCHY_BRANCHES"), default=0)
+
+# The encoder of queries and index rows: "default" uses the embedding model of
+# the embedding handler, "cpu_int8" the same model dynamically quantised to
+# int8 and texts encoded QUERY_ENCODER_BATCH_SIZE at a time, padded to the
+# longest text of their batch. QUERY_ENCODER_THREADS sets the torch intra-op
+# threads of the whole process when above 0, and 0 leaves the torch default.
+# The quantised model is held alongside the handler's float model. The
+# snapshot records its encoder and is only searched with the same one, so a
+# non-default encoder needs a snapshot built with it.
+QUERY_ENCODER = os.getenv("QUERY_ENCODER", QUERY_ENCODER_DEFAULT).lower()
+QUERY_ENCODER_THREADS = safe_int(os.getenv("QUERY_ENCODER_THREADS"), default=0)
+QUERY_ENCODER_BATCH_SIZE = safe_int(os.getenv("QUERY_ENCODER_BATCH_SIZE"), default=32)
+
+# Searches run on a dedicated thread pool so they do not block the event loop.
+# Requests beyond the workers plus the queue size are rejected immediately.
+SEARCH_EXECUTOR_WORKERS = safe_int(
+    os.getenv("SEARCH_EXECUTOR_WORKERS"), default=min(4, os.cpu_count() or 1)
+)
+SEARCH_EXECUTOR_QUEUE_SIZE = safe_int(
+    os.getenv("SEARCH_EXECUTOR_QUEUE_SIZE"), default=64
+)
+
+# Search requests being served can be limited, rejecting those beyond the limit
+# with a 429 rather than queueing them. 0 admits every request up to the
+# executor queue. Rejected and overloaded responses ask clients to retry after
+# SEARCH_RETRY_AFTER_SECONDS, and responses while the index loads after
+# INDEX_LOADING_RETRY_AFTER_SECONDS. Searches are given up, and their queued
+# work cancelled, once a request's deadline passes: the request can set one
+# with the `X-Request-Timeout-Ms` header, otherwise SEARCH_REQUEST_TIMEOUT_MS
+# applies, 0 for no deadline.
+SEARCH_MAX_IN_FLIGHT = safe_int(os.getenv("SEARCH_MAX_IN_FLIGHT"), default=0)
+SEARCH_RETRY_AFTER_SECONDS = safe_int(
+    os.getenv("SEARCH_RETRY_AFTER_SECONDS"), default=1
+)
+INDEX_LOADING_RETRY_AFTER_SECONDS = safe_int(
+    os.getenv("INDEX_LOADING_RETRY_AFTER_SECONDS"), default=10
+)
+SEARCH_REQUEST_TIMEOUT_MS = safe_float(
+    os.getenv("SEARCH_REQUEST_TIMEOUT_MS"), default=0.0
+)
+
+# Concurrent searches can be coalesced into batches so their texts are encoded
+# in a single forward pass. A batch is run once it is full or its oldest query
+# has waited for the maximum wait time.
+SEARCH_BATCH_ENABLED = safe_bool(os.getenv("SEARCH_BATCH_ENABLED"), default=False)
+SEARCH_BATCH_MAX_SIZE = safe_int(os.getenv("SEARCH_BATCH_MAX_SIZE"), default=32)
+SEARCH_BATCH_MAX_WAIT_MS = safe_float(
+    os.getenv("SEARCH_BATCH_MAX_WAIT_MS"), default=5.0
+)
+
+# Query term embeddings and search results can be cached, keyed by the
+# normalised query text. Both are cleared when the loaded index version changes.
+SEARCH_CACHE_ENABLED = safe_bool(os.getenv("SEARCH_CACHE_ENABLED"), default=False)
+SEARCH_CACHE_EMBEDDING_ENTRIES = safe_int(
+    os.getenv("SEARCH_CACHE_EMBEDDING_ENTRIES"), default=20000
+)
+SEARCH_CACHE_RESULT_ENTRIES = safe_int(
+    os.getenv("SEARCH_CACHE_RESULT_ENTRIES"), default=5000
+)
+SEARCH_CACHE_TTL_SECONDS = safe_float(
+    os.getenv("SEARCH_CACHE_TTL_SECONDS"), default=3600.0
+)
+
+# The snapshot directory can be polled for a new snapshot, for example one
+# built by `make build-snapshot`, which is then loaded and swapped in without
+# interrupting searches
+INDEX_WATCH_ENABLED = safe_bool(os.getenv("INDEX_WATCH_ENABLED"), default=False)
+INDEX_WATCH_INTERVAL_SECONDS = safe_float(
+    os.getenv("INDEX_WATCH_INTERVAL_SECONDS"), default=30.0
+)
+
+# Searches can return only the nearest entry for each SOC code, searching
+# further so that duplicate codes do not take up the nearest matches
+SEARCH_UNIQUE_CODES = safe_bool(os.getenv("SEARCH_UNIQUE_CODES"), default=False)
+
+# How the industry description, job title and job description of a query are
+# searched, unless the request chooses: "multi" searches each field and prefix
+# of the fields and merges the results, "skip_empty" does the same leaving out
+# empty fields, and "fused" combines the field embeddings into one weighted
+# query vector for a single lookup
+SEARCH_QUERY_MODE = os.getenv("SEARCH_QUERY_MODE", QUERY_MODE_MULTI).lower()
+SEARCH_FUSED_WEIGHTS = (
+    safe_float(os.getenv("SEARCH_FUSED_WEIGHT_INDUSTRY"), default=1.0),
+    safe_float(os.getenv("SEARCH_FUSED_WEIGHT_JOB_TITLE"), default=1.0),
+    safe_float(os.getenv("SEARCH_FUSED_WEIGHT_JOB_DESCRIPTION"), default=1.0),
+)
+
+# A hash index of the normalised coding index titles can be built on load, so
+# that job titles matching an entry exactly are answered without a vector
+# search: "direct" returns the exact matches when there are any, "merge" puts
+# them ahead of the vector search results and "off" does not look them up.
+# Requests can choose the mode when the index is built.
+LEXICAL_INDEX_ENABLED = safe_bool(os.getenv("LEXICAL_INDEX_ENABLED"), default=False)
+SEARCH_EXACT_MATCH = os.getenv("SEARCH_EXACT_MATCH", EXACT_MATCH_OFF).lower()
+
+# Bulk searches are split into chunks that are each searched as one batch
+BULK_SEARCH_CHUNK_SIZE = safe_int(os.getenv("BULK_SEARCH_CHUNK_SIZE"), default=256)
+
 # Reference paths for the index and structure files
 PATH_REF = "soc_classification_vector_store.data.soc_index"
 SOC_INDEX_TUPLE = (PATH_REF, SOC_INDEX_FILE)
 SOC_STRUCTURE_TUPLE = (PATH_REF, SOC_STRUCTURE_FILE)
+SOC_INDEX_CACHE = SOC_INDEX_CACHE_DIR if SOC_INDEX_CACHE_ENABLED else None
+
+# Progress of the parallel index build, reported on the status endpoint
+index_build_progress = IndexBuildProgress()
+
+
+def create_embedding_handler() -> "EmbeddingHandler":
+    """Create the embedding handler of the vector store.
+
+    The embedding stack, and through it torch and sentence-transformers, is
+    imported here rather than with this module, so the API can start serving
+    while the loading thread imports it.
+
+    Returns:
+        EmbeddingHandler: The embedding handler, with its model loaded.
+    """
+    with timed_startup_phase("imports"):
+        from occupational_classification_utils.embed.embedding import (  # pylint: disable=import-outside-toplevel,redefined-outer-name
+            EmbeddingHandler,
+        )
+    with timed_startup_phase("model_load"):
+        return EmbeddingHandler(db_dir=VECTOR_STORE_DIR)
+
+
+def load_vector_store() -> "EmbeddingHandler | ExactSearchBackend":
+    """Load the vector store.
 
+    If a snapshot built from the current SOC spreadsheets, embedding model and
+    query encoder exists in `SNAPSHOT_DIR` it is memory-mapped and searched
+    with the exact search backend, otherwise the SOC index is embedded from
+    scratch.
 
-def load_vector_store() -> EmbeddingHandler:
-    """Load the vector store."""
+    Raises:
+        ValueError: If a non-default query encoder is selected and there is no
+            snapshot built with it.
+    """
     # Create the embeddings index
     logger.info(f"Loading the vector store - db_dir: {VECTOR_STORE_DIR}")
-    embed = EmbeddingHandler(db_dir=VECTOR_STORE_DIR)
+    embed = create_embedding_handler()
+    with timed_startup_phase("model_load"):
+        encoder = create_query_encoder(
+            QUERY_ENCODER,
+            embed,
+            threads=QUERY_ENCODER_THREADS,
+            batch_size=QUERY_ENCODER_BATCH_SIZE,
+        )
+
+    if SNAPSHOT_ENABLED and SEARCH_BACKEND != "embedding_handler":
+        snapshot = _load_or_build_snapshot(embed)
+        if snapshot is not None:
+            logger.info(f"Loading the vector store - snapshot: {SNAPSHOT_DIR}")
+            with timed_startup_phase("index_load"):
+                return ExactSearchBackend.from_snapshot(
+                    snapshot,
+                    embed,
+                    dtype=SEARCH_BACKEND_DTYPE,
+                    rerank_candidates=SEARCH_RERANK_CANDIDATES,
+                    hierarchy_branches=SEARCH_HIERARCHY_BRANCHES,
+                    encoder=encoder,
+                )
+    if encoder is not None:
+        # The embedding handler embeds the index with the default encoder
+        raise ValueError(
+            f"The {QUERY_ENCODER} query encoder needs a snapshot built with it "
+            "and the exact search backend, run `make build-snapshot` or set "
+            "SNAPSHOT_WRITE_ON_LOAD"
+        )
 
     logger.info(f"Loading the vector store - soc_index_file: {SOC_INDEX_TUPLE}")
     logger.info(f"Loading the vector store - soc_structure_file: {SOC_STRUCTURE_TUPLE}")
-    embed.embed_index(
-        from_empty=False,
-        soc_index_file=SOC_INDEX_TUPLE,
-        soc_structure_file=SOC_STRUCTURE_TUPLE,
-    )
+    # The embedding handler parses the spreadsheets as it embeds them
+    with timed_startup_phase("index_build"):
+        embed.embed_index(
+            from_empty=False,
+            soc_index_file=SOC_INDEX_TUPLE,
+            soc_structure_file=SOC_STRUCTURE_TUPLE,
+        )
     vector_store_status = (  # pylint: disable=redefined-outer-name
         embed.get_embed_config()
     )
 
     logger.info(f"Vector store status: {vector_store_status}")
     logger.info("Vector store loaded")
+    if SEARCH_BACKEND == "exact":
+        with timed_startup_phase("index_load"):
+            return ExactSearchBackend.from_embedding_handler(
+                embed,
+                dtype=SEARCH_BACKEND_DTYPE,
+                rerank_candidates=SEARCH_RERANK_CANDIDATES,
+                hierarchy_branches=SEARCH_HIERARCHY_BRANCHES,
+            )
     return embed
 
 
+def build_vector_store_snapshot() -> dict:
+    """Embed the SOC index and write a snapshot of it to `SNAPSHOT_DIR`.
+
+    Rows unchanged since the existing snapshot reuse their embeddings, see
+    `_build_index_snapshot`. The structure workbook is cached along with the
+    coding index, so later readers of its unit groups skip parsing it.
+
+    Returns:
+        dict: The manifest of the written snapshot.
+    """
+    logger.info(f"Building vector store snapshot - db_dir: {VECTOR_STORE_DIR}")
+    if SOC_INDEX_CACHE is not None:
+        with timed_startup_phase("spreadsheet_parse"):
+            read_soc_structure(SOC_STRUCTURE_TUPLE, SOC_INDEX_CACHE)
+    return _build_index_snapshot(create_embedding_handler())
+
+
+def _load_or_build_snapshot(embed: "EmbeddingHandler") -> Snapshot | None:
+    """Load the index snapshot, building it first if enabled and missing.
+
+    Args:
+        embed: The embedding handler used to build the index.
+
+    A snapshot is built when `SNAPSHOT_WRITE_ON_LOAD` is set, or when the
+    snapshot in `SNAPSHOT_DIR` is out of date but was built from documents
+    already checked against the handler's. The latter is updated from the
+    cached coding index, embedding only the changed rows, rather than having
+    the handler parse the workbooks and embed the whole index again.
+
+    Returns:
+        Snapshot | None: The loaded snapshot, or None if there is no usable
+        snapshot and none is built.
+    """
+    checksums = source_checksums(SOC_INDEX_TUPLE, SOC_STRUCTURE_TUPLE)
+    model_name = embed.get_embed_config().get("embedding_model_name")
+    with timed_startup_phase("index_load"):
+        snapshot = load_snapshot(
+            SNAPSHOT_DIR,
+            checksums=checksums,
+            embedding_model_name=model_name,
+            query_encoder=QUERY_ENCODER,
+        )
+    if snapshot is not None:
+        return snapshot
+    if not SNAPSHOT_WRITE_ON_LOAD and not _documents_checked(model_name):
+        return None
+
+    with snapshot_lock(SNAPSHOT_DIR):
+        # Another worker may have written the snapshot while we waited
+        snapshot = load_snapshot(
+            SNAPSHOT_DIR,
+            checksums=checksums,
+            embedding_model_name=model_name,
+            query_encoder=QUERY_ENCODER,
+        )
+        if snapshot is None:
+            logger.info("No usable snapshot, embedding the index to build one")
+            _build_index_snapshot(embed)
+            snapshot = load_snapshot(
+                SNAPSHOT_DIR,
+                checksums=checksums,
+                embedding_model_name=model_name,
+                query_encoder=QUERY_ENCODER,
+            )
+    return snapshot
+
+
+def _documents_checked(model_name: str | None) -> bool:
+    """Whether the snapshot in `SNAPSHOT_DIR` was built from checked documents.
+
+    Args:
+        model_name: The name of the embedding model.
+
+    Returns:
+        bool: True if the snapshot, whatever workbooks it was built from, has
+        the current `document_parity_key`, so it can be updated without the
+        handler embedding the index.
+    """
+    parity_key = document_parity_key()
+    if parity_key is None:
+        return False
+    previous = load_snapshot(
+        SNAPSHOT_DIR,
+        checksums=None,
+        embedding_model_name=model_name,
+        query_encoder=QUERY_ENCODER,
+    )
+    return (
+        previous is not None and previous.manifest.get("document_parity") == parity_key
+    )
+
+
+def _write_index_snapshot(
+    embed: "EmbeddingHandler", document_parity: str | None = None
+) -> dict:
+    """Write a snapshot of an embedded index to `SNAPSHOT_DIR`.
+
+    Args:
+        embed: The embedding handler holding the embedded SOC index.
+        document_parity: The `document_parity_key` the parsed coding index
+            was checked against the handler's documents with, if it was.
+
+    Returns:
+        dict: The manifest of the written snapshot.
+    """
+    documents = embed.vector_store.get(include=["embeddings", "metadatas", "documents"])
+    texts = documents.get("documents")
+    embeddings = documents["embeddings"]
+    row_hashes = row_vectors = None
+    if texts:
+        texts, row_hashes, row_vectors = _index_rows(texts, documents["metadatas"])
+    if row_vectors is not None:
+        # Keep the embedding of the first document with each unique text
+        embeddings = np.asarray(embeddings)[
+            np.unique(row_vectors, return_index=True)[1]
+        ]
+    return write_snapshot(
+        SNAPSHOT_DIR,
+        embeddings=embeddings,
+        metadata=documents["metadatas"],
+        row_hashes=row_hashes,
+        row_vectors=row_vectors,
+        embedding_model_name=embed.get_embed_config()["embedding_model_name"],
+        checksums=source_checksums(SOC_INDEX_TUPLE, SOC_STRUCTURE_TUPLE),
+        storage_dtypes=(SEARCH_BACKEND_DTYPE,),
+        document_source=DOCUMENT_SOURCE_EMBEDDING_HANDLER,
+        document_parity=document_parity,
+    )
+
+
+def _index_rows(
+    texts: list[str], metadata: list[dict]
+) -> tuple[list[str], list[str], np.ndarray | None]:
+    """Find the texts to embed for the documents of the index.
+
+    With `INDEX_DEDUPLICATE` each text that is the same once normalised is
+    embedded once and hashed on its text alone, since documents with
+    different metadata share it. Otherwise each document is embedded and
+    hashed with its metadata.
+
+    Args:
+        texts: The text of each document.
+        metadata: The metadata of each document.
+
+    Returns:
+        tuple[list[str], list[str], np.ndarray | None]: The texts to embed,
+        the content hash of each, and the embedding row of each document if
+        the index is deduplicated.
+    """
+    if INDEX_DEDUPLICATE:
+        texts, row_vectors = deduplicate_texts(texts)
+        return texts, [row_content_hash(text, {}) for text in texts], row_vectors
+    row_hashes = [
+        row_content_hash(text, row) for text, row in zip(texts, metadata, strict=True)
+    ]
+    return texts, row_hashes, None
+
+
+def _build_index_snapshot(embed: "EmbeddingHandler") -> dict:
+    """Embed the coding index in chunks and write it to `SNAPSHOT_DIR`.
+
+    Rows that are unchanged since the snapshot already in `SNAPSHOT_DIR` was
+    built, for example when a new version of the spreadsheets is given, reuse
+    their embeddings so only added or changed rows are embedded. Rows are
+    embedded with the encoder selected by `QUERY_ENCODER`, on a pool of
+    worker processes if `INDEX_BUILD_PARALLEL` is set and otherwise in this
+    process, with the handler's model for the default encoder.
+
+    The documents are parsed from the coding index here rather than built by
+    `EmbeddingHandler.embed_index`. Unless the snapshot in `SNAPSHOT_DIR` was
+    built from documents already checked with the same `document_parity_key`,
+    the index is first embedded by the handler and the parsed documents must
+    be exactly those it embedded. The handler's index is then written as the
+    snapshot with the default encoder.
+
+    Args:
+        embed: The embedding handler whose embedding model names the index.
+
+    Returns:
+        dict: The manifest of the written snapshot.
+
+    Raises:
+        ValueError: If the parsed documents differ from the handler's.
+    """
+    checksums = source_checksums(SOC_INDEX_TUPLE, SOC_STRUCTURE_TUPLE)
+    model_name = embed.get_embed_config()["embedding_model_name"]
+    with timed_startup_phase("spreadsheet_parse"):
+        documents, metadata = load_soc_index(SOC_INDEX_TUPLE, SOC_INDEX_CACHE)
+    texts, row_hashes, row_vectors = _index_rows(documents, metadata)
+    previous = load_snapshot(
+        SNAPSHOT_DIR,
+        checksums=None,
+        embedding_model_name=model_name,
+        query_encoder=QUERY_ENCODER,
+    )
+    parity_key = document_parity_key()
+    if (
+        parity_key is None
+        or previous is None
+        or previous.manifest.get("document_parity") != parity_key
+    ):
+        _check_embedding_handler_documents(embed, documents, metadata)
+        if QUERY_ENCODER == QUERY_ENCODER_DEFAULT:
+            return _write_index_snapshot(embed, document_parity=parity_key)
+    with timed_startup_phase("index_build"):
+        embeddings, changes = update_index_embeddings(
+            texts,
+            row_hashes,
+            previous=previous,
+            checkpoint_dir=INDEX_BUILD_CHECKPOINT_DIR,
+            build_key={
+                "source_checksums": checksums,
+                "embedding_model_name": model_name,
+                "query_encoder": QUERY_ENCODER,
+            },
+            encoder_factory=_index_encoder_factory(model_name, embed),
+            workers=INDEX_BUILD_WORKERS if INDEX_BUILD_PARALLEL else 1,
+            chunk_size=INDEX_BUILD_CHUNK_SIZE,
+            progress=index_build_progress,
+        )
+        manifest = write_snapshot(
+            SNAPSHOT_DIR,
+            embeddings=embeddings,
+            metadata=metadata,
+            embedding_model_name=model_name,
+            checksums=checksums,
+            row_hashes=row_hashes,
+            row_vectors=row_vectors,
+            changes=changes,
+            storage_dtypes=(SEARCH_BACKEND_DTYPE,),
+            query_encoder=QUERY_ENCODER,
+            document_source=DOCUMENT_SOURCE_SOC_INDEX,
+            document_parity=parity_key,
+        )
+    clear_checkpoints(INDEX_BUILD_CHECKPOINT_DIR)
+    return manifest
+
+
+def _check_embedding_handler_documents(
+    embed: "EmbeddingHandler", texts: list[str], metadata: list[dict]
+):
+    """Embed the coding index with the handler and check the parsed documents.
+
+    Args:
+        embed: The embedding handler.
+        texts: The text of each parsed document.
+        metadata: The metadata of each parsed document.
+
+    Raises:
+        ValueError: If the parsed documents differ from the handler's.
+    """
+    logger.info(
+        "Parsed coding index documents not yet checked against this version "
+        "of EmbeddingHandler, embedding the index with it"
+    )
+    with timed_startup_phase("index_build"):
+        embed.embed_index(
+            from_empty=True,
+            soc_index_file=SOC_INDEX_TUPLE,
+            soc_structure_file=SOC_STRUCTURE_TUPLE,
+        )
+    documents = embed.vector_store.get(include=["metadatas", "documents"])
+    check_document_parity(
+        map(row_content_hash, texts, metadata),
+        map(row_content_hash, documents["documents"], documents["metadatas"]),
+    )
+
+
+def _index_encoder_factory(model_name: str, embed: "EmbeddingHandler"):
+    """Return the factory of the encoder that embeds the index rows.
+
+    Args:
+        model_name: The name of the embedding model.
+        embed: The embedding handler, whose model embeds the rows with the
+            default encoder when they are embedded in this process.
+
+    Returns:
+        A callable creating the encoder selected by `QUERY_ENCODER` in this
+        process, or if `INDEX_BUILD_PARALLEL` is set a picklable one creating
+        it in each build worker, whose thread count the build sets.
+
+    Raises:
+        ValueError: If the encoder is unknown.
+    """
+    if QUERY_ENCODER == QUERY_ENCODER_DEFAULT:
+        if not INDEX_BUILD_PARALLEL:
+            # The handler's model is already loaded in this process
+            return lambda: embed.embeddings
+        return embedding_model_encoder
+    if QUERY_ENCODER == QUERY_ENCODER_CPU_INT8:
+        return partial(
+            QuantisedEncoder, model_name, batch_size=QUERY_ENCODER_BATCH_SIZE
+        )
+    raise ValueError(f"Unknown query encoder {QUERY_ENCODER!r}")
+
+
 # Create a simple manager class to maintain compatibility
-class VectorStoreManager:
+class VectorStoreManager:  # pylint: disable=too-many-instance-attributes
     """Manager class for the vector store.
 
     This class provides a simple interface to the vector store functionality.
@@ -77,14 +666,175 @@ class VectorStoreManager:
         self.ready_event = vector_store_ready_event
         self.status = vector_store_status
         self.embed = None
+        self.unique_codes = SEARCH_UNIQUE_CODES
+        self.query_mode = SEARCH_QUERY_MODE
+        self.exact_match = SEARCH_EXACT_MATCH
+        self.lexical_index: LexicalIndex | None = None
+        # Moving average of the vector search time of a query, used to estimate
+        # the time saved by exact matches
+        self._vector_seconds_per_query = 0.0
+        self.loaded_at: datetime | None = None
+        self.reload_error = ""
+        self._reload_lock = Lock()
+        self._watched_version: str | None = None
+        self.admission = AdmissionController(SEARCH_MAX_IN_FLIGHT)
+        self.executor = BoundedSearchExecutor(
+            max_workers=SEARCH_EXECUTOR_WORKERS,
+            queue_size=SEARCH_EXECUTOR_QUEUE_SIZE,
+        )
+        self.batcher = (
+            SearchBatcher(
+                self.search_batch,
+                executor=self.executor,
+                max_batch_size=SEARCH_BATCH_MAX_SIZE,
+                max_wait_ms=SEARCH_BATCH_MAX_WAIT_MS,
+            )
+            if SEARCH_BATCH_ENABLED
+            else None
+        )
+        self.cache = (
+            SearchCache(
+                embedding_entries=SEARCH_CACHE_EMBEDDING_ENTRIES,
+                result_entries=SEARCH_CACHE_RESULT_ENTRIES,
+                ttl_seconds=SEARCH_CACHE_TTL_SECONDS,
+            )
+            if SEARCH_CACHE_ENABLED
+            else None
+        )
 
     def load(self):
         """Load the vector store and update its status."""
-        self.embed = load_vector_store()
-        self.status = self.embed.get_embed_config()
+        self._swap(self._load_backend(), self._load_lexical_index())
+
+    @property
+    def ready(self) -> bool:
+        """Whether an index is loaded and ready to search."""
+        return self.ready_event.is_set() and self.embed is not None
+
+    @property
+    def index_version(self) -> str:
+        """The version of the loaded index, or an empty string if unknown."""
+        return str(self.status.get("index_version", "") or "")
+
+    @property
+    def reloading(self) -> bool:
+        """Whether a reload of the vector store is in progress."""
+        return self._reload_lock.locked()
+
+    def start_reload(self) -> bool:
+        """Start reloading the vector store in the background.
+
+        The new index is loaded while the current one keeps serving searches,
+        then swapped in. Searches already running finish on the old index.
+
+        Returns:
+            bool: True if the reload started, False if one is already running.
+        """
+        # Released by the reload thread once the new index is swapped in
+        if not self._reload_lock.acquire(  # pylint: disable=consider-using-with
+            blocking=False
+        ):
+            return False
+        Thread(target=self._reload, name="vector-store-reload", daemon=True).start()
+        return True
+
+    def check_snapshot(self) -> bool:
+        """Start a reload if a new snapshot has been written to `SNAPSHOT_DIR`.
+
+        Each snapshot version is only reloaded once, even if it is not the
+        one loaded, for example because it was built from other spreadsheets.
+
+        Returns:
+            bool: True if a reload was started.
+        """
+        manifest = read_manifest(SNAPSHOT_DIR)
+        version = manifest.get("index_version") if manifest else None
+        if self._watched_version is None:
+            self._watched_version = self.index_version
+        if not version or version == self._watched_version:
+            return False
+        if not self.ready_event.is_set() or not self.start_reload():
+            return False
+        logger.info(f"New vector store snapshot found - index_version: {version}")
+        self._watched_version = version
+        return True
+
+    def watch_snapshot(
+        self, interval: float = INDEX_WATCH_INTERVAL_SECONDS, stop: Event | None = None
+    ):
+        """Poll `SNAPSHOT_DIR` for new snapshots and reload them until stopped.
+
+        Args:
+            interval: The time in seconds between checks.
+            stop: Event that stops watching when set.
+        """
+        stop = stop or Event()
+        while not stop.wait(interval):
+            try:
+                self.check_snapshot()
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.error(f"Error checking for a new snapshot: {e}", exc_info=True)
+
+    def _load_backend(self):
+        """Load the vector store as a search backend.
+
+        Returns:
+            The search backend of the loaded vector store.
+        """
+        STARTUP_PHASE_SECONDS.clear()
+        start = time.perf_counter()
+        backend = as_search_backend(load_vector_store())
+        INDEX_LOAD_SECONDS.set(time.perf_counter() - start)
+        return backend
+
+    def _load_lexical_index(self) -> LexicalIndex | None:
+        """Build the lexical index of the coding index titles, if enabled.
+
+        Returns:
+            LexicalIndex | None: The lexical index, or None if it is disabled.
+        """
+        if not LEXICAL_INDEX_ENABLED:
+            return None
+        with timed_startup_phase("spreadsheet_parse"):
+            frame = read_soc_index(SOC_INDEX_TUPLE, SOC_INDEX_CACHE)
+        lexical_index = LexicalIndex.from_frame(frame)
+        logger.info(f"Lexical index built - keys: {lexical_index.size}")
+        return lexical_index
+
+    def _swap(self, backend, lexical_index: LexicalIndex | None = None):
+        """Make a loaded search backend the one used by new searches.
+
+        Args:
+            backend: The search backend to swap in.
+            lexical_index: The lexical index of the same coding index, if any.
+        """
+        status = backend.get_embed_config()
+        # Searches read `embed` once, so those running keep the old backend
+        self.embed, self.status = backend, status
+        self.lexical_index = lexical_index
+        self.loaded_at = datetime.now(UTC)
+        if self.cache is not None:
+            self.cache.set_index_version(self.index_version)
+
+    def _reload(self):
+        """Reload the vector store and swap it in, releasing the reload lock."""
+        try:
+            logger.info("Reloading the vector store")
+            self._swap(self._load_backend(), self._load_lexical_index())
+            self.reload_error = ""
+            logger.info(f"Vector store reloaded - index_version: {self.index_version}")
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error(f"Error reloading vector store: {e}", exc_info=True)
+            self.reload_error = str(e)
+        finally:
+            self._reload_lock.release()
 
     def search(
-        self, industry_descr: str = "", job_title: str = "", job_description: str = ""
+        self,
+        industry_descr: str = "",
+        job_title: str = "",
+        job_description: str = "",
+        options: SearchOptions | None = None,
     ):
         """Search the vector store with the given parameters.
 
@@ -92,10 +842,363 @@ class VectorStoreManager:
             industry_descr: Industry description to search for
             job_title: Job title to search for
             job_description: Job description to search for
+            options: The search options, None for the defaults
 
         Returns:
             List of search results
 
+        Raises:
+            RuntimeError: If the vector store is not ready
+        """
+        self._check_ready()
+
+        query = self._build_query(industry_descr, job_title, job_description)
+        if self.cache is not None:
+            return self._search_cached([query], [options])[0]
+        if (
+            self.unique_codes
+            or options is not None
+            or self.query_mode != QUERY_MODE_MULTI
+            or self._exact_match_mode(None) != EXACT_MATCH_OFF
+        ):
+            return self._search_multi_batch(self.embed, [query], [options])[0]
+
+        return self.embed.search_index_multi(query=query)
+
+    def search_batch(
+        self,
+        queries: list[list[str]],
+        options: list[SearchOptions | None] | None = None,
+    ) -> list[list[dict]]:
+        """Search the vector store for several queries in one batch.
+
+        Args:
+            queries: The industry description, job title and job description
+                for each query.
+            options: The search options of each query, None for the defaults.
+
+        Returns:
+            List of search results for each query, in order
+
+        Raises:
+            RuntimeError: If the vector store is not ready
+        """
+        self._check_ready()
+
+        queries = [self._build_query(*query) for query in queries]
+        if self.cache is not None:
+            return self._search_cached(queries, options)
+
+        return self._search_multi_batch(self.embed, queries, options)
+
+    async def asearch(
+        self,
+        industry_descr: str = "",
+        job_title: str = "",
+        job_description: str = "",
+        options: SearchOptions | None = None,
+        deadline: float | None = None,
+    ):
+        """Search the vector store on the search executor without blocking the event loop.
+
+        Args:
+            industry_descr: Industry description to search for
+            job_title: Job title to search for
+            job_description: Job description to search for
+            options: The search options, None for the defaults
+            deadline: The `time.monotonic` time by which the search must
+                complete, None for no deadline
+
+        Returns:
+            List of search results
+
+        Raises:
+            RuntimeError: If the vector store is not ready
+            SearchRejectedError: If too many search requests are in flight
+            SearchQueueFullError: If the search executor cannot accept more work
+            SearchDeadlineExceededError: If the deadline passes first
+        """
+        # Fail fast rather than taking up a queue slot when not ready
+        self._check_ready()
+
+        with self.admission.admit():
+            if self.batcher is not None:
+                future = self.batcher.submit(
+                    [industry_descr, job_title, job_description], options
+                )
+            else:
+                future = self.executor.submit(
+                    self.search,
+                    industry_descr=industry_descr,
+                    job_title=job_title,
+                    job_description=job_description,
+                    options=options,
+                )
+            return await await_search(future, deadline)
+
+    async def asearch_batch(
+        self,
+        queries: list[list[str]],
+        chunk_size: int = BULK_SEARCH_CHUNK_SIZE,
+        options: list[SearchOptions | None] | None = None,
+        deadline: float | None = None,
+    ) -> AsyncIterator[list[list[dict]]]:
+        """Search the vector store for many queries, one chunk at a time.
+
+        Each chunk is searched as a single batch on the search executor, so
+        callers can start using the results before the whole batch is done.
+
+        Args:
+            queries: The industry description, job title and job description
+                for each query.
+            chunk_size: The number of queries searched in each batch.
+            options: The search options of each query, None for the defaults.
+            deadline: The `time.monotonic` time by which every chunk must be
+                searched, None for no deadline.
+
+        Yields:
+            List of search results for each query in the next chunk, in order
+
+        Raises:
+            RuntimeError: If the vector store is not ready
+            SearchRejectedError: If too many search requests are in flight
+            SearchQueueFullError: If the search executor cannot accept more work
+            SearchDeadlineExceededError: If the deadline passes first
+        """
+        self._check_ready()
+
+        chunk_size = max(1, chunk_size)
+        with self.admission.admit():
+            for start in range(0, len(queries), chunk_size):
+                future = self.executor.submit(
+                    self.search_batch,
+                    queries[start : start + chunk_size],
+                    options[start : start + chunk_size] if options else None,
+                )
+                yield await await_search(future, deadline)
+
+    def batching_status(self) -> dict[str, float] | None:
+        """Return the request batching counters.
+
+        Returns:
+            dict | None: The batching counters, or None if batching is disabled.
+        """
+        return self.batcher.stats() if self.batcher is not None else None
+
+    def admission_status(self) -> dict[str, int] | None:
+        """Return the admission control counters.
+
+        Returns:
+            dict | None: The admission counters, or None if there is no limit.
+        """
+        return self.admission.stats() if self.admission.max_in_flight else None
+
+    def build_status(self) -> dict | None:
+        """Return the progress of the parallel index build.
+
+        Returns:
+            dict | None: The build progress, or None if no build has started.
+        """
+        return index_build_progress.stats()
+
+    def memory_status(self) -> dict | None:
+        """Return the memory footprint of the loaded index.
+
+        Returns:
+            dict | None: The memory footprint, or None if the search backend
+            does not hold the index in memory.
+        """
+        if isinstance(self.embed, ExactSearchBackend):
+            return self.embed.memory_footprint()
+        return None
+
+    def cache_status(self) -> dict | None:
+        """Return the search cache counters.
+
+        Returns:
+            dict | None: The cache counters, or None if caching is disabled.
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+    def _search_cached(
+        self,
+        queries: list[list[str]],
+        options: list[SearchOptions | None] | None = None,
+    ) -> list[list[dict]]:
+        """Search the vector store through the search cache.
+
+        Cached results are reused and the remaining queries are searched in
+        one batch, encoding only uncached terms. The normalised query fields
+        are only the cache key: queries are searched with the fields given.
+
+        Args:
+            queries: The query fields for each query, in priority order.
+            options: The search options of each query, None for the defaults.
+
+        Returns:
+            List of search results for each query, in order
+        """
+        # A reload can swap the backend and clear the cache during the search.
+        # `_swap` sets the backend before clearing the cache, so the generation
+        # is read first: results of the old backend are never cached after the
+        # clear, and those of the new one cached before it are cleared with it.
+        generation = self.cache.generation
+        embed = self.embed
+        keys = [
+            self.cache.result_key(query, query_options)
+            for query, query_options in zip(
+                queries, options or [None] * len(queries), strict=True
+            )
+        ]
+        results = {key: self.cache.results.get(key) for key in dict.fromkeys(keys)}
+        # The first query given for each key is searched on a miss
+        queries_by_key: dict = {}
+        for key, query in zip(keys, queries, strict=True):
+            queries_by_key.setdefault(key, query)
+
+        missing = [key for key, result in results.items() if result is None]
+        if missing:
+            searched = self._search_multi_batch(
+                embed,
+                [list(queries_by_key[key]) for key in missing],
+                [key_options for _fields, key_options in missing],
+                encode=self.cache.cached_encoder(embed.encode),
+            )
+            for key, result in zip(missing, searched, strict=True):
+                if self.cache.generation == generation:
+                    self.cache.results.put(key, result)
+                results[key] = result
+
+        return [results[key] for key in keys]
+
+    def _search_multi_batch(
+        self,
+        embed,
+        queries: list[list[str]],
+        options: list[SearchOptions | None] | None,
+        encode=None,
+    ) -> list[list[dict]]:
+        """Search a backend for a batch of queries with the service defaults.
+
+        Queries with an exact match mode are first looked up in the lexical
+        index, and those answered by their exact matches are not searched.
+
+        Args:
+            embed: The search backend, read once by the caller.
+            queries: The query fields for each query, in priority order.
+            options: The search options of each query, None for the defaults.
+            encode: Callable encoding a list of texts, defaults to `embed.encode`.
+
+        Returns:
+            List of search results for each query, in order
+        """
+        options = options or [None] * len(queries)
+        lexical_index = self.lexical_index
+        hits = [
+            (
+                exact_hits(lexical_index, query, query_options)
+                if lexical_index is not None
+                and self._exact_match_mode(query_options) != EXACT_MATCH_OFF
+                else None
+            )
+            for query, query_options in zip(queries, options, strict=True)
+        ]
+
+        direct = [
+            bool(query_hits)
+            and self._exact_match_mode(query_options) == EXACT_MATCH_DIRECT
+            for query_hits, query_options in zip(hits, options, strict=True)
+        ]
+        searched = [i for i, is_direct in enumerate(direct) if not is_direct]
+        matches = self._search_vectors(
+            embed,
+            [queries[i] for i in searched],
+            [options[i] for i in searched],
+            encode=encode,
+        )
+        if len(searched) < len(queries):
+            EXACT_MATCH_SECONDS_SAVED.inc(
+                (len(queries) - len(searched)) * self._vector_seconds_per_query
+            )
+
+        results: list[list[dict]] = [[] for _query in queries]
+        for i, result in zip(searched, matches, strict=True):
+            results[i] = result
+        for i, (query_hits, query_options) in enumerate(
+            zip(hits, options, strict=True)
+        ):
+            if direct[i]:
+                results[i] = query_hits
+            elif query_hits:
+                results[i] = merge_exact_hits(
+                    query_hits,
+                    results[i],
+                    query_options.k if query_options is not None else None,
+                    (
+                        query_options.resolve_unique_codes(self.unique_codes)
+                        if query_options is not None
+                        else self.unique_codes
+                    ),
+                )
+        return results
+
+    def _search_vectors(
+        self,
+        embed,
+        queries: list[list[str]],
+        options: list[SearchOptions | None],
+        encode=None,
+    ) -> list[list[dict]]:
+        """Search a backend for a batch of queries, timing the search.
+
+        Args:
+            embed: The search backend, read once by the caller.
+            queries: The query fields for each query, in priority order.
+            options: The search options of each query, None for the defaults.
+            encode: Callable encoding a list of texts, defaults to `embed.encode`.
+
+        Returns:
+            List of search results for each query, in order
+        """
+        if not queries:
+            return []
+        start = time.perf_counter()
+        matches = search_index_multi_batch(
+            embed,
+            queries,
+            encode=encode,
+            unique_codes=self.unique_codes,
+            options=options,
+            query_mode=self.query_mode,
+            field_weights=SEARCH_FUSED_WEIGHTS,
+        )
+        per_query = (time.perf_counter() - start) / len(queries)
+        self._vector_seconds_per_query = (
+            0.9 * self._vector_seconds_per_query + 0.1 * per_query
+            if self._vector_seconds_per_query
+            else per_query
+        )
+        return matches
+
+    def _exact_match_mode(self, options: SearchOptions | None) -> str:
+        """Return how exact title matches are used by a search.
+
+        Args:
+            options: The search options, None for the defaults.
+
+        Returns:
+            str: The requested exact match mode, or the service default, or
+            `EXACT_MATCH_OFF` if no lexical index is loaded.
+        """
+        if self.lexical_index is None:
+            return EXACT_MATCH_OFF
+        if options is not None and options.exact_match is not None:
+            return options.exact_match
+        return self.exact_match
+
+    def _check_ready(self):
+        """Check that the vector store is loaded and ready to search.
+
         Raises:
             RuntimeError: If the vector store is not ready
         """
@@ -105,14 +1208,26 @@ class VectorStoreManager:
         if not self.embed:
             raise RuntimeError("Vector store not loaded")
 
-        return self.embed.search_index_multi(
-            query=[
-                industry_descr or "",
-                job_title or "",
-                job_description or "",
-            ]
-        )
+    @staticmethod
+    def _build_query(
+        industry_descr: str = "", job_title: str = "", job_description: str = ""
+    ) -> list[str]:
+        """Build the multi-field query passed to the embedding handler.
+
+        Args:
+            industry_descr: Industry description to search for
+            job_title: Job title to search for
+            job_description: Job description to search for
+
+        Returns:
+            list[str]: The query fields in priority order
+        """
+        return [industry_descr or "", job_title or "", job_description or ""]
 
 
 # Create singleton instance
 vector_store_manager = VectorStoreManager()
+
+
+if __name__ == "__main__":
+    build_vector_store_snapshot()
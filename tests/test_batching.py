@@ -0,0 +1,145 @@
+"""Module that provides test functions for the search request batching.
+
+Unit tests for the batched multi search and the request coalescer.
+"""
+
+from threading import Event
+
+import numpy as np
+import pytest
+
+from soc_classification_vector_store.utils.batching import (
+    SearchBatcher,
+    multi_query_terms,
+    search_index_multi_batch,
+)
+from soc_classification_vector_store.utils.executor import BoundedSearchExecutor
+from soc_classification_vector_store.utils.search_backend import (
+    EmbeddingHandlerBackend,
+)
+from soc_classification_vector_store.utils.search_options import SearchOptions
+
+
+# ruff: noqa: PLR2004
+@pytest.mark.utils
+def test_multi_query_terms():
+    """Test that the query fields expand to fields and prefixes."""
+    assert multi_query_terms(["school", "teacher", "maths"]) == [
+        "school",
+        "school teacher",
+        "teacher",
+        "school teacher maths",
+        "maths",
+    ]
+
+
+@pytest.mark.utils
+def test_search_index_multi_batch_encodes_once(mocker):
+    """Test that all unique terms are encoded in a single call."""
+    embed = mocker.Mock()
+    embed.k_matches = 1
+    embed.embeddings.embed_documents.side_effect = lambda texts: [
+        [float(len(text))] for text in texts
+    ]
+
+    def lookup(embedding, k):  # pylint: disable=unused-argument
+        doc = mocker.Mock(metadata={"code": str(int(embedding[0])), "title": "t"})
+        return [(doc, embedding[0] / 10)]
+
+    embed.vector_store.similarity_search_by_vector_with_relevance_scores.side_effect = (
+        lookup
+    )
+
+    results = search_index_multi_batch(
+        EmbeddingHandlerBackend(embed), [["ab", "c"], ["ab", ""]]
+    )
+
+    embed.embeddings.embed_documents.assert_called_once_with(
+        ["ab", "ab c", "c", "ab ", ""]
+    )
+    assert [match["code"] for match in results[0]] == ["1", "2", "4"]
+    assert [match["code"] for match in results[1]] == ["0", "2", "3"]
+
+
+@pytest.mark.utils
+def test_search_index_multi_batch_query_modes(mocker):
+    """Test that empty fields are skipped and fused queries are searched once."""
+    backend = mocker.Mock()
+    backend.encode.side_effect = lambda texts: np.asarray(
+        [[1.0, 0.0] if text == "school" else [0.0, 2.0] for text in texts]
+    )
+    backend.search_by_vectors.side_effect = lambda vectors, **_options: [
+        [{"distance": 0.0, "code": str(vector.round(3).tolist())}] for vector in vectors
+    ]
+    query = ["school", "teacher", ""]
+
+    skipped = search_index_multi_batch(
+        backend, [query], options=[SearchOptions.create(query_mode="skip_empty")]
+    )[0]
+    encoded = backend.encode.call_args.args[0]
+    fused = search_index_multi_batch(
+        backend, [query], query_mode="fused", field_weights=[1.0, 3.0, 1.0]
+    )[0]
+
+    assert encoded == ["school", "school teacher", "teacher"]
+    assert len(skipped) == 3
+    backend.encode.assert_called_with(["school", "teacher"])
+    assert len(backend.search_by_vectors.call_args.args[0]) == 1
+    # The unit field vectors weighted 1:3, scaled to the weighted mean length
+    expected = np.asarray([1.0, 3.0]) / np.sqrt(10) * (1.0 + 3.0 * 2.0) / 4.0
+    assert fused == [{"distance": 0.0, "code": str(expected.round(3).tolist())}]
+    with pytest.raises(ValueError):
+        search_index_multi_batch(backend, [query], query_mode="other")
+
+
+@pytest.mark.utils
+def test_search_batcher_coalesces_requests():
+    """Test that concurrent requests are searched together in one batch."""
+    batches = []
+    release = Event()
+
+    def search_batch(queries, options=None):
+        release.wait(timeout=5)
+        batches.append(queries)
+        return [[{"query": query}] for query in queries]
+
+    executor = BoundedSearchExecutor(max_workers=1, queue_size=4)
+    batcher = SearchBatcher(
+        search_batch, executor=executor, max_batch_size=3, max_wait_ms=200
+    )
+
+    futures = [batcher.submit([str(i), "", ""]) for i in range(3)]
+    release.set()
+
+    assert [future.result(timeout=5) for future in futures] == [
+        [{"query": [str(i), "", ""]}] for i in range(3)
+    ]
+    assert len(batches) == 1
+    stats = batcher.stats()
+    assert stats["batches"] == 1
+    assert stats["full_batches"] == 1
+    assert stats["mean_fill_rate"] == 1.0
+    executor.shutdown()
+
+
+@pytest.mark.utils
+def test_search_batcher_skips_cancelled_requests():
+    """Test that requests cancelled while waiting for a batch are not searched."""
+    batches = []
+
+    def search_batch(queries, options=None):
+        batches.append(queries)
+        return [[{"query": query}] for query in queries]
+
+    executor = BoundedSearchExecutor(max_workers=1, queue_size=4)
+    batcher = SearchBatcher(
+        search_batch, executor=executor, max_batch_size=2, max_wait_ms=200
+    )
+
+    cancelled = batcher.submit(["0", "", ""])
+    assert cancelled.cancel()
+    kept = batcher.submit(["1", "", ""])
+
+    assert kept.result(timeout=5) == [{"query": ["1", "", ""]}]
+    assert batches == [[["1", "", ""]]]
+    executor.shutdown()
@@ -0,0 +1,121 @@
+"""Module that provides test functions for offline bulk search.
+
+Unit tests for reading input files in chunks, writing results incrementally
+and resuming interrupted runs.
+"""
+
+# ruff: noqa: PLR2004
+
+import json
+
+import pandas as pd
+import pytest
+
+from soc_classification_vector_store.utils import bulk_search as bulk_search_module
+from soc_classification_vector_store.utils.bulk_search import bulk_search, main
+
+
+def _search_batch(queries):
+    """Return one result per query naming its job title."""
+    return [
+        [{"distance": 0.1, "title": job_title.title(), "code": "2314"}]
+        for _industry, job_title, _description in queries
+    ]
+
+
+def _input_frame(rows=10):
+    """Create input rows, leaving out the job description column."""
+    return pd.DataFrame(
+        {
+            "id": [f"r{i}" for i in range(rows)],
+            "industry_descr": ["school"] * rows,
+            "job_title": [f"teacher {i}" for i in range(rows)],
+        }
+    )
+
+
+@pytest.mark.utils
+@pytest.mark.parametrize("output_name", ["results.csv", "results.ndjson", "results"])
+def test_bulk_search_formats(tmp_path, output_name):
+    """Test that every row is searched and written in order in each format."""
+    input_path = tmp_path / "input.parquet"
+    _input_frame().to_parquet(input_path, index=False)
+    output_path = tmp_path / output_name
+    output_format = "parquet" if output_name == "results" else None
+
+    summary = bulk_search(
+        _search_batch,
+        str(input_path),
+        str(output_path),
+        chunk_size=3,
+        workers=2,
+        output_format=output_format,
+        id_column="id",
+    )
+
+    assert summary == {"chunks": 4, "rows": 10, "resumed_chunks": 0}
+    if output_name.endswith(".ndjson"):
+        lines = [json.loads(line) for line in output_path.read_text().splitlines()]
+        assert [line["row"] for line in lines] == [f"r{i}" for i in range(10)]
+        assert lines[0]["results"][0]["title"] == "Teacher 0"
+        return
+    results = (
+        pd.read_parquet(output_path)
+        if output_format
+        else pd.read_csv(output_path, dtype={"code": str})
+    )
+    assert results["row"].tolist() == [f"r{i}" for i in range(10)]
+    assert results["rank"].tolist() == [1] * 10
+    assert results["code"].tolist() == ["2314"] * 10
+
+
+@pytest.mark.utils
+def test_bulk_search_resumes_after_last_chunk(tmp_path):
+    """Test that an interrupted run resumes after its last written chunk."""
+    input_path = tmp_path / "input.csv"
+    _input_frame().to_csv(input_path, index=False)
+    output_path = tmp_path / "results.csv"
+    searched = []
+
+    def failing_search(queries):
+        if queries[0][1] == "teacher 6":
+            raise RuntimeError("Interrupted")
+        searched.append(queries[0][1])
+        return _search_batch(queries)
+
+    with pytest.raises(RuntimeError, match="Interrupted"):
+        bulk_search(failing_search, str(input_path), str(output_path), chunk_size=3)
+
+    def search(queries):
+        searched.append(queries[0][1])
+        return _search_batch(queries)
+
+    summary = bulk_search(search, str(input_path), str(output_path), chunk_size=3)
+
+    assert summary == {"chunks": 4, "rows": 10, "resumed_chunks": 2}
+    assert searched == ["teacher 0", "teacher 3", "teacher 6", "teacher 9"]
+    results = pd.read_csv(output_path)
+    assert results["row"].tolist() == list(range(10))
+    assert results["title"].tolist() == [f"Teacher {i}" for i in range(10)]
+
+    # A run with different settings starts again
+    summary = bulk_search(
+        search, str(input_path), str(output_path), chunk_size=5, settings={"k": 1}
+    )
+    assert summary["resumed_chunks"] == 0
+    assert len(pd.read_csv(output_path)) == 10
+
+
+@pytest.mark.utils
+def test_parquet_needs_pyarrow(mocker, tmp_path):
+    """Test that Parquet files without pyarrow fail before the index is loaded."""
+    mocker.patch.object(
+        bulk_search_module.importlib.util, "find_spec", return_value=None
+    )
+    manager = mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.VectorStoreManager"
+    )
+
+    with pytest.raises(SystemExit, match="pip install pyarrow"):
+        main([str(tmp_path / "input.parquet"), str(tmp_path / "results.csv")])
+    manager.assert_not_called()
@@ -0,0 +1,177 @@
+"""Module that provides test functions for the search cache.
+
+Unit tests for text normalisation, the LRU/TTL cache and the search cache.
+"""
+
+import numpy as np
+import pytest
+
+from soc_classification_vector_store.utils.cache import (
+    LRUCache,
+    SearchCache,
+    normalise_text,
+)
+from soc_classification_vector_store.utils.vector_store import VectorStoreManager
+
+
+# ruff: noqa: PLR2004
+@pytest.mark.utils
+def test_normalise_text():
+    """Test that case, punctuation and whitespace are normalised."""
+    assert normalise_text("  Care-Assistant,  (NHS) ") == "care assistant nhs"
+    assert normalise_text(None) == ""
+
+
+@pytest.mark.utils
+def test_lru_cache_eviction_and_ttl(mocker):
+    """Test that the least recently used and expired entries are dropped."""
+    clock = mocker.patch("soc_classification_vector_store.utils.cache.time")
+    clock.monotonic.return_value = 0.0
+    cache = LRUCache(max_entries=2, ttl_seconds=10)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    clock.monotonic.return_value = 11.0
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "entries": 1,
+        "max_entries": 2,
+        "hits": 2,
+        "misses": 2,
+        "hit_rate": 0.5,
+    }
+
+
+@pytest.mark.utils
+def test_search_cache_encodes_only_misses():
+    """Test that the cached encoder only encodes texts it has not seen."""
+    cache = SearchCache(embedding_entries=10, result_entries=10, ttl_seconds=0)
+    encoded = []
+
+    def encode(texts):
+        encoded.append(texts)
+        return np.asarray([[len(text)] for text in texts], dtype=np.float32)
+
+    cached_encode = cache.cached_encoder(encode)
+    cached_encode(["teacher", "nurse"])
+    vectors = cached_encode(["nurse", "teacher", "cook"])
+
+    assert encoded == [["teacher", "nurse"], ["cook"]]
+    np.testing.assert_array_equal(vectors, [[5], [7], [4]])
+
+    # Texts are cached under their normalised text but encoded as given
+    vectors = cached_encode(["C++ Developer", "c developer"])
+    assert encoded[-1] == ["C++ Developer"]
+    np.testing.assert_array_equal(vectors, [[13], [13]])
+
+
+@pytest.mark.utils
+def test_search_cache_cleared_on_index_version_change():
+    """Test that a new index version invalidates both cache levels."""
+    cache = SearchCache(embedding_entries=10, result_entries=10, ttl_seconds=0)
+    cache.set_index_version("v1")
+    cache.embeddings.put("teacher", [1.0])
+    cache.results.put(("", "teacher", ""), [])
+
+    cache.set_index_version("v1")
+    assert cache.results.get(("", "teacher", "")) == []
+
+    cache.set_index_version("v2")
+    assert cache.embeddings.get("teacher") is None
+    assert cache.results.get(("", "teacher", "")) is None
+    assert cache.stats()["index_version"] == "v2"
+
+
+@pytest.mark.utils
+def test_manager_search_uses_result_cache(mocker):
+    """Test that equivalent queries are searched once through the cache."""
+    manager = VectorStoreManager()
+    manager.cache = SearchCache(embedding_entries=10, result_entries=10, ttl_seconds=0)
+    manager.embed = mocker.Mock()
+    search_batch = mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.search_index_multi_batch",
+        side_effect=lambda _backend, queries, encode, **_options: [
+            [{"q": q}] for q in queries
+        ],
+    )
+    mocker.patch.object(manager, "_check_ready")
+
+    first = manager.search(industry_descr="School", job_title="Teacher!")
+    second = manager.search(industry_descr="school", job_title=" teacher ")
+
+    assert first == second == [{"q": ["School", "Teacher!", ""]}]
+    search_batch.assert_called_once()
+    assert manager.cache_status()["results"]["hits"] == 1
+
+
+@pytest.mark.utils
+def test_cache_does_not_change_results(mocker):
+    """Test that punctuated queries get the same results with or without cache."""
+    manager = VectorStoreManager()
+    manager.embed = mocker.Mock()
+    manager.embed.search_index_multi.side_effect = lambda query: [{"q": query}]
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.search_index_multi_batch",
+        side_effect=lambda _backend, queries, encode, **_options: [
+            [{"q": q}] for q in queries
+        ],
+    )
+    mocker.patch.object(manager, "_check_ready")
+    query = {"industry_descr": "IT", "job_title": "C++ developer"}
+
+    uncached = manager.search(**query)
+    manager.cache = SearchCache(embedding_entries=10, result_entries=10, ttl_seconds=0)
+
+    assert manager.search(**query) == uncached == [{"q": ["IT", "C++ developer", ""]}]
+
+
+class SwappingSearchCache(SearchCache):
+    """Search cache running a callback when its generation is next read."""
+
+    def __init__(self, *args, **kwargs):
+        self.on_read = None
+        self._generation = 0
+        super().__init__(*args, **kwargs)
+
+    @property
+    def generation(self) -> int:
+        """The generation, read after running the callback, if any."""
+        callback, self.on_read = self.on_read, None
+        if callback is not None:
+            callback()
+        return self._generation
+
+    @generation.setter
+    def generation(self, value: int):
+        self._generation = value
+
+
+@pytest.mark.utils
+def test_swap_during_search_does_not_cache_old_results(mocker):
+    """Test that a search racing a reload never caches the old index's results."""
+    manager = VectorStoreManager()
+    manager.cache = SwappingSearchCache(
+        embedding_entries=10, result_entries=10, ttl_seconds=0
+    )
+    manager.embed = mocker.Mock(name="old")
+    new = mocker.Mock(name="new")
+    new.get_embed_config.return_value = {"index_version": "v2"}
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.search_index_multi_batch",
+        side_effect=lambda backend, queries, encode, **_options: [
+            [{"backend": backend}] for _query in queries
+        ],
+    )
+    mocker.patch.object(manager, "_check_ready")
+
+    # The reload swaps in the new index as the search starts
+    manager.cache.on_read = lambda: manager._swap(new)
+    manager.search(job_title="teacher")
+
+    assert manager.search(job_title="teacher") == [{"backend": new}]
@@ -0,0 +1,216 @@
+"""Module that provides test functions for the API clients.
+
+Unit tests for splitting searches into batch requests, retrying requests the
+service cannot serve yet, coalescing concurrent searches and waiting for the
+index to load.
+"""
+
+# ruff: noqa: PLR2004
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from soc_classification_vector_store.api.models.search_index_models import (
+    SearchIndexProjectedResponse,
+    SearchIndexResponse,
+)
+from soc_classification_vector_store.client import (
+    AsyncVectorStoreClient,
+    RetryPolicy,
+    VectorStoreClient,
+    retry_after_seconds,
+)
+
+BASE_URL = "http://vector-store/v1/soc-vector-store"
+
+
+def _query(job_title):
+    """Return the fields of a search request for a job title."""
+    return {"industry_descr": "school", "job_title": job_title, "job_description": ""}
+
+
+def _batch_handler(requests):
+    """Return a handler answering batch requests with each job title as a code."""
+
+    def handler(request):
+        requests.append(request)
+        queries = json.loads(request.content)["queries"]
+        results = [
+            {"results": [{"code": query["job_title"], "title": "", "distance": 0.0}]}
+            for query in queries
+        ]
+        return httpx.Response(200, json={"results": results})
+
+    return handler
+
+
+def _codes(responses):
+    """Return the code of the first result of each response."""
+    return [response.results[0].code for response in responses]
+
+
+@pytest.mark.utils
+def test_search_many_splits_batches():
+    """Test that queries are sent in batches and results keep their order."""
+    requests = []
+    titles = [f"title {i}" for i in range(5)]
+    with VectorStoreClient(
+        BASE_URL, batch_size=2, transport=httpx.MockTransport(_batch_handler(requests))
+    ) as client:
+        responses = client.search_many([_query(title) for title in titles])
+
+    assert _codes(responses) == titles
+    assert [len(json.loads(r.content)["queries"]) for r in requests] == [2, 2, 1]
+    assert all(r.url.path.endswith("/search-index/batch") for r in requests)
+    assert requests[0].headers["X-Request-Timeout-Ms"] == "30000"
+
+
+@pytest.mark.utils
+def test_search_with_fields_returns_projected_results():
+    """Test that results with only the requested fields are parsed."""
+
+    def handler(request):
+        if request.url.path.endswith("/batch"):
+            return httpx.Response(
+                200,
+                json={
+                    "results": [
+                        {"results": [{"title": "Teacher"}]},
+                        {"results": [{"distance": 0.1, "title": "", "code": "2314"}]},
+                    ]
+                },
+            )
+        return httpx.Response(200, json={"results": [{"title": "Teacher"}]})
+
+    with VectorStoreClient(BASE_URL, transport=httpx.MockTransport(handler)) as client:
+        response = client.search({**_query("teacher"), "fields": ["title"]})
+        projected, full = client.search_many(
+            [{**_query("teacher"), "fields": ["title"]}, _query("teacher")]
+        )
+
+    assert isinstance(response, SearchIndexProjectedResponse)
+    assert response.results[0].title == "Teacher"
+    assert response.results[0].code is None
+    assert isinstance(projected, SearchIndexProjectedResponse)
+    assert projected.results[0].title == "Teacher"
+    assert isinstance(full, SearchIndexResponse)
+    assert full.results[0].code == "2314"
+
+
+@pytest.mark.utils
+def test_retry_honours_retry_after(mocker):
+    """Test that a shed request is sent again after the time asked for."""
+    sleep = mocker.patch("soc_classification_vector_store.client.time.sleep")
+    answers = iter(
+        [
+            httpx.Response(429, headers={"Retry-After": "2"}),
+            httpx.Response(503, headers={"Retry-After": "1"}),
+            httpx.Response(200, json={"results": []}),
+        ]
+    )
+    client = VectorStoreClient(
+        BASE_URL,
+        retry=RetryPolicy(backoff_seconds=0.1),
+        transport=httpx.MockTransport(lambda request: next(answers)),
+    )
+
+    assert client.search(_query("teacher")).results == []
+    delays = [call.args[0] for call in sleep.call_args_list]
+    assert len(delays) == 2
+    assert 2 <= delays[0] <= 2.1
+    assert 1 <= delays[1] <= 1.1
+
+
+@pytest.mark.utils
+def test_retries_exhausted(mocker):
+    """Test that a request still failing after its retries raises."""
+    sleep = mocker.patch("soc_classification_vector_store.client.time.sleep")
+    client = VectorStoreClient(
+        BASE_URL,
+        retry=RetryPolicy(attempts=3),
+        transport=httpx.MockTransport(lambda request: httpx.Response(503)),
+    )
+
+    with pytest.raises(httpx.HTTPStatusError):
+        client.search(_query("teacher"))
+    assert sleep.call_count == 2
+
+    client = VectorStoreClient(
+        BASE_URL, transport=httpx.MockTransport(lambda request: httpx.Response(422))
+    )
+    with pytest.raises(httpx.HTTPStatusError):
+        client.search(_query("teacher"))
+    assert sleep.call_count == 2
+
+
+@pytest.mark.utils
+def test_retry_policy_delay():
+    """Test that the backoff is jittered, bounded and parsed from headers."""
+    retry = RetryPolicy(backoff_seconds=1, max_backoff_seconds=4)
+    delays = [retry.delay(attempt) for attempt in range(1, 10) for _ in range(20)]
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert len(set(delays)) > 1
+
+    assert retry_after_seconds(httpx.Response(503, headers={"Retry-After": "5"})) == 5
+    assert retry_after_seconds(httpx.Response(503)) is None
+    past = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert retry_after_seconds(httpx.Response(503, headers={"Retry-After": past})) == 0
+
+
+@pytest.mark.utils
+def test_async_searches_coalesce():
+    """Test that concurrent searches are sent as one batch request."""
+    requests = []
+    titles = [f"title {i}" for i in range(5)]
+
+    async def search():
+        async with AsyncVectorStoreClient(
+            BASE_URL,
+            max_wait_ms=50,
+            transport=httpx.MockTransport(_batch_handler(requests)),
+        ) as client:
+            searched = await asyncio.gather(
+                *(client.search(_query(title)) for title in titles)
+            )
+            many = await client.search_many([_query(title) for title in titles])
+        return searched, many
+
+    searched, many = asyncio.run(search())
+
+    assert _codes(searched) == titles
+    assert _codes(many) == titles
+    assert len(requests) == 2
+
+
+@pytest.mark.utils
+def test_wait_until_ready(mocker):
+    """Test that the client polls the status until the index is loaded."""
+    sleep = mocker.patch("soc_classification_vector_store.client.time.sleep")
+    answers = iter(
+        [
+            httpx.Response(
+                503, headers={"Retry-After": "3"}, json={"status": "loading"}
+            ),
+            httpx.Response(200, json={"status": "loading"}),
+            httpx.Response(200, json={"status": "ready"}),
+        ]
+    )
+    client = VectorStoreClient(
+        BASE_URL, transport=httpx.MockTransport(lambda request: next(answers))
+    )
+
+    assert client.wait_until_ready()["status"] == "ready"
+    assert sleep.call_count == 2
+    assert sleep.call_args_list[0].args[0] >= 3
+
+    client = VectorStoreClient(
+        BASE_URL,
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json={"status": "loading"})
+        ),
+    )
+    with pytest.raises(TimeoutError):
+        client.wait_until_ready(timeout=0)
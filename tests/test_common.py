@@ -5,7 +5,7 @@ Unit tests for endpoints and utility functions in the vector store.
 
 import pytest
 
-from soc_classification_vector_store.utils.common import safe_int
+from soc_classification_vector_store.utils.common import safe_bool, safe_float, safe_int
 
 
 # ruff: noqa: PLR2004
@@ -28,3 +28,23 @@ def test_safe_int_default():
     """Test safe_int with default value."""
     assert safe_int("invalid") == 0
     assert safe_int(None) == 0
+
+
+@pytest.mark.utils
+def test_safe_float():
+    """Test safe_float with valid and invalid input."""
+    assert safe_float("2.5") == 2.5
+    assert safe_float(3) == 3.0
+    assert safe_float("invalid", default=1.5) == 1.5
+    assert safe_float(None) == 0.0
+
+
+@pytest.mark.utils
+def test_safe_bool():
+    """Test safe_bool with environment variable style input."""
+    assert safe_bool("true") is True
+    assert safe_bool(" YES ") is True
+    assert safe_bool("0") is False
+    assert safe_bool("off", default=True) is False
+    assert safe_bool("maybe", default=True) is True
+    assert safe_bool(None) is False
@@ -0,0 +1,387 @@
+"""Module that provides test functions for the parallel index build.
+
+Unit tests for parsing the coding index and the chunked, resumable build.
+"""
+
+from importlib.resources import files
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from soc_classification_vector_store.utils.index_build import (
+    IndexBuildProgress,
+    build_index_embeddings,
+    update_index_embeddings,
+)
+from soc_classification_vector_store.utils.snapshot import (
+    load_snapshot,
+    read_manifest,
+    row_content_hash,
+    write_snapshot,
+)
+from soc_classification_vector_store.utils.soc_index import (
+    SOC_INDEX_SHEET,
+    check_document_parity,
+    load_soc_index,
+    read_soc_index,
+    read_soc_structure,
+    soc_index_documents,
+)
+from soc_classification_vector_store.utils.vector_store import (
+    SOC_INDEX_TUPLE,
+    SOC_STRUCTURE_TUPLE,
+    _build_index_snapshot,
+    build_vector_store_snapshot,
+)
+
+# Rows of the coding index in the fixture workbook of the parity test
+PARITY_FIXTURE_ROWS = 25
+
+BUILD_KEY = {"source_checksums": {"index.xlsx": "abc"}, "embedding_model_name": "m"}
+
+
+class LengthEncoder:
+    """Encoder embedding each text as its length, failing after some calls."""
+
+    def __init__(self, fail_after: int | None = None):
+        self.calls = 0
+        self.fail_after = fail_after
+        self.encoded: list[str] = []
+
+    def embed_documents(self, texts):
+        """Embed each text as its length."""
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise RuntimeError("Interrupted")
+        self.calls += 1
+        self.encoded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def length_encoder() -> LengthEncoder:
+    """Create a length encoder in a build worker process."""
+    return LengthEncoder()
+
+
+# ruff: noqa: PLR2004
+@pytest.mark.utils
+def test_soc_index_documents():
+    """Test that entries are titled in natural word order with qualifiers."""
+    frame = pd.DataFrame(
+        {
+            "SOC_2020": ["2494", "4111"],
+            "INDEXOCC_-_natural_word_order": ["Manager", "Civil servant"],
+            "ADD": ["", "museum service"],
+            "IND": ["advertising", ""],
+        }
+    )
+
+    texts, metadata = soc_index_documents(frame)
+
+    assert texts == ["Manager, advertising", "Civil servant, museum service"]
+    assert metadata == [
+        {"code": "2494", "title": "Manager, advertising"},
+        {"code": "4111", "title": "Civil servant, museum service"},
+    ]
+
+
+@pytest.mark.utils
+def test_parsed_soc_index_is_cached(tmp_path, mocker):
+    """Test that a workbook sheet is parsed once and then read from its cache."""
+    read_excel = mocker.patch(
+        "pandas.read_excel",
+        return_value=pd.DataFrame(
+            {
+                "SOC_2020": ["2494", "4111"],
+                "INDEXOCC_-_natural_word_order": ["Manager", "Civil servant"],
+                "ADD": [None, "museum service"],
+            }
+        ),
+    )
+
+    parsed = read_soc_index(SOC_INDEX_TUPLE, str(tmp_path))
+    cached = read_soc_index(SOC_INDEX_TUPLE, str(tmp_path))
+
+    assert read_excel.call_count == 1
+    pd.testing.assert_frame_equal(cached, parsed)
+    assert cached["ADD"].tolist() == ["", "museum service"]
+    (cache_file,) = tmp_path.iterdir()
+
+    # An unreadable cache, or a new workbook, is parsed again
+    cache_file.write_bytes(b"corrupt")
+    read_soc_index(SOC_INDEX_TUPLE, str(tmp_path))
+    mocker.patch(
+        "soc_classification_vector_store.utils.soc_index.file_checksum",
+        return_value="0" * 64,
+    )
+    read_soc_index(SOC_INDEX_TUPLE, str(tmp_path))
+    assert read_excel.call_count == 3
+    assert len(list(tmp_path.iterdir())) == 2
+
+    # The structure workbook is cached in its own file
+    read_soc_structure(SOC_STRUCTURE_TUPLE, str(tmp_path))
+    read_soc_structure(SOC_STRUCTURE_TUPLE, str(tmp_path))
+    assert read_excel.call_count == 4
+    assert len(list(tmp_path.glob("soc_structure_*.npz"))) == 1
+
+
+@pytest.mark.utils
+def test_document_parity_check():
+    """Test that parsed documents must be exactly the handler's."""
+    texts = [f"title {i}" for i in range(10)]
+    metadata = [{"code": f"{i:04d}", "title": text} for i, text in enumerate(texts)]
+    hashes = [row_content_hash(text, row) for text, row in zip(texts, metadata)]
+
+    check_document_parity(reversed(hashes), hashes)
+    for parsed in (hashes[:9] + ["changed"], hashes[:9], hashes + hashes[:1]):
+        with pytest.raises(ValueError, match="differ from the upstream format"):
+            check_document_parity(parsed, hashes)
+
+
+@pytest.mark.utils
+def test_build_checks_documents_against_embedding_handler(tmp_path, mocker):
+    """Test that parsed documents are checked once per upstream version.
+
+    Assertions:
+    - The first build embeds the index with the handler, checks the parsed
+      documents against its documents and writes its index
+    - A later build parses the index and embeds only changed rows
+    - A new upstream version is checked again, and a mismatch stops the build
+      without publishing a snapshot
+    """
+    module = "soc_classification_vector_store.utils.vector_store"
+    mocker.patch(f"{module}.SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    mocker.patch(f"{module}.INDEX_BUILD_CHECKPOINT_DIR", str(tmp_path / "build"))
+    mocker.patch(f"{module}.source_checksums", return_value={"index.xlsx": "abc"})
+    parity_key = mocker.patch(f"{module}.document_parity_key", return_value="v1")
+    encoder = LengthEncoder()
+    mocker.patch(f"{module}._index_encoder_factory", return_value=lambda: encoder)
+    texts = ["teacher", "nurse", "cook"]
+    metadata = [{"code": str(i), "title": text} for i, text in enumerate(texts)]
+    load_index = mocker.patch(
+        f"{module}.load_soc_index", return_value=(texts, metadata)
+    )
+    embed = mocker.Mock()
+    embed.get_embed_config.return_value = {"embedding_model_name": "m"}
+    embed.vector_store.get.return_value = {
+        "documents": texts,
+        "metadatas": metadata,
+        "embeddings": np.ones((3, 2), dtype=np.float32),
+    }
+
+    manifest = _build_index_snapshot(embed)
+    assert embed.embed_index.call_count == 1
+    assert manifest["document_source"] == "embedding_handler"
+    assert manifest["document_parity"] == "v1"
+    assert encoder.encoded == []
+
+    load_index.return_value = (["teacher", "staff nurse", "cook"], metadata)
+    manifest = _build_index_snapshot(embed)
+    assert embed.embed_index.call_count == 1
+    assert manifest["document_parity"] == "v1"
+    assert encoder.encoded == ["staff nurse"]
+
+    parity_key.return_value = "v2"
+    with pytest.raises(ValueError, match="differ from the upstream format"):
+        _build_index_snapshot(embed)
+    assert embed.embed_index.call_count == 2
+    assert read_manifest(str(tmp_path / "snapshot")) == manifest
+
+
+@pytest.mark.utils
+def test_documents_match_embedding_handler(tmp_path, monkeypatch):
+    """Test that the parsed documents are those `embed_index` embeds.
+
+    The first rows of the packaged coding index are embedded by the upstream
+    handler and parsed by `load_soc_index`, and both must give the same texts
+    and metadata.
+    """
+    pytest.importorskip("sentence_transformers")
+    embedding = pytest.importorskip("occupational_classification_utils.embed.embedding")
+
+    package = tmp_path / "parity_fixture"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    package_ref, name = SOC_INDEX_TUPLE
+    with pd.ExcelWriter(package / name) as writer:
+        for sheet, frame in pd.read_excel(
+            files(package_ref).joinpath(name), sheet_name=None, dtype=str
+        ).items():
+            rows = PARITY_FIXTURE_ROWS if sheet == SOC_INDEX_SHEET else len(frame)
+            frame.head(rows).to_excel(writer, sheet_name=sheet, index=False)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    fixture = ("parity_fixture", name)
+
+    embed = embedding.EmbeddingHandler(db_dir=str(tmp_path / "db"))
+    embed.embed_index(
+        from_empty=True, soc_index_file=fixture, soc_structure_file=SOC_STRUCTURE_TUPLE
+    )
+    documents = embed.vector_store.get(include=["metadatas", "documents"])
+    texts, metadata = load_soc_index(fixture)
+
+    def sorted_hashes(texts, metadata):
+        return sorted(
+            row_content_hash(text, row)
+            for text, row in zip(texts, metadata, strict=True)
+        )
+
+    assert sorted_hashes(texts, metadata) == sorted_hashes(
+        documents["documents"], documents["metadatas"]
+    )
+
+
+@pytest.mark.utils
+def test_build_resumes_from_checkpoints(tmp_path):
+    """Test that an interrupted build only encodes the remaining chunks."""
+    texts = [f"text {'x' * i}" for i in range(10)]
+    interrupted = LengthEncoder(fail_after=2)
+
+    with pytest.raises(RuntimeError):
+        build_index_embeddings(
+            texts,
+            str(tmp_path),
+            build_key=BUILD_KEY,
+            encoder_factory=lambda: interrupted,
+            chunk_size=3,
+        )
+
+    resumed = LengthEncoder()
+    progress = IndexBuildProgress()
+    embeddings = build_index_embeddings(
+        texts,
+        str(tmp_path),
+        build_key=BUILD_KEY,
+        encoder_factory=lambda: resumed,
+        chunk_size=3,
+        progress=progress,
+    )
+
+    assert resumed.calls == 2
+    np.testing.assert_array_equal(embeddings[:, 0], [len(text) for text in texts])
+    stats = progress.stats()
+    assert stats["state"] == "complete"
+    assert (stats["rows_embedded"], stats["total_rows"]) == (10, 10)
+    assert (stats["chunks_completed"], stats["total_chunks"]) == (4, 4)
+    assert stats["eta_seconds"] == 0.0
+
+
+@pytest.mark.utils
+def test_build_discards_checkpoints_of_another_build(tmp_path):
+    """Test that checkpoints from different sources or models are not reused."""
+    texts = ["a", "bb", "ccc"]
+    build_index_embeddings(
+        texts, str(tmp_path), build_key=BUILD_KEY, encoder_factory=LengthEncoder
+    )
+
+    encoder = LengthEncoder()
+    build_index_embeddings(
+        texts,
+        str(tmp_path),
+        build_key=BUILD_KEY | {"embedding_model_name": "other"},
+        encoder_factory=lambda: encoder,
+    )
+
+    assert encoder.calls == 1
+
+
+@pytest.mark.utils
+def test_build_with_worker_processes(tmp_path):
+    """Test that chunks encoded by worker processes are assembled in order."""
+    texts = [f"{'y' * i}" for i in range(1, 8)]
+
+    embeddings = build_index_embeddings(
+        texts,
+        str(tmp_path),
+        build_key=BUILD_KEY,
+        encoder_factory=length_encoder,
+        workers=2,
+        chunk_size=2,
+    )
+
+    np.testing.assert_array_equal(embeddings[:, 0], range(1, 8))
+    assert IndexBuildProgress().stats() is None
+
+
+@pytest.mark.utils
+def test_incremental_update_embeds_only_changed_rows(tmp_path):
+    """Test that unchanged rows reuse the embeddings of the previous snapshot."""
+    old_texts = ["teacher", "nurse", "cook", "baker"]
+    old_metadata = [{"code": str(i), "title": text} for i, text in enumerate(old_texts)]
+    old_hashes = [
+        row_content_hash(text, row)
+        for text, row in zip(old_texts, old_metadata, strict=True)
+    ]
+    old_embeddings = np.arange(8, dtype=np.float32).reshape(4, 2) + 100
+    write_snapshot(
+        str(tmp_path / "snapshot"),
+        embeddings=old_embeddings,
+        metadata=old_metadata,
+        embedding_model_name="m",
+        checksums={"index.xlsx": "old"},
+        row_hashes=old_hashes,
+    )
+    previous = load_snapshot(str(tmp_path / "snapshot"), checksums=None)
+
+    # "nurse" is edited, "cook" is deleted and "chef" is added
+    new_rows = [("teacher", "0"), ("nurse", "9"), ("baker", "3"), ("chef", "4")]
+    texts = [text for text, _code in new_rows]
+    hashes = [
+        row_content_hash(text, {"code": code, "title": text}) for text, code in new_rows
+    ]
+    encoder = LengthEncoder()
+
+    embeddings, changes = update_index_embeddings(
+        texts,
+        hashes,
+        previous,
+        checkpoint_dir=str(tmp_path / "build"),
+        build_key=BUILD_KEY,
+        encoder_factory=lambda: encoder,
+    )
+
+    assert encoder.encoded == ["nurse", "chef"]
+    np.testing.assert_array_equal(embeddings[0], old_embeddings[0])
+    np.testing.assert_array_equal(embeddings[2], old_embeddings[3])
+    np.testing.assert_array_equal(embeddings[[1, 3], 0], [5, 4])
+    assert changes == {
+        "previous_index_version": previous.index_version,
+        "reused_rows": 2,
+        "embedded_rows": 2,
+        "removed_rows": 2,
+    }
+
+
+@pytest.mark.utils
+def test_default_build_embeds_only_changed_rows(tmp_path, mocker):
+    """Test that a rebuild with the default settings reuses unchanged rows.
+
+    Changed rows are embedded in this process by the handler's model.
+    """
+    module = "soc_classification_vector_store.utils.vector_store"
+    mocker.patch(f"{module}.SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    mocker.patch(f"{module}.INDEX_BUILD_CHECKPOINT_DIR", str(tmp_path / "build"))
+    mocker.patch(f"{module}.document_parity_key", return_value="v1")
+    checksums = mocker.patch(f"{module}.source_checksums")
+    load_index = mocker.patch(f"{module}.load_soc_index")
+    encoder = LengthEncoder()
+    embed = mocker.Mock(embeddings=encoder)
+    embed.get_embed_config.return_value = {"embedding_model_name": "m"}
+    mocker.patch(f"{module}.create_embedding_handler", return_value=embed)
+
+    for version, texts in (
+        ("old", ["teacher", "nurse", "cook"]),
+        ("new", ["teacher", "staff nurse", "cook"]),
+    ):
+        checksums.return_value = {"index.xlsx": version}
+        metadata = [{"code": str(i), "title": text} for i, text in enumerate(texts)]
+        load_index.return_value = (texts, metadata)
+        embed.vector_store.get.return_value = {
+            "documents": texts,
+            "metadatas": metadata,
+            "embeddings": np.ones((len(texts), 2), dtype=np.float32),
+        }
+        manifest = build_vector_store_snapshot()
+
+    embed.embed_index.assert_called_once()
+    assert encoder.encoded == ["staff nurse"]
+    assert manifest["changes"]["reused_rows"] == 2
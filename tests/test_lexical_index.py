@@ -0,0 +1,115 @@
+"""Module that provides test functions for exact title matching.
+
+Unit tests for the lexical index of the coding index and its use by the
+vector store manager.
+"""
+
+# ruff: noqa: PLR2004
+
+import pandas as pd
+import pytest
+
+from soc_classification_vector_store.utils.lexical_index import (
+    LexicalIndex,
+    merge_exact_hits,
+)
+from soc_classification_vector_store.utils.metrics import EXACT_MATCH_LOOKUPS
+from soc_classification_vector_store.utils.search_options import SearchOptions
+from soc_classification_vector_store.utils.vector_store import VectorStoreManager
+
+
+def _lexical_index() -> LexicalIndex:
+    """Create a lexical index of a few coding index entries."""
+    frame = pd.DataFrame(
+        {
+            "SOC_2020": ["2314", "2315", "3213", "3213"],
+            "INDEXOCC_-_natural_word_order": [
+                "Teacher",
+                "Teacher",
+                "Paramedic",
+                "Paramedic",
+            ],
+            "ADD": ["secondary school", "primary school", "", ""],
+            "IND": ["", "", "", "ambulance service"],
+        }
+    )
+    return LexicalIndex.from_frame(frame)
+
+
+@pytest.mark.utils
+def test_lexical_index_lookup():
+    """Test that job titles are matched to coding index entries exactly."""
+    lexical_index = _lexical_index()
+
+    hits = lexical_index.lookup("", "TEACHER")
+    assert [hit["code"] for hit in hits] == ["2314", "2315"]
+    assert all(hit["distance"] == 0.0 for hit in hits)
+
+    # The industry qualifier picks out its entry
+    hits = lexical_index.lookup("Primary school", "teacher")
+    assert [(hit["code"], hit["title"]) for hit in hits] == [
+        ("2315", "Teacher, primary school")
+    ]
+
+    # An unknown industry falls back to the title, one entry per code
+    assert [hit["code"] for hit in lexical_index.lookup("hospital", "paramedic")] == [
+        "3213"
+    ]
+    assert not lexical_index.lookup("", "nurse")
+
+
+@pytest.mark.utils
+def test_merge_exact_hits():
+    """Test that exact matches come first without repeating search results."""
+    hits = [{"distance": 0.0, "code": "2314", "title": "Teacher"}]
+    matches = [
+        {"distance": 0.1, "code": "2314", "title": "Teacher"},
+        {"distance": 0.2, "code": "2314", "title": "Tutor"},
+        {"distance": 0.3, "code": "2315", "title": "Teacher, primary school"},
+    ]
+
+    assert merge_exact_hits(hits, matches, None, False) == [hits[0], *matches[1:]]
+    assert merge_exact_hits(hits, matches, 2, False) == [hits[0], matches[1]]
+    assert merge_exact_hits(hits, matches, None, True) == [hits[0], matches[2]]
+
+
+@pytest.mark.utils
+def test_search_exact_match_modes(mocker):
+    """Test that exact matches are returned directly or merged by the manager."""
+    manager = VectorStoreManager()
+    manager.cache = None
+    manager.lexical_index = _lexical_index()
+    mocker.patch.object(manager.ready_event, "is_set", return_value=True)
+    search = mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.search_index_multi_batch",
+        return_value=[[{"distance": 0.2, "code": "2319", "title": "Tutor"}]],
+    )
+    manager.embed = mocker.Mock()
+    hits_before = EXACT_MATCH_LOOKUPS.value(result="hit")
+
+    results = manager.search(
+        job_title="teacher", options=SearchOptions.create(exact_match="direct", k=1)
+    )
+    assert results == [
+        {"distance": 0.0, "code": "2314", "title": "Teacher, secondary school"}
+    ]
+    search.assert_not_called()
+
+    results = manager.search(
+        industry_descr="secondary school",
+        job_title="teacher",
+        options=SearchOptions.create(exact_match="merge"),
+    )
+    assert [result["code"] for result in results] == ["2314", "2319"]
+
+    # Queries without an exact match are searched
+    results = manager.search(
+        job_title="tutor", options=SearchOptions.create(exact_match="direct")
+    )
+    assert results == [{"distance": 0.2, "code": "2319", "title": "Tutor"}]
+    assert search.call_count == 2
+    assert EXACT_MATCH_LOOKUPS.value(result="hit") == hits_before + 2
+
+    # Exact matching is off by default
+    manager.search(job_title="teacher", options=SearchOptions.create(k=1))
+    assert search.call_count == 3
@@ -15,6 +15,8 @@ Dependencies:
     - http.HTTPStatus: Provides standard HTTP status codes for assertions.
 """
 
+import asyncio
+import json
 import time
 from http import HTTPStatus
 
@@ -22,6 +24,17 @@ import pytest
 from fastapi.testclient import TestClient
 
 from soc_classification_vector_store.api.main import app
+from soc_classification_vector_store.api.routes.v1.search_index import _stream_ndjson
+from soc_classification_vector_store.utils.executor import (
+    SearchDeadlineExceededError,
+    SearchQueueFullError,
+    SearchRejectedError,
+)
+from soc_classification_vector_store.utils.metrics import (
+    REQUESTS_IN_FLIGHT,
+    start_request,
+)
+from soc_classification_vector_store.utils.vector_store import vector_store_manager
 
 client = TestClient(app)  # Create a test client for your FastAPI app
 
@@ -136,3 +149,289 @@ def test_search_index():
         assert response.status_code in (HTTPStatus.OK, HTTPStatus.SERVICE_UNAVAILABLE)
         if response.status_code == HTTPStatus.SERVICE_UNAVAILABLE:
             assert response.json()["detail"].startswith("Vector store error:")
+
+
+@pytest.mark.api
+def test_major_groups_search_index(mocker):
+    """Test `/v1/soc-vector-store/search-index` restricted to major groups.
+
+    Assertions:
+    - The major groups are passed to the search as search options
+    - Major groups other than the digits 1 to 9 are rejected
+    """
+    mocker.patch.object(vector_store_manager, "_check_ready")
+    search = mocker.patch.object(
+        vector_store_manager,
+        "search",
+        return_value=[{"distance": 0.1, "title": "Teacher", "code": "2314"}],
+    )
+    payload = {
+        "industry_descr": "school",
+        "job_title": "teacher",
+        "job_description": "",
+        "major_groups": ["2", "3"],
+    }
+
+    response = client.post("/v1/soc-vector-store/search-index", json=payload)
+
+    assert response.status_code == HTTPStatus.OK
+    options = search.call_args.kwargs["options"]
+    assert options.major_groups == frozenset({"2", "3"})
+
+    payload["major_groups"] = ["0"]
+    response = client.post("/v1/soc-vector-store/search-index", json=payload)
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.api
+def test_result_shaping_search_index(mocker):
+    """Test `/v1/soc-vector-store/search-index` with result shaping parameters.
+
+    Assertions:
+    - The number of results, distance limit and code collapsing are passed to
+      the search as search options
+    - Only the requested fields of each result are returned
+    """
+    mocker.patch.object(vector_store_manager, "_check_ready")
+    search = mocker.patch.object(
+        vector_store_manager,
+        "search",
+        return_value=[{"distance": 0.1, "code": "2314"}],
+    )
+    payload = {
+        "industry_descr": "school",
+        "job_title": "teacher",
+        "job_description": "",
+        "k": 1,
+        "max_distance": 0.5,
+        "unique_codes": True,
+        "fields": ["code"],
+    }
+
+    response = client.post("/v1/soc-vector-store/search-index", json=payload)
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {"results": [{"code": "2314"}]}
+    options = search.call_args.kwargs["options"]
+    assert (options.k, options.max_distance, options.unique_codes) == (1, 0.5, True)
+
+    payload["k"] = 0
+    response = client.post("/v1/soc-vector-store/search-index", json=payload)
+    assert response.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.api
+def test_projected_results_in_openapi_schema():
+    """Test that the OpenAPI schema allows results with only some fields."""
+    schema = client.get("/openapi.json").json()
+    schemas = schema["components"]["schemas"]
+    responses = schema["paths"]["/v1/soc-vector-store/search-index"]["post"][
+        "responses"
+    ]
+
+    assert "required" not in schemas["SearchIndexProjectedItem"]
+    assert {"$ref": "#/components/schemas/SearchIndexProjectedResponse"} in responses[
+        "200"
+    ]["content"]["application/json"]["schema"]["anyOf"]
+
+
+@pytest.mark.api
+def test_search_index_batch(mocker):
+    """Test `/v1/soc-vector-store/search-index/batch` returns results in order.
+
+    Assertions:
+    - The response status code is 200
+    - There is one result list per query, in the same order as the queries
+    """
+    mocker.patch.object(vector_store_manager, "_check_ready")
+    mocker.patch.object(
+        vector_store_manager,
+        "search_batch",
+        side_effect=lambda queries, _options=None: [
+            [{"distance": 0.1, "title": query[1], "code": "1234"}] for query in queries
+        ],
+    )
+    payload = {
+        "queries": [
+            {"industry_descr": "school", "job_title": title, "job_description": ""}
+            for title in ("teacher", "cleaner", "caretaker")
+        ]
+    }
+
+    response = client.post("/v1/soc-vector-store/search-index/batch", json=payload)
+
+    assert response.status_code == HTTPStatus.OK
+    titles = [result["results"][0]["title"] for result in response.json()["results"]]
+    assert titles == ["teacher", "cleaner", "caretaker"]
+
+
+@pytest.mark.api
+def test_search_index_batch_ndjson(mocker):
+    """Test `/v1/soc-vector-store/search-index/batch` streams NDJSON when accepted.
+
+    Assertions:
+    - The response status code is 200 with an NDJSON content type
+    - Each line holds the results for one query, in order
+    - NDJSON refused with a quality of 0 is not streamed
+    """
+    mocker.patch.object(vector_store_manager, "_check_ready")
+    mocker.patch.object(
+        vector_store_manager,
+        "search_batch",
+        side_effect=lambda queries, _options=None: [
+            [{"distance": 0.1, "title": query[1], "code": "1234"}] for query in queries
+        ],
+    )
+    payload = {
+        "queries": [
+            {"industry_descr": "", "job_title": str(i), "job_description": ""}
+            for i in range(5)
+        ]
+    }
+
+    response = client.post(
+        "/v1/soc-vector-store/search-index/batch",
+        json=payload,
+        headers={"Accept": "application/x-ndjson"},
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["results"][0]["title"] for line in lines] == [str(i) for i in range(5)]
+
+    # NDJSON is only streamed when it is preferred
+    response = client.post(
+        "/v1/soc-vector-store/search-index/batch",
+        json=payload,
+        headers={"Accept": "application/x-ndjson;q=0, application/json"},
+    )
+
+    assert response.headers["content-type"].startswith("application/json")
+    assert len(response.json()["results"]) == len(payload["queries"])
+
+
+@pytest.mark.api
+def test_ndjson_stream_releases_search_when_cut_short():
+    """Test that a stream the client stops reading closes its batch search.
+
+    Assertions:
+    - The remaining chunks are closed, releasing their admission slot
+    - The request is no longer counted in flight once the stream ends
+    """
+    closed = []
+
+    async def chunks():
+        try:
+            for i in range(3):
+                yield [[{"distance": 0.1, "title": str(i), "code": "1234"}]]
+        finally:
+            closed.append(True)
+
+    async def read_first_line():
+        remaining = chunks()
+        await remaining.__anext__()
+        stream = _stream_ndjson(
+            [[]], remaining, [None] * 4, start_request("search_index_batch")
+        )
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    in_flight = REQUESTS_IN_FLIGHT.value(endpoint="search_index_batch")
+
+    assert asyncio.run(read_first_line()) == b'{"results":[]}\n'
+    assert closed == [True]
+    assert REQUESTS_IN_FLIGHT.value(endpoint="search_index_batch") == in_flight
+
+
+@pytest.mark.api
+def test_search_index_batch_not_ready():
+    """Test `/v1/soc-vector-store/search-index/batch` returns 503 when not ready."""
+    payload = {
+        "queries": [
+            {"industry_descr": "", "job_title": "teacher", "job_description": ""}
+        ]
+    }
+
+    response = client.post("/v1/soc-vector-store/search-index/batch", json=payload)
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+@pytest.mark.api
+def test_overload_responses(mocker):
+    """Test the responses to searches the service could not serve.
+
+    Assertions:
+    - Requests rejected by admission control get a 429 with `Retry-After`
+    - Requests finding the search queue full get a 503 with `Retry-After`
+    - Requests whose deadline passes get a 504, and the header sets the deadline
+    """
+    mocker.patch.object(vector_store_manager, "_check_ready")
+    asearch = mocker.patch.object(vector_store_manager, "asearch")
+    payload = {"industry_descr": "", "job_title": "teacher", "job_description": ""}
+
+    asearch.side_effect = SearchRejectedError("Too many search requests in flight")
+    response = client.post("/v1/soc-vector-store/search-index", json=payload)
+    assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) >= 0
+
+    asearch.side_effect = SearchQueueFullError("Search queue is full")
+    response = client.post("/v1/soc-vector-store/search-index", json=payload)
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert "Retry-After" in response.headers
+
+    asearch.side_effect = SearchDeadlineExceededError("Search deadline exceeded")
+    before = time.monotonic()
+    response = client.post(
+        "/v1/soc-vector-store/search-index",
+        json=payload,
+        headers={"X-Request-Timeout-Ms": "250"},
+    )
+    assert response.status_code == HTTPStatus.GATEWAY_TIMEOUT
+    deadline = asearch.call_args.kwargs["deadline"]
+    assert before + 0.25 <= deadline <= time.monotonic() + 0.25
+
+
+@pytest.mark.api
+def test_result_shaping_batch(mocker):
+    """Test `/v1/soc-vector-store/search-index/batch` returns the fields of each query.
+
+    Assertions:
+    - Queries with `fields` get only those fields, others get every field
+    - The fields are applied when streaming NDJSON too
+    """
+    mocker.patch.object(vector_store_manager, "_check_ready")
+    mocker.patch.object(
+        vector_store_manager,
+        "search_batch",
+        side_effect=lambda queries, _options=None: [
+            [{"distance": 0.1, "title": query[1], "code": "1234"}] for query in queries
+        ],
+    )
+    payload = {
+        "queries": [
+            {"industry_descr": "", "job_title": "a", "job_description": ""},
+            {
+                "industry_descr": "",
+                "job_title": "b",
+                "job_description": "",
+                "fields": ["title"],
+            },
+        ]
+    }
+    expected = [
+        {"results": [{"distance": 0.1, "title": "a", "code": "1234"}]},
+        {"results": [{"title": "b"}]},
+    ]
+
+    response = client.post("/v1/soc-vector-store/search-index/batch", json=payload)
+    streamed = client.post(
+        "/v1/soc-vector-store/search-index/batch",
+        json=payload,
+        headers={"Accept": "application/x-ndjson"},
+    )
+
+    assert response.json()["results"] == expected
+    assert [json.loads(line) for line in streamed.text.splitlines()] == expected
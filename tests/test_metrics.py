@@ -0,0 +1,158 @@
+"""Module that provides test functions for the service metrics.
+
+Unit tests for the metrics registry, stage timings and the metrics endpoint.
+"""
+
+from http import HTTPStatus
+
+import pytest
+from fastapi.testclient import TestClient
+
+from soc_classification_vector_store.api.main import app
+from soc_classification_vector_store.utils.batching import SearchBatcher
+from soc_classification_vector_store.utils.executor import BoundedSearchExecutor
+from soc_classification_vector_store.utils.metrics import (
+    Counter,
+    Histogram,
+    server_timing,
+    stage_timings,
+    timed_stage,
+)
+from soc_classification_vector_store.utils.vector_store import vector_store_manager
+
+client = TestClient(app)
+
+
+# ruff: noqa: PLR2004
+@pytest.mark.utils
+def test_histogram_renders_cumulative_buckets():
+    """Test that histogram buckets are cumulative with a sum and count."""
+    histogram = Histogram("test_seconds", "Test histogram.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value, stage="encode")
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{stage="encode",le="0.1"} 1.0' in lines
+    assert 'test_seconds_bucket{stage="encode",le="1.0"} 3.0' in lines
+    assert 'test_seconds_bucket{stage="encode",le="+Inf"} 4.0' in lines
+    assert 'test_seconds_sum{stage="encode"} 6.25' in lines
+    assert histogram.count(stage="encode") == 4
+
+
+@pytest.mark.utils
+def test_counter_escapes_label_values():
+    """Test that label values are escaped in the text format."""
+    counter = Counter("test_total", "Test counter.")
+    counter.inc(reason='say "hi"')
+    counter.inc(2, reason='say "hi"')
+
+    assert counter.render()[-1] == 'test_total{reason="say \\"hi\\""} 3.0'
+
+
+@pytest.mark.utils
+def test_stage_timings_cross_the_search_executor():
+    """Test that stages timed on a worker thread are recorded for the caller."""
+    executor = BoundedSearchExecutor(max_workers=1, queue_size=0)
+
+    def search():
+        with timed_stage("search"):
+            return "done"
+
+    with stage_timings() as timings:
+        assert executor.submit(search).result() == "done"
+
+    assert set(timings) == {"queue", "search"}
+    assert server_timing({"search": 0.0015}) == "search;dur=1.500"
+    executor.shutdown()
+
+
+@pytest.mark.utils
+def test_batched_stage_timings_recorded_per_request():
+    """Test that each batched request gets the stage timings of its batch."""
+    executor = BoundedSearchExecutor(max_workers=1, queue_size=4)
+
+    def search_batch(queries, options=None):
+        with timed_stage("encode"):
+            return [query[0] for query in queries]
+
+    batcher = SearchBatcher(search_batch, executor, max_batch_size=2, max_wait_ms=50)
+    with stage_timings() as first_timings:
+        first = batcher.submit(["a"])
+    with stage_timings() as second_timings:
+        second = batcher.submit(["b"])
+
+    assert (first.result(timeout=5), second.result(timeout=5)) == ("a", "b")
+    assert set(first_timings) == set(second_timings) == {"queue", "encode"}
+    assert first_timings["encode"] == second_timings["encode"]
+    executor.shutdown()
+
+
+@pytest.mark.api
+def test_search_index_server_timing_and_metrics(mocker):
+    """Test `/v1/soc-vector-store/search-index` timings and the metrics endpoint.
+
+    Assertions:
+    - The search response has a Server-Timing header with each stage
+    - The metrics endpoint returns the stage histogram in the text format
+    """
+    mocker.patch.object(vector_store_manager, "_check_ready")
+    mocker.patch.object(vector_store_manager, "embed", mocker.Mock())
+    vector_store_manager.embed.search_index_multi.return_value = [
+        {"distance": 0.1, "title": "Teacher", "code": "2314"}
+    ]
+
+    response = client.post(
+        "/v1/soc-vector-store/search-index",
+        json={
+            "industry_descr": "school",
+            "job_title": "teacher",
+            "job_description": "",
+        },
+    )
+
+    assert response.status_code == HTTPStatus.OK
+    assert response.json()["results"][0]["code"] == "2314"
+    stages = [
+        timing.split(";")[0] for timing in response.headers["server-timing"].split(", ")
+    ]
+    assert stages == ["queue", "serialise"]
+
+    metrics = client.get("/v1/soc-vector-store/metrics")
+
+    assert metrics.status_code == HTTPStatus.OK
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'vector_store_search_stage_seconds_count{stage="serialise"}' in metrics.text
+    assert "vector_store_requests_in_flight" in metrics.text
+
+
+@pytest.mark.api
+def test_unavailable_responses_counted():
+    """Test that a search while the vector store is loading is counted."""
+    payload = {"industry_descr": "", "job_title": "teacher", "job_description": ""}
+
+    response = client.post("/v1/soc-vector-store/search-index", json=payload)
+    metrics = client.get("/v1/soc-vector-store/metrics")
+
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert 'vector_store_unavailable_responses_total{reason="loading"}' in metrics.text
+
+
+@pytest.mark.api
+def test_ready_gauge_matches_readiness(mocker):
+    """Test that the ready gauge is the signal the readiness probe uses.
+
+    The load event alone is not enough, an index must also be loaded.
+    """
+    mocker.patch.object(vector_store_manager.ready_event, "is_set", return_value=True)
+    mocker.patch.object(vector_store_manager, "embed", None)
+
+    metrics = client.get("/v1/soc-vector-store/metrics")
+
+    assert "vector_store_ready 0" in metrics.text
+
+    mocker.patch.object(vector_store_manager, "embed", mocker.Mock())
+
+    metrics = client.get("/v1/soc-vector-store/metrics")
+
+    assert "vector_store_ready 1" in metrics.text
@@ -0,0 +1,105 @@
+"""Module that provides test functions for the query encoders.
+
+Unit tests for encoding texts in batches of similar length and for refusing
+an index built with a different encoder than the one encoding queries.
+"""
+
+# ruff: noqa: PLR2004
+
+import sys
+
+import numpy as np
+import pytest
+
+from soc_classification_vector_store.utils.query_encoder import (
+    QUERY_ENCODER_CPU_INT8,
+    QuantisedEncoder,
+    create_query_encoder,
+)
+from soc_classification_vector_store.utils.search_backend import ExactSearchBackend
+from soc_classification_vector_store.utils.snapshot import load_snapshot, write_snapshot
+
+
+def _quantised_encoder(mocker, batch_size=2):
+    """Create a quantised encoder whose model encodes each text as its length."""
+    mocker.patch.object(QuantisedEncoder, "_load", return_value=None)
+    encoder = QuantisedEncoder("test-model", batch_size=batch_size)
+    batches = []
+
+    def encode_batch(texts):
+        batches.append(texts)
+        return np.asarray([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+    mocker.patch.object(encoder, "_encode_batch", side_effect=encode_batch)
+    return encoder, batches
+
+
+@pytest.mark.utils
+def test_quantised_encoder_batches_by_length(mocker):
+    """Test that texts are batched by length and returned in the order given."""
+    encoder, batches = _quantised_encoder(mocker)
+    texts = ["secondary school teacher", "nurse", "paramedic", "it", "chef"]
+
+    embeddings = encoder.embed_documents(texts)
+
+    assert batches == [["it", "chef"], ["nurse", "paramedic"], [texts[0]]]
+    assert embeddings.dtype == np.float32
+    assert embeddings[:, 0].tolist() == [len(text) for text in texts]
+    assert encoder.embed_documents([]).shape == (0, 0)
+
+
+@pytest.mark.utils
+def test_create_query_encoder(mocker):
+    """Test that the default encoder is the embedding model of the handler."""
+    mocker.patch.object(QuantisedEncoder, "_load", return_value=None)
+    embed = mocker.Mock()
+    embed.get_embed_config.return_value = {"embedding_model_name": "test-model"}
+
+    assert create_query_encoder("default", embed) is None
+    encoder = create_query_encoder(QUERY_ENCODER_CPU_INT8, embed, threads=2)
+    assert (encoder.model_name, encoder.threads) == ("test-model", 2)
+    with pytest.raises(ValueError, match="Unknown query encoder"):
+        create_query_encoder("gpu", embed)
+
+
+@pytest.mark.utils
+@pytest.mark.parametrize(("threads", "calls"), [(0, []), (-1, []), (2, [2])])
+def test_quantised_encoder_threads(mocker, threads, calls):
+    """Test that the process-wide torch threads are only set when configured."""
+    torch = mocker.Mock()
+    mocker.patch.dict(
+        sys.modules, {"torch": torch, "sentence_transformers": mocker.Mock()}
+    )
+
+    QuantisedEncoder("test-model", threads=threads)
+
+    assert [call.args[0] for call in torch.set_num_threads.call_args_list] == calls
+
+
+@pytest.mark.utils
+def test_snapshot_refused_for_other_query_encoder(tmp_path, mocker):
+    """Test that an index is only searched with the encoder that built it."""
+    write_snapshot(
+        str(tmp_path),
+        embeddings=np.eye(4, dtype=np.float32),
+        metadata=[{"code": f"{i}000", "title": f"title {i}"} for i in range(4)],
+        embedding_model_name="test-model",
+        checksums={},
+        query_encoder=QUERY_ENCODER_CPU_INT8,
+    )
+    assert load_snapshot(str(tmp_path), checksums={}, query_encoder="default") is None
+    snapshot = load_snapshot(
+        str(tmp_path), checksums={}, query_encoder=QUERY_ENCODER_CPU_INT8
+    )
+    assert snapshot.query_encoder == QUERY_ENCODER_CPU_INT8
+
+    embed = mocker.Mock()
+    embed.get_embed_config.return_value = {"embedding_model_name": "test-model"}
+    with pytest.raises(ValueError, match="cpu_int8 encoder"):
+        ExactSearchBackend.from_snapshot(snapshot, embed)
+
+    encoder, _batches = _quantised_encoder(mocker)
+    backend = ExactSearchBackend.from_snapshot(snapshot, embed, encoder=encoder)
+    assert backend.get_embed_config()["query_encoder"] == QUERY_ENCODER_CPU_INT8
+    np.testing.assert_array_equal(backend.encode(["chef"]), [[4.0, 1.0]])
+    embed.embeddings.embed_documents.assert_not_called()
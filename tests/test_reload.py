@@ -0,0 +1,201 @@
+"""Module that provides test functions for reloading the vector store.
+
+Unit tests for swapping in a reloaded index, watching for new snapshots and
+the admin reload endpoint.
+"""
+
+import time
+from http import HTTPStatus
+from threading import Event
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from soc_classification_vector_store.api.main import app
+from soc_classification_vector_store.utils.cache import SearchCache
+from soc_classification_vector_store.utils.snapshot import write_snapshot
+from soc_classification_vector_store.utils.vector_store import (
+    VectorStoreManager,
+    vector_store_manager,
+)
+
+client = TestClient(app)
+
+
+def backend(mocker, index_version: str, events: tuple[Event, Event] | None = None):
+    """Create a mock search backend for an index version.
+
+    Args:
+        mocker: The pytest-mock fixture.
+        index_version: The index version reported by the backend.
+        events: Events set when a search starts and waited on before it
+            returns, if given.
+    """
+    embed = mocker.Mock()
+    embed.get_embed_config.return_value = {"index_version": index_version}
+
+    def search_index_multi(query):
+        if events is not None:
+            events[0].set()
+            events[1].wait(timeout=5)
+        return [{"distance": 0.1, "title": index_version, "code": "1"}]
+
+    embed.search_index_multi.side_effect = search_index_multi
+    return embed
+
+
+def wait_for_reload(manager: VectorStoreManager):
+    """Wait for a background reload of the vector store to finish."""
+    deadline = time.monotonic() + 5
+    while manager.reloading and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@pytest.mark.utils
+def test_reload_swaps_index_after_in_flight_searches_start(mocker):
+    """Test that a running search finishes on the index it started with."""
+    manager = VectorStoreManager()
+    manager.ready_event = Event()
+    manager.ready_event.set()
+    started, release = Event(), Event()
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.as_search_backend",
+        side_effect=[
+            backend(mocker, "v1", events=(started, release)),
+            backend(mocker, "v2"),
+        ],
+    )
+    mocker.patch("soc_classification_vector_store.utils.vector_store.load_vector_store")
+    manager.load()
+    first_loaded_at = manager.loaded_at
+
+    in_flight = manager.executor.submit(manager.search, job_title="teacher")
+    assert started.wait(timeout=5)
+    assert manager.start_reload()
+    wait_for_reload(manager)
+    release.set()
+
+    assert in_flight.result(timeout=5)[0]["title"] == "v1"
+    assert manager.search(job_title="teacher")[0]["title"] == "v2"
+    assert manager.index_version == "v2"
+    assert manager.loaded_at > first_loaded_at
+    manager.executor.shutdown()
+
+
+@pytest.mark.utils
+def test_reload_without_index_version_clears_cache(mocker):
+    """Test that the cache is cleared when the reloaded index has no version."""
+    manager = VectorStoreManager()
+    manager.ready_event = Event()
+    manager.ready_event.set()
+    manager.cache = SearchCache(embedding_entries=10, result_entries=10, ttl_seconds=0)
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.as_search_backend",
+        side_effect=[backend(mocker, ""), backend(mocker, "")],
+    )
+    mocker.patch("soc_classification_vector_store.utils.vector_store.load_vector_store")
+    manager.load()
+    manager.cache.embeddings.put("teacher", [1.0])
+    manager.cache.results.put(("", "teacher", ""), [])
+
+    assert manager.start_reload()
+    wait_for_reload(manager)
+
+    assert manager.cache.embeddings.get("teacher") is None
+    assert manager.cache.results.get(("", "teacher", "")) is None
+    manager.executor.shutdown()
+
+
+@pytest.mark.utils
+def test_failed_reload_keeps_serving_current_index(mocker):
+    """Test that the current index is kept when loading the new one fails."""
+    manager = VectorStoreManager()
+    manager.ready_event = Event()
+    manager.ready_event.set()
+    manager.embed = backend(mocker, "v1")
+    manager.status = {"index_version": "v1"}
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.load_vector_store",
+        side_effect=OSError("Snapshot is corrupt"),
+    )
+
+    assert manager.start_reload()
+    wait_for_reload(manager)
+
+    assert manager.reload_error == "Snapshot is corrupt"
+    assert manager.search(job_title="teacher")[0]["title"] == "v1"
+    manager.executor.shutdown()
+
+
+@pytest.mark.utils
+def test_check_snapshot_reloads_each_new_version_once(mocker, tmp_path):
+    """Test that a new snapshot in the snapshot directory starts one reload."""
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.SNAPSHOT_DIR",
+        str(tmp_path),
+    )
+    manager = VectorStoreManager()
+    manager.ready_event = Event()
+    manager.ready_event.set()
+    manager.status = {"index_version": "v1"}
+    start_reload = mocker.patch.object(manager, "start_reload", return_value=True)
+
+    assert not manager.check_snapshot()
+
+    manifest = write_snapshot(
+        str(tmp_path),
+        embeddings=np.ones((1, 2), dtype=np.float32),
+        metadata=[{"code": "1", "title": "Teacher"}],
+        embedding_model_name="m",
+        checksums={"index.xlsx": "abc"},
+    )
+
+    assert manager.check_snapshot()
+    assert not manager.check_snapshot()
+    start_reload.assert_called_once()
+    assert manager.index_version != manifest["index_version"]
+    manager.executor.shutdown()
+
+
+@pytest.mark.api
+def test_admin_reload(mocker):
+    """Test the `/v1/soc-vector-store/admin/reload` endpoint.
+
+    Assertions:
+    - Reloads are refused while `ADMIN_API_TOKEN` is not set
+    - The admin token is required
+    - A reload is refused while the vector store is loading
+    - A reload is started, and a second one refused while it runs
+    """
+    mocker.patch.object(vector_store_manager, "ready_event", Event())
+    vector_store_manager.ready_event.set()
+    start_reload = mocker.patch.object(
+        vector_store_manager, "start_reload", side_effect=[True, False]
+    )
+    admin = "soc_classification_vector_store.api.routes.v1.admin"
+    mocker.patch(f"{admin}.ADMIN_API_TOKEN", "")
+    response = client.post(
+        "/v1/soc-vector-store/admin/reload", headers={"X-Admin-Token": ""}
+    )
+    assert response.status_code == HTTPStatus.FORBIDDEN
+
+    mocker.patch(f"{admin}.ADMIN_API_TOKEN", "secret")
+    response = client.post(
+        "/v1/soc-vector-store/admin/reload", headers={"X-Admin-Token": "wrong"}
+    )
+    assert response.status_code == HTTPStatus.UNAUTHORIZED
+    start_reload.assert_not_called()
+
+    headers = {"X-Admin-Token": "secret"}
+    vector_store_manager.ready_event.clear()
+    response = client.post("/v1/soc-vector-store/admin/reload", headers=headers)
+    assert response.status_code == HTTPStatus.CONFLICT
+
+    vector_store_manager.ready_event.set()
+    response = client.post("/v1/soc-vector-store/admin/reload", headers=headers)
+    assert response.status_code == HTTPStatus.ACCEPTED
+    assert response.json()["status"] == "reloading"
+
+    response = client.post("/v1/soc-vector-store/admin/reload", headers=headers)
+    assert response.status_code == HTTPStatus.CONFLICT
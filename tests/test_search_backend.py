@@ -0,0 +1,212 @@
+"""Module that provides test functions for the search backends.
+
+Unit tests for the exact NumPy search backend and the backend wrapper.
+"""
+
+import numpy as np
+import pytest
+
+from soc_classification_vector_store.utils.batching import search_index_multi_batch
+from soc_classification_vector_store.utils.search_backend import (
+    EmbeddingHandlerBackend,
+    ExactSearchBackend,
+    as_search_backend,
+)
+from soc_classification_vector_store.utils.search_options import SearchOptions
+
+
+def _exact_backend(  # pylint: disable=too-many-arguments
+    mocker, rows=200, dimensions=16, dtype="float32", rerank_candidates=0
+):
+    """Create an exact backend over random normalised embeddings."""
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(rows, dimensions)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    metadata = {
+        "code": np.asarray([f"{i:04d}" for i in range(rows)]),
+        "title": np.asarray([f"title {i}" for i in range(rows)]),
+    }
+    embed = mocker.Mock(k_matches=5)
+    embed.get_embed_config.return_value = {"matches": 5}
+    embed.embeddings.embed_documents.side_effect = lambda texts: [
+        matrix[int(text.strip() or 0)] for text in texts
+    ]
+    backend = ExactSearchBackend(
+        embed,
+        matrix,
+        metadata,
+        "v1",
+        dtype=dtype,
+        rerank_candidates=rerank_candidates,
+    )
+    return backend, matrix
+
+
+# ruff: noqa: PLR2004
+@pytest.mark.utils
+def test_exact_search_matches_brute_force(mocker):
+    """Test that batched exact search returns the true nearest neighbours."""
+    backend, matrix = _exact_backend(mocker)
+    queries = matrix[[3, 42, 199]] + 0.01
+
+    indices, distances = backend.search(queries, k=5)
+
+    for query, row_indices, row_distances in zip(
+        queries, indices, distances, strict=True
+    ):
+        expected = ((matrix - query) ** 2).sum(axis=1)
+        np.testing.assert_array_equal(row_indices, np.argsort(expected)[:5])
+        np.testing.assert_allclose(row_distances, np.sort(expected)[:5], atol=1e-5)
+
+
+@pytest.mark.utils
+def test_exact_search_items_and_config(mocker):
+    """Test that the exact backend returns search index items."""
+    backend, _matrix = _exact_backend(mocker)
+
+    results = backend.search_index_multi(["7", "", ""])
+
+    assert results[0]["code"] == "0007"
+    assert results[0]["title"] == "title 7"
+    assert results[0]["distance"] == pytest.approx(0.0, abs=1e-5)
+    assert [r["distance"] for r in results] == sorted(r["distance"] for r in results)
+    config = backend.get_embed_config()
+    assert config["index_size"] == 200
+    assert config["index_version"] == "v1"
+    assert config["search_backend"] == "exact"
+
+
+@pytest.mark.utils
+def test_exact_search_float16(mocker):
+    """Test that a float16 matrix returns the same nearest neighbours."""
+    backend32, matrix = _exact_backend(mocker)
+    backend16, _matrix = _exact_backend(mocker, dtype="float16")
+    queries = matrix[:10]
+
+    indices32, _distances = backend32.search(queries, k=1)
+    indices16, _distances = backend16.search(queries, k=1)
+
+    assert backend16.matrix.dtype == np.float16
+    np.testing.assert_array_equal(indices16, indices32)
+
+
+@pytest.mark.utils
+def test_exact_search_int8_with_rerank(mocker):
+    """Test int8 storage recall and that re-ranking restores exact distances."""
+    backend32, matrix = _exact_backend(mocker, rows=1000, dimensions=64)
+    backend8, _matrix = _exact_backend(mocker, rows=1000, dimensions=64, dtype="int8")
+    reranked, _matrix = _exact_backend(
+        mocker, rows=1000, dimensions=64, dtype="int8", rerank_candidates=40
+    )
+    queries = matrix[:50] + 0.05
+
+    exact, exact_distances = backend32.search(queries, k=10)
+    approximate, _distances = backend8.search(queries, k=10)
+    indices, distances = reranked.search(queries, k=10)
+
+    recall = np.mean(
+        [len(set(a) & set(e)) / 10 for a, e in zip(approximate, exact, strict=True)]
+    )
+    assert backend8.matrix.dtype == np.int8
+    assert backend8.scales.shape == (64,)
+    assert recall >= 0.9
+    np.testing.assert_array_equal(indices, exact)
+    np.testing.assert_allclose(distances, exact_distances, atol=1e-5)
+
+    footprint = reranked.memory_footprint()
+    assert footprint["storage_dtype"] == "int8"
+    assert footprint["float32_matrix_bytes"] == 1000 * 64 * 4
+    assert footprint["rerank_candidates"] == 40
+    assert backend32.memory_footprint()["rerank_candidates"] == 0
+
+
+@pytest.mark.utils
+def test_exact_search_major_groups(mocker):
+    """Test that results restricted to major groups are their nearest documents."""
+    rng = np.random.default_rng(1)
+    matrix = rng.normal(size=(90, 8)).astype(np.float32)
+    codes = np.asarray([f"{i % 9 + 1}{i:03d}" for i in range(90)])
+    backend = ExactSearchBackend(
+        mocker.Mock(k_matches=5), matrix, {"code": codes, "title": codes}
+    )
+    allowed = np.flatnonzero(np.isin(codes.astype("U1"), ["2", "5"]))
+
+    results = backend.search_by_vectors(
+        matrix[[0, 1]], major_groups=frozenset({"2", "5"})
+    )
+
+    for query, matches in zip(matrix[[0, 1]], results, strict=True):
+        distances = ((matrix[allowed] - query) ** 2).sum(axis=1)
+        expected = codes[allowed[np.argsort(distances)[:5]]]
+        assert [match["code"] for match in matches] == list(expected)
+
+
+@pytest.mark.utils
+def test_exact_search_hierarchy(mocker):
+    """Test that a hierarchical search scores only the nearest minor groups."""
+    rng = np.random.default_rng(2)
+    centres = rng.normal(size=(6, 16)).astype(np.float32) * 5
+    matrix = np.repeat(centres, 10, axis=0) + rng.normal(size=(60, 16)).astype(
+        np.float32
+    )
+    codes = np.asarray([f"{i // 10 + 1}{i // 10 + 1}0{i % 10}" for i in range(60)])
+    metadata = {"code": codes, "title": codes}
+    flat = ExactSearchBackend(mocker.Mock(k_matches=5), matrix, metadata)
+    hierarchical = ExactSearchBackend(
+        mocker.Mock(k_matches=5), matrix, metadata, hierarchy_branches=1
+    )
+    queries = matrix[[3, 25, 58]] + 0.1
+
+    assert list(hierarchical.groups) == ["110", "220", "330", "440", "550", "660"]
+    assert len(hierarchical._branch_rows(queries[0], 5, None)) == 10
+    assert len(hierarchical._branch_rows(queries[0], 15, None)) == 20
+    np.testing.assert_array_equal(
+        hierarchical.search(queries, 5)[0], flat.search(queries, 5)[0]
+    )
+    assert len(hierarchical.search_by_vectors(queries, k=15)[0]) == 15
+    restricted = hierarchical.search_by_vectors(
+        queries[:1], major_groups=frozenset({"4"})
+    )[0]
+    assert {match["code"][0] for match in restricted} == {"4"}
+
+
+@pytest.mark.utils
+def test_search_options_shape_results_in_search(mocker):
+    """Test that the number, distance and fields of results are set per query."""
+    backend, _matrix = _exact_backend(mocker)
+    default = search_index_multi_batch(backend, [["7"]])[0]
+    cutoff = default[2]["distance"]
+
+    shaped, unshaped = search_index_multi_batch(
+        backend,
+        [["7"], ["7"]],
+        options=[SearchOptions.create(k=2, fields=["distance", "code"]), None],
+    )
+    within = search_index_multi_batch(
+        backend, [["7"]], options=[SearchOptions.create(k=50, max_distance=cutoff)]
+    )[0]
+    unique = search_index_multi_batch(
+        backend, [["7"]], unique_codes=True, options=[SearchOptions.create(k=3)]
+    )[0]
+
+    assert shaped == [
+        {"distance": match["distance"], "code": match["code"]} for match in default[:2]
+    ]
+    assert unshaped == default
+    assert within == default[:3]
+    assert unique == default[:3]
+    assert SearchOptions.create(fields=["code", "title", "distance"]) is None
+
+
+@pytest.mark.utils
+def test_as_search_backend(mocker):
+    """Test that embedding handlers are wrapped and backends are passed through."""
+    embed = mocker.Mock()
+    embed.search_index_multi.return_value = [{"distance": 0.1}]
+
+    backend = as_search_backend(embed)
+
+    assert isinstance(backend, EmbeddingHandlerBackend)
+    assert as_search_backend(backend) is backend
+    assert backend.search_index_multi(["a", "b", "c"]) == [{"distance": 0.1}]
+    embed.search_index_multi.assert_called_once_with(query=["a", "b", "c"])
@@ -0,0 +1,157 @@
+"""Module that provides test functions for encoding search responses.
+
+Unit tests for encoding search results without the response models, which
+must give the same JSON as the models, and for negotiating MessagePack.
+"""
+
+# ruff: noqa: PLR2004
+
+from http import HTTPStatus
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from soc_classification_vector_store.api.main import app
+from soc_classification_vector_store.api.models.search_index_models import (
+    SearchIndexBatchResponse,
+    SearchIndexResponse,
+)
+from soc_classification_vector_store.utils import serialisation
+from soc_classification_vector_store.utils.serialisation import (
+    JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    batch_document,
+    encode,
+    negotiate_media_type,
+    search_document,
+)
+from soc_classification_vector_store.utils.vector_store import vector_store_manager
+
+client = TestClient(app)
+
+RESULTS = [
+    {"distance": 0.125, "title": 'Teacher "secondary" é', "code": "2314"},
+    {"distance": np.float32(0.5), "code": "2315", "major_group": "2"},
+    {"distance": 1e-7, "title": "", "code": "8213"},
+]
+
+
+@pytest.mark.utils
+@pytest.mark.parametrize(
+    "fields",
+    [None, ["code"], ["title"], ["code", "distance"], ["distance", "title", "code"]],
+)
+def test_json_matches_response_models(fields):
+    """Test that the fast path encodes the same JSON as the response models."""
+    include = None if fields is None else {"results": {"__all__": set(fields)}}
+    expected = SearchIndexResponse(results=RESULTS).model_dump_json(include=include)
+
+    assert encode(search_document(RESULTS, fields)).decode() == expected
+
+    batch = batch_document([RESULTS, []], [fields, None])
+    expected = SearchIndexBatchResponse(
+        results=[SearchIndexResponse(results=RESULTS), SearchIndexResponse(results=[])]
+    ).model_dump_json(include={"results": {0: include or True, 1: True}})
+    assert encode(batch).decode() == expected
+
+
+@pytest.mark.utils
+def test_negotiate_media_type(mocker):
+    """Test that MessagePack is only chosen when accepted and installed."""
+    mocker.patch.object(serialisation, "msgpack", None)
+    assert negotiate_media_type(MSGPACK_MEDIA_TYPE) == JSON_MEDIA_TYPE
+
+    mocker.patch.object(serialisation, "msgpack", mocker.Mock())
+    assert negotiate_media_type("application/x-msgpack") == MSGPACK_MEDIA_TYPE
+    assert negotiate_media_type("application/json") == JSON_MEDIA_TYPE
+    assert negotiate_media_type("") == JSON_MEDIA_TYPE
+    assert negotiate_media_type("application/json, */*") == JSON_MEDIA_TYPE
+
+
+@pytest.mark.utils
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        ("application/msgpack;q=0, application/json", JSON_MEDIA_TYPE),
+        ("Application/MsgPack; q=0.0", JSON_MEDIA_TYPE),
+        ("application/json;q=0.9, application/msgpack", MSGPACK_MEDIA_TYPE),
+        ("application/msgpack;q=0.5, application/json", JSON_MEDIA_TYPE),
+        ("application/msgpack;q=0.5, */*;q=0.1", MSGPACK_MEDIA_TYPE),
+        ("application/msgpack, */*", MSGPACK_MEDIA_TYPE),
+        ("application/msgpack;q=bad", MSGPACK_MEDIA_TYPE),
+        ("application/vnd.other+msgpack", JSON_MEDIA_TYPE),
+    ],
+)
+def test_negotiate_media_type_quality(mocker, accept, expected):
+    """Test that the quality of each media range in `Accept` is honoured."""
+    mocker.patch.object(serialisation, "msgpack", mocker.Mock())
+
+    assert negotiate_media_type(accept) == expected
+
+
+@pytest.mark.utils
+@pytest.mark.parametrize(
+    ("accept", "expected"),
+    [
+        ("application/x-ndjson", NDJSON_MEDIA_TYPE),
+        ("application/x-ndjson;q=0, application/json", JSON_MEDIA_TYPE),
+        ("application/json, application/x-ndjson;q=0.5", JSON_MEDIA_TYPE),
+        ("application/x-ndjson, */*;q=0.1", NDJSON_MEDIA_TYPE),
+        ("application/x-ndjsonx", JSON_MEDIA_TYPE),
+        ("application/msgpack, application/x-ndjson;q=0.8", MSGPACK_MEDIA_TYPE),
+    ],
+)
+def test_negotiate_ndjson_stream(mocker, accept, expected):
+    """Test that NDJSON is only chosen for streams, by the quality of each type."""
+    mocker.patch.object(serialisation, "msgpack", mocker.Mock())
+
+    assert negotiate_media_type(accept, stream=True) == expected
+    assert negotiate_media_type(accept) != NDJSON_MEDIA_TYPE
+
+
+@pytest.mark.utils
+def test_msgpack_round_trip():
+    """Test that MessagePack holds the same document as the JSON."""
+    msgpack = pytest.importorskip("msgpack")
+    document = search_document(RESULTS, ["code", "distance"])
+
+    assert msgpack.unpackb(encode(document, MSGPACK_MEDIA_TYPE)) == document
+
+
+@pytest.mark.api
+def test_search_responses_negotiate_msgpack(mocker):
+    """Test that search responses are MessagePack when the client asks for it."""
+    mocker.patch.object(vector_store_manager, "_check_ready")
+    mocker.patch.object(vector_store_manager, "search", return_value=RESULTS)
+    mocker.patch.object(
+        vector_store_manager,
+        "search_batch",
+        side_effect=lambda queries, _options=None: [RESULTS for _query in queries],
+    )
+    msgpack = mocker.patch.object(serialisation, "msgpack")
+    msgpack.packb.return_value = b"\x81"
+    query = {"industry_descr": "school", "job_title": "teacher", "job_description": ""}
+    headers = {"Accept": MSGPACK_MEDIA_TYPE}
+
+    response = client.post(
+        "/v1/soc-vector-store/search-index", json=query, headers=headers
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    assert response.content == b"\x81"
+    msgpack.packb.assert_called_once_with(search_document(RESULTS))
+
+    response = client.post(
+        "/v1/soc-vector-store/search-index/batch",
+        json={"queries": [query, query]},
+        headers=headers,
+    )
+    assert response.headers["content-type"] == MSGPACK_MEDIA_TYPE
+    msgpack.packb.assert_called_with(batch_document([RESULTS, RESULTS], [None, None]))
+
+    response = client.post("/v1/soc-vector-store/search-index", json=query)
+    assert response.headers["content-type"] == JSON_MEDIA_TYPE
+    assert response.json() == search_document(RESULTS)
+    assert response.headers["vary"] == "Accept"
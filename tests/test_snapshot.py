@@ -0,0 +1,356 @@
+"""Module that provides test functions for the vector store snapshot.
+
+Unit tests for writing, loading and searching a persisted index snapshot.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from soc_classification_vector_store.utils.search_backend import ExactSearchBackend
+from soc_classification_vector_store.utils.snapshot import (
+    EMBEDDINGS_FILE,
+    KEEP_VERSIONS,
+    MANIFEST_FILE,
+    VERSIONS_DIR,
+    load_snapshot,
+    snapshot_path,
+    source_checksums,
+    write_snapshot,
+)
+from soc_classification_vector_store.utils.soc_index import deduplicate_texts
+from soc_classification_vector_store.utils.vector_store import (
+    SOC_INDEX_TUPLE,
+    load_vector_store,
+)
+
+CHECKSUMS = {"index.xlsx": "abc", "structure.xlsx": "def"}
+
+
+def _write_test_snapshot(directory, rows=50, dimensions=8):
+    """Write a snapshot of random embeddings to a directory."""
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(rows, dimensions)).astype(np.float32)
+    metadata = [{"code": f"{i:04d}", "title": f"title {i}"} for i in range(rows)]
+    manifest = write_snapshot(
+        str(directory),
+        embeddings=embeddings,
+        metadata=metadata,
+        embedding_model_name="test-model",
+        checksums=CHECKSUMS,
+    )
+    return embeddings, metadata, manifest
+
+
+# ruff: noqa: PLR2004
+@pytest.mark.utils
+def test_snapshot_round_trip(tmp_path):
+    """Test that a written snapshot is memory-mapped back unchanged."""
+    embeddings, metadata, manifest = _write_test_snapshot(tmp_path)
+
+    snapshot = load_snapshot(
+        str(tmp_path), checksums=CHECKSUMS, embedding_model_name="test-model"
+    )
+
+    assert snapshot is not None
+    assert isinstance(snapshot.embeddings, np.memmap)
+    np.testing.assert_array_equal(snapshot.embeddings, embeddings)
+    assert snapshot.metadata["code"].tolist() == [row["code"] for row in metadata]
+    assert snapshot.metadata["title"].tolist() == [row["title"] for row in metadata]
+    assert all(isinstance(values, np.memmap) for values in snapshot.metadata.values())
+    assert snapshot.index_version == manifest["index_version"]
+    assert manifest["rows"] == 50
+    assert manifest["dimensions"] == 8
+
+
+@pytest.mark.utils
+def test_deduplicated_snapshot_search(tmp_path, mocker):
+    """Test that documents sharing an embedding are all found and collapsible.
+
+    Assertions:
+    - The snapshot holds one embedding per unique text and maps every document
+    - Each nearest embedding expands to all of its documents
+    - Unique code searches skip repeated codes and still return k codes
+    """
+    texts, row_vectors = deduplicate_texts(
+        ["Teacher", "teacher", "Nurse", "Teacher, school", "Cook"]
+    )
+    embeddings = np.asarray(
+        [[1.0, 0.0], [0.0, 1.0], [0.9, 0.1], [-1.0, 0.0]], dtype=np.float32
+    )
+    metadata = [
+        {"code": "2314", "title": "Teacher"},
+        {"code": "2319", "title": "teacher"},
+        {"code": "2231", "title": "Nurse"},
+        {"code": "2314", "title": "Teacher, school"},
+        {"code": "5434", "title": "Cook"},
+    ]
+    manifest = write_snapshot(
+        str(tmp_path),
+        embeddings=embeddings,
+        metadata=metadata,
+        embedding_model_name="test-model",
+        checksums=CHECKSUMS,
+        row_vectors=row_vectors,
+    )
+    snapshot = load_snapshot(str(tmp_path), checksums=CHECKSUMS)
+    embed = mocker.Mock(k_matches=3)
+    embed.get_embed_config.return_value = {"matches": 3}
+    backend = ExactSearchBackend.from_snapshot(snapshot, embed)
+
+    results = backend.search_by_vectors([[1.0, 0.0]])[0]
+    unique = backend.search_by_vectors([[1.0, 0.0]], unique_codes=True)[0]
+
+    assert texts == ["Teacher", "Nurse", "Teacher, school", "Cook"]
+    assert (manifest["rows"], manifest["documents"]) == (4, 5)
+    assert [match["title"] for match in results] == [
+        "Teacher",
+        "teacher",
+        "Teacher, school",
+    ]
+    assert [match["code"] for match in unique] == ["2314", "2319", "2231"]
+    assert backend.get_embed_config()["index_size"] == 5
+
+
+@pytest.mark.utils
+def test_snapshot_compact_storage(tmp_path, mocker):
+    """Test that a compact int8 copy of the matrix is memory-mapped and searched."""
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(50, 8)).astype(np.float32)
+    write_snapshot(
+        str(tmp_path),
+        embeddings=embeddings,
+        metadata=[{"code": f"{i:04d}"} for i in range(50)],
+        embedding_model_name="test-model",
+        checksums=CHECKSUMS,
+        storage_dtypes=("float32", "int8"),
+    )
+
+    snapshot = load_snapshot(str(tmp_path), checksums=CHECKSUMS)
+    values, scales = snapshot.compact["int8"]
+    backend = ExactSearchBackend.from_snapshot(
+        snapshot, mocker.Mock(), dtype="int8", rerank_candidates=5
+    )
+
+    assert list(snapshot.compact) == ["int8"]
+    assert isinstance(values, np.memmap)
+    assert values.dtype == np.int8
+    np.testing.assert_allclose(values * scales, embeddings, atol=scales.max())
+    assert backend.memory_footprint()["memory_mapped"]
+    assert backend.search(embeddings[[7]], k=1)[0][0][0] == 7
+
+
+@pytest.mark.utils
+def test_snapshot_stale_or_missing(tmp_path):
+    """Test that missing, changed or incomplete snapshots are not loaded."""
+    assert load_snapshot(str(tmp_path), checksums=CHECKSUMS) is None
+
+    _write_test_snapshot(tmp_path)
+    assert load_snapshot(str(tmp_path), checksums={"index.xlsx": "changed"}) is None
+    assert (
+        load_snapshot(
+            str(tmp_path), checksums=CHECKSUMS, embedding_model_name="other-model"
+        )
+        is None
+    )
+
+    manifest_path = tmp_path / snapshot_path(str(tmp_path)) / MANIFEST_FILE
+    manifest = json.loads(manifest_path.read_text())
+    manifest["format_version"] = 0
+    manifest_path.write_text(json.dumps(manifest))
+    assert load_snapshot(str(tmp_path), checksums=CHECKSUMS) is None
+
+
+@pytest.mark.utils
+def test_snapshot_versions_published_atomically(tmp_path, mocker):
+    """Test that each snapshot is published as a new version directory.
+
+    Assertions:
+    - A loaded snapshot keeps its vectors when a new version is published
+    - A write that fails part way leaves the published snapshot in place
+    - Only the newest versions are kept
+    """
+    embeddings, _metadata, manifest = _write_test_snapshot(tmp_path)
+    first = load_snapshot(str(tmp_path), checksums=CHECKSUMS)
+    first_path = snapshot_path(str(tmp_path))
+
+    rng = np.random.default_rng(1)
+    write_snapshot(
+        str(tmp_path),
+        embeddings=rng.normal(size=(3, 8)).astype(np.float32),
+        metadata=[{"code": f"{i:04d}", "title": f"new {i}"} for i in range(3)],
+        embedding_model_name="test-model",
+        checksums=CHECKSUMS,
+    )
+    second = load_snapshot(str(tmp_path), checksums=CHECKSUMS)
+    assert snapshot_path(str(tmp_path)) != first_path
+    assert second.embeddings.shape == (3, 8)
+    assert second.metadata["title"][0] == "new 0"
+    np.testing.assert_array_equal(first.embeddings, embeddings)
+    assert first.index_version == manifest["index_version"]
+
+    mocker.patch(
+        "soc_classification_vector_store.utils.snapshot.json.dump",
+        side_effect=OSError("disk full"),
+    )
+    with pytest.raises(OSError, match="disk full"):
+        _write_test_snapshot(tmp_path, rows=5)
+    mocker.stopall()
+    assert load_snapshot(str(tmp_path), checksums=CHECKSUMS).embeddings.shape == (3, 8)
+
+    for rows in range(4, 8):
+        _write_test_snapshot(tmp_path, rows=rows)
+    assert len(list((tmp_path / VERSIONS_DIR).iterdir())) == KEEP_VERSIONS
+    assert load_snapshot(str(tmp_path), checksums=CHECKSUMS).embeddings.shape == (7, 8)
+
+
+@pytest.mark.utils
+def test_unversioned_snapshot_still_loaded(tmp_path):
+    """Test that a snapshot written before versioning loads until replaced."""
+    _embeddings, _metadata, manifest = _write_test_snapshot(tmp_path)
+    published = snapshot_path(str(tmp_path))
+    for name in (MANIFEST_FILE, EMBEDDINGS_FILE, "metadata_code.npy"):
+        (tmp_path / name).write_bytes((tmp_path / published / name).read_bytes())
+    (tmp_path / "metadata_title.npy").write_bytes(
+        (tmp_path / published / "metadata_title.npy").read_bytes()
+    )
+    (tmp_path / "CURRENT").unlink()
+
+    snapshot = load_snapshot(str(tmp_path), checksums=CHECKSUMS)
+    assert snapshot.index_version == manifest["index_version"]
+
+    _write_test_snapshot(tmp_path, rows=4)
+    assert not (tmp_path / MANIFEST_FILE).exists()
+    assert not (tmp_path / EMBEDDINGS_FILE).exists()
+    assert load_snapshot(str(tmp_path), checksums=CHECKSUMS).embeddings.shape == (4, 8)
+
+
+@pytest.mark.utils
+def test_load_vector_store_from_snapshot(tmp_path, mocker):
+    """Test that load_vector_store skips embedding when a snapshot matches."""
+    _write_test_snapshot(tmp_path)
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.SNAPSHOT_DIR",
+        str(tmp_path),
+    )
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.source_checksums",
+        return_value=CHECKSUMS,
+    )
+    mock_embed_handler = mocker.patch(
+        "occupational_classification_utils.embed.embedding.EmbeddingHandler"
+    )
+    mock_embed_instance = mock_embed_handler.return_value
+    mock_embed_instance.k_matches = 5
+    mock_embed_instance.get_embed_config.return_value = {
+        "embedding_model_name": "test-model"
+    }
+
+    embed = load_vector_store()
+
+    assert isinstance(embed, ExactSearchBackend)
+    mock_embed_instance.embed_index.assert_not_called()
+
+
+@pytest.mark.utils
+def test_load_vector_store_builds_snapshot_once(tmp_path, mocker):
+    """Test that a missing snapshot is built on load and then memory-mapped."""
+    rng = np.random.default_rng(1)
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.SNAPSHOT_DIR",
+        str(tmp_path),
+    )
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.SNAPSHOT_WRITE_ON_LOAD",
+        True,
+    )
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.source_checksums",
+        return_value=CHECKSUMS,
+    )
+    mock_embed_handler = mocker.patch(
+        "occupational_classification_utils.embed.embedding.EmbeddingHandler"
+    )
+    mock_embed_instance = mock_embed_handler.return_value
+    mock_embed_instance.k_matches = 3
+    mock_embed_instance.get_embed_config.return_value = {
+        "embedding_model_name": "test-model"
+    }
+    metadata = [{"code": str(i), "title": f"title {i}"} for i in range(10)]
+    texts = [row["title"] for row in metadata]
+    mocker.patch(
+        "soc_classification_vector_store.utils.vector_store.load_soc_index",
+        return_value=(texts, metadata),
+    )
+    mock_embed_instance.vector_store.get.return_value = {
+        "embeddings": rng.normal(size=(10, 4)),
+        "metadatas": metadata,
+        "documents": texts,
+    }
+
+    first = load_vector_store()
+    second = load_vector_store()
+
+    assert isinstance(first, ExactSearchBackend)
+    assert isinstance(second, ExactSearchBackend)
+    assert first.index_version == second.index_version
+    mock_embed_instance.embed_index.assert_called_once()
+
+
+@pytest.mark.utils
+def test_load_vector_store_updates_checked_snapshot(tmp_path, mocker):
+    """Test that an out of date snapshot of checked documents is updated on load.
+
+    The rows are parsed from the coding index, and only changed rows are
+    embedded, without `SNAPSHOT_WRITE_ON_LOAD` or the handler embedding the
+    index again.
+    """
+    module = "soc_classification_vector_store.utils.vector_store"
+    mocker.patch(f"{module}.SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    mocker.patch(f"{module}.INDEX_BUILD_CHECKPOINT_DIR", str(tmp_path / "build"))
+    mocker.patch(f"{module}.document_parity_key", return_value="v1")
+    checksums = mocker.patch(f"{module}.source_checksums")
+    load_index = mocker.patch(f"{module}.load_soc_index")
+    mock_embed_handler = mocker.patch(
+        "occupational_classification_utils.embed.embedding.EmbeddingHandler"
+    )
+    mock_embed_instance = mock_embed_handler.return_value
+    mock_embed_instance.k_matches = 3
+    mock_embed_instance.get_embed_config.return_value = {
+        "embedding_model_name": "test-model"
+    }
+    encoded = []
+    mock_embed_instance.embeddings.embed_documents.side_effect = lambda texts: [
+        encoded.extend(texts) or [float(len(text)), 1.0] for text in texts
+    ]
+
+    # The first snapshot is built on load, the second only from its checked rows
+    for write_on_load, version, texts in (
+        (True, "old", ["teacher", "nurse", "cook"]),
+        (False, "new", ["teacher", "staff nurse", "cook"]),
+    ):
+        mocker.patch(f"{module}.SNAPSHOT_WRITE_ON_LOAD", write_on_load)
+        checksums.return_value = {"index.xlsx": version}
+        metadata = [{"code": str(i), "title": text} for i, text in enumerate(texts)]
+        load_index.return_value = (texts, metadata)
+        mock_embed_instance.vector_store.get.return_value = {
+            "documents": texts,
+            "metadatas": metadata,
+            "embeddings": np.ones((len(texts), 2), dtype=np.float32),
+        }
+        backend = load_vector_store()
+
+    assert isinstance(backend, ExactSearchBackend)
+    assert backend.metadata["title"].tolist() == texts
+    mock_embed_instance.embed_index.assert_called_once()
+    assert encoded == ["staff nurse"]
+
+
+@pytest.mark.utils
+def test_source_checksums():
+    """Test that the packaged spreadsheets are checksummed by file name."""
+    checksums = source_checksums(SOC_INDEX_TUPLE)
+
+    assert list(checksums) == [SOC_INDEX_TUPLE[1]]
+    assert len(checksums[SOC_INDEX_TUPLE[1]]) == 64
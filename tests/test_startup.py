@@ -0,0 +1,120 @@
+"""Module that provides test functions for a fast cold start.
+
+Unit tests for importing the API without the embedding stack, timing the
+phases of loading the index and the health endpoints that separate the API
+being up from the index being loaded.
+"""
+
+# ruff: noqa: PLR2004
+
+import subprocess
+import sys
+from http import HTTPStatus
+from threading import Event
+
+import pytest
+from fastapi.testclient import TestClient
+
+from soc_classification_vector_store.api.main import app
+from soc_classification_vector_store.utils.metrics import (
+    STARTUP_PHASE_SECONDS,
+    startup_phases,
+    timed_startup_phase,
+)
+from soc_classification_vector_store.utils.vector_store import (
+    INDEX_LOADING_RETRY_AFTER_SECONDS,
+    VectorStoreManager,
+)
+
+client = TestClient(app)
+
+# Generous limit on the time to import the API, which is well under a second
+# without the embedding stack but varies with the machine running the tests
+IMPORT_TIME_BUDGET_SECONDS = 10
+
+# Modules only needed once the index is loaded or a bulk search is run
+HEAVY_MODULES = (
+    "torch",
+    "sentence_transformers",
+    "occupational_classification_utils.embed.embedding",
+    "pandas",
+)
+
+IMPORT_SCRIPT = """
+import sys
+import time
+
+start = time.perf_counter()
+import soc_classification_vector_store.api.main
+print(time.perf_counter() - start)
+print(",".join(name for name in sys.argv[1:] if name in sys.modules))
+"""
+
+
+@pytest.mark.utils
+def test_api_import_is_lazy():
+    """Test that importing the API leaves the embedding stack unimported."""
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", IMPORT_SCRIPT, *HEAVY_MODULES],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    seconds, imported = result.stdout.splitlines()[-2:]
+
+    assert not imported
+    assert float(seconds) < IMPORT_TIME_BUDGET_SECONDS
+
+
+@pytest.mark.utils
+def test_timed_startup_phase():
+    """Test that the time of each phase is recorded in the order they start."""
+    STARTUP_PHASE_SECONDS.clear()
+    with timed_startup_phase("imports"):
+        pass
+    with timed_startup_phase("model_load"):
+        pass
+    with timed_startup_phase("imports"):
+        pass
+
+    phases = startup_phases()
+    assert list(phases) == ["imports", "model_load"]
+    assert all(seconds >= 0 for seconds in phases.values())
+
+    STARTUP_PHASE_SECONDS.clear()
+    assert not startup_phases()
+
+
+@pytest.mark.api
+def test_health_endpoints(mocker):
+    """Test that the API is live while loading and ready once loaded."""
+    ready = mocker.patch.object(
+        VectorStoreManager, "ready", new_callable=mocker.PropertyMock
+    )
+
+    ready.return_value = False
+    response = client.get("/v1/soc-vector-store/health/live")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {"status": "alive"}
+
+    response = client.get("/v1/soc-vector-store/health/ready")
+    assert response.status_code == HTTPStatus.SERVICE_UNAVAILABLE
+    assert response.json() == {"status": "loading"}
+    assert response.headers["Retry-After"] == str(INDEX_LOADING_RETRY_AFTER_SECONDS)
+
+    ready.return_value = True
+    response = client.get("/v1/soc-vector-store/health/ready")
+    assert response.status_code == HTTPStatus.OK
+    assert response.json() == {"status": "ready"}
+
+
+@pytest.mark.utils
+def test_manager_ready_needs_a_loaded_index(mocker):
+    """Test that a failed load is not reported as ready."""
+    manager = VectorStoreManager()
+    manager.ready_event = Event()
+    manager.ready_event.set()
+    assert not manager.ready
+
+    manager.embed = mocker.Mock()
+    assert manager.ready
@@ -3,16 +3,30 @@
 Unit tests for endpoints and utility functions in the vector store.
 """
 
+import asyncio
+import time
+from threading import Event
+
 import pytest
 
-from soc_classification_vector_store.utils.vector_store import load_vector_store
+from soc_classification_vector_store.utils.executor import (
+    AdmissionController,
+    BoundedSearchExecutor,
+    SearchDeadlineExceededError,
+    SearchQueueFullError,
+    SearchRejectedError,
+)
+from soc_classification_vector_store.utils.vector_store import (
+    VectorStoreManager,
+    load_vector_store,
+)
 
 
 @pytest.mark.utils
 def test_load_vector_store(mocker):
     """Test the load_vector_store function."""
     mock_embed_handler = mocker.patch(
-        "soc_classification_vector_store.utils.vector_store.EmbeddingHandler"
+        "occupational_classification_utils.embed.embedding.EmbeddingHandler"
     )
     mock_embed_instance = mock_embed_handler.return_value
     mock_embed_instance.get_embed_config.return_value = {
@@ -27,3 +41,93 @@ def test_load_vector_store(mocker):
     )
     mock_embed_instance.embed_index.assert_called_once()
     assert embed == mock_embed_instance
+
+
+@pytest.mark.utils
+def test_asearch_runs_search_off_the_event_loop(mocker):
+    """Test that asearch returns the results of search_index_multi."""
+    manager = VectorStoreManager()
+    manager.embed = mocker.Mock()
+    manager.embed.search_index_multi.return_value = [
+        {"distance": 0.1, "title": "Teacher", "code": "2314"}
+    ]
+    mocker.patch.object(manager.ready_event, "is_set", return_value=True)
+
+    results = asyncio.run(
+        manager.asearch(
+            industry_descr="school", job_title="teacher", job_description=""
+        )
+    )
+
+    assert results == [{"distance": 0.1, "title": "Teacher", "code": "2314"}]
+    manager.embed.search_index_multi.assert_called_once_with(
+        query=["school", "teacher", ""]
+    )
+
+
+@pytest.mark.utils
+def test_asearch_not_ready():
+    """Test that asearch fails fast when the vector store is not loaded."""
+    manager = VectorStoreManager()
+    manager.ready_event = Event()
+
+    with pytest.raises(RuntimeError, match="not ready"):
+        asyncio.run(manager.asearch(job_title="teacher"))
+
+
+@pytest.mark.utils
+def test_bounded_executor_rejects_when_full():
+    """Test that the bounded executor rejects work beyond workers plus queue."""
+    executor = BoundedSearchExecutor(max_workers=1, queue_size=1)
+    release = Event()
+
+    running = executor.submit(release.wait)
+    queued = executor.submit(release.wait)
+    with pytest.raises(SearchQueueFullError):
+        executor.submit(release.wait)
+
+    release.set()
+    assert running.result(timeout=5)
+    assert queued.result(timeout=5)
+
+    # Slots are released once work completes
+    assert executor.submit(lambda: "done").result(timeout=5) == "done"
+    executor.shutdown()
+
+
+@pytest.mark.utils
+def test_admission_controller_rejects_beyond_limit():
+    """Test that requests beyond the limit in flight are rejected."""
+    admission = AdmissionController(max_in_flight=1)
+
+    with admission.admit():
+        with pytest.raises(SearchRejectedError), admission.admit():
+            pass
+        assert admission.stats() == {"max_in_flight": 1, "in_flight": 1, "rejected": 1}
+
+    # The slot is released when the request completes
+    with admission.admit():
+        assert admission.stats()["in_flight"] == 1
+
+
+@pytest.mark.utils
+def test_asearch_deadline_cancels_queued_search(mocker):
+    """Test that a search still queued when its deadline passes never runs."""
+    manager = VectorStoreManager()
+    manager.batcher = None
+    manager.executor = BoundedSearchExecutor(max_workers=1, queue_size=1)
+    manager.embed = mocker.Mock()
+    mocker.patch.object(manager.ready_event, "is_set", return_value=True)
+    search = mocker.patch.object(manager, "search", return_value=[])
+    release = Event()
+    manager.executor.submit(release.wait)
+
+    with pytest.raises(SearchDeadlineExceededError):
+        asyncio.run(
+            manager.asearch(job_title="teacher", deadline=time.monotonic() + 0.05)
+        )
+
+    release.set()
+    manager.executor.shutdown()
+    search.assert_not_called()
+    assert manager.admission.stats()["in_flight"] == 0